@@ -7,6 +7,8 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from pathlib import Path
 
+from .memory_compaction import CompactionConfig
+
 
 @dataclass
 class HardwareConfig:
@@ -52,6 +54,10 @@ class LLMConfig:
     max_tokens: int = 512
     chroma_path: Path = Path("/home/suhas/Desktop/3i/src/memory")
     collection_name: str = "assistant_memory"
+    embedding_cache_size: int = 512
+    compaction: CompactionConfig = field(default_factory=CompactionConfig)
+    compaction_idle_s: float = 120.0
+    compaction_interval_s: float = 3600.0
 
 
 @dataclass
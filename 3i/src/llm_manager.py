@@ -5,12 +5,15 @@ LLM + RAG manager built around llama.cpp and ChromaDB.
 from __future__ import annotations
 
 import logging
+import threading
 import time
 import uuid
 from pathlib import Path
 from typing import Iterable, List, Optional
 
 from .config import LLMConfig
+from .embedding_service import get_embedding_service
+from .memory_compaction import compact_collection
 
 try:  # pragma: no cover - heavy dependency
     from llama_cpp import Llama
@@ -36,30 +39,69 @@ class LLMManager:
         self._logger = logger or logging.getLogger(__name__)
         Path(config.chroma_path).mkdir(parents=True, exist_ok=True)
         self._client = chromadb.PersistentClient(path=str(config.chroma_path))
-        self._collection = self._client.get_or_create_collection(config.collection_name)
+        # Embeddings come from the shared service; embedding_function=None keeps
+        # Chroma from loading its own copy of the model.
+        self._embedder = get_embedding_service(config.embedding_cache_size)
+        self._collection = self._client.get_or_create_collection(
+            config.collection_name, embedding_function=None
+        )
         self._llm = Llama(
             model_path=str(config.model_path),
             n_ctx=4096,
             n_threads=4,
             logits_all=False,
         )
+        self._llm_lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._last_compaction = 0.0
 
     def add_memory(self, question: str, answer: str) -> None:
         """Persist Q/A pair in the vector store."""
         doc_id = str(uuid.uuid4())
         metadata = {"timestamp": time.time(), "type": "chat_exchange"}
+        document = f"Q: {question}\nA: {answer}"
         self._collection.add(
             ids=[doc_id],
-            documents=[f"Q: {question}\nA: {answer}"],
+            documents=[document],
+            embeddings=self._embedder.embed([document]),
             metadatas=[metadata],
         )
         self._logger.debug("Stored interaction %s in memory.", doc_id)
 
+    def compact_memory(self, force: bool = False) -> None:
+        """Deduplicate, summarize and expire stored memories (meant for idle time)."""
+        if not force and time.time() - self._last_compaction < self._config.compaction_interval_s:
+            return
+        if not self._compaction_lock.acquire(blocking=False):
+            return
+        try:
+            compact_collection(
+                self._collection,
+                self._embedder.embed,
+                self._config.compaction,
+                summarize=self._summarize_memories,
+                logger=self._logger,
+            )
+        except Exception as exc:  # noqa: BLE001
+            self._logger.warning("Memory compaction failed: %s", exc)
+        finally:
+            self._last_compaction = time.time()
+            self._compaction_lock.release()
+
+    def _summarize_memories(self, snippets: List[str]) -> Optional[str]:
+        prompt = (
+            "Merge the related conversation snippets below into one short memory (at most two sentences). "
+            "Keep names, facts and user preferences.\n\n" + "\n---\n".join(snippets) + "\n\nMemory:"
+        )
+        with self._llm_lock:
+            result = self._llm(prompt, max_tokens=96, temperature=0.2, stop=["\n\n", "---"])
+        return result["choices"][0]["text"].strip() or None
+
     def _retrieve_context(self, query: str, k: int = 3) -> List[str]:
         if self._collection.count() == 0:
             return []
 
-        results = self._collection.query(query_texts=[query], n_results=k)
+        results = self._collection.query(query_embeddings=self._embedder.embed([query]), n_results=k)
         documents = results.get("documents", [[]])[0]
         return [doc for doc in documents if doc]
 
@@ -85,13 +127,14 @@ class LLMManager:
         context_docs = self._retrieve_context(user_text)
         prompt = self._build_prompt(history, context_docs, user_text)
         self._logger.debug("LLM prompt prepared (%d chars).", len(prompt))
-        result = self._llm(
-            prompt,
-            max_tokens=self._config.max_tokens,
-            temperature=self._config.temperature,
-            top_p=self._config.top_p,
-            stop=["User:", "\nUser:"],
-        )
+        with self._llm_lock:
+            result = self._llm(
+                prompt,
+                max_tokens=self._config.max_tokens,
+                temperature=self._config.temperature,
+                top_p=self._config.top_p,
+                stop=["User:", "\nUser:"],
+            )
         text = result["choices"][0]["text"].strip()
         self._logger.info("LLM response generated (%d chars).", len(text))
         return text
@@ -8,6 +8,7 @@ import logging
 import queue
 import signal
 import threading
+import time
 from enum import Enum, auto
 
 from .audio_manager import AudioManager
@@ -44,6 +45,7 @@ class AssistantController:
         self._history: list[tuple[str, str]] = []
         self._mode = Mode.BOOT
         self._running = threading.Event()
+        self._last_activity = time.monotonic()
 
         self._buttons.register_mode_callbacks(self._on_chat_mode, self._on_object_mode)
         self._buttons.register_action_callbacks(self._on_action_press, self._on_action_release)
@@ -67,15 +69,23 @@ class AssistantController:
         while self._running.is_set():
             try:
                 event, payload = self._event_queue.get(timeout=0.1)
+                self._last_activity = time.monotonic()
                 self._logger.debug("Handling event: %s", event)
                 handler = getattr(self, f"_handle_{event}", None)
                 if handler:
                     handler(payload)
             except queue.Empty:
+                self._maybe_compact_memory()
                 continue
             except Exception as exc:  # noqa: BLE001
                 self._logger.exception("Unexpected error while handling events: %s", exc)
 
+    def _maybe_compact_memory(self) -> None:
+        if time.monotonic() - self._last_activity < self._config.llm.compaction_idle_s:
+            return
+        self._last_activity = time.monotonic()  # Re-check after another idle period
+        threading.Thread(target=self._llm.compact_memory, daemon=True).start()
+
     # Button callbacks -> queue events -----------------------------------------------------------
     def _on_chat_mode(self) -> None:
         self._event_queue.put(("mode_chat", None))
@@ -0,0 +1,120 @@
+"""
+Idle-time compaction of the ChromaDB chat memory: dedup, cluster summaries, age and count limits.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class CompactionConfig:
+    """Limits applied to the chat-memory collection."""
+
+    duplicate_threshold: float = 0.95
+    cluster_threshold: float = 0.8
+    min_cluster_size: int = 3
+    summarize_after_days: float = 7
+    max_age_days: float = 90
+    max_count: int = 2000
+
+
+def find_duplicates(embeddings: np.ndarray, threshold: float) -> List[int]:
+    """Indices of rows that duplicate an earlier row (rows are in priority order)."""
+    similarity = embeddings @ embeddings.T
+    dropped = np.zeros(len(embeddings), dtype=bool)
+    for i in range(len(embeddings)):
+        if not dropped[i]:
+            dropped[i + 1:] |= similarity[i, i + 1:] >= threshold
+    return np.flatnonzero(dropped).tolist()
+
+
+def cluster(embeddings: np.ndarray, threshold: float) -> List[List[int]]:
+    """Greedy clusters of rows within `threshold` cosine similarity of a seed row."""
+    similarity = embeddings @ embeddings.T
+    assigned = np.zeros(len(embeddings), dtype=bool)
+    clusters = []
+    for i in range(len(embeddings)):
+        if assigned[i]:
+            continue
+        members = np.flatnonzero(~assigned & (similarity[i] >= threshold))
+        assigned[members] = True
+        clusters.append(members.tolist())
+    return clusters
+
+
+def compact_collection(
+    collection,
+    embed: Callable[[List[str]], List[List[float]]],
+    config: CompactionConfig,
+    summarize: Optional[Callable[[List[str]], Optional[str]]] = None,
+    logger: Optional[logging.Logger] = None,
+    now: Optional[float] = None,
+) -> Dict[str, int]:
+    """Deduplicate, summarize and expire memories in a Chroma collection; returns removal counts."""
+    logger = logger or logging.getLogger(__name__)
+    now = time.time() if now is None else now
+    stats = {"duplicates": 0, "summarized": 0, "expired": 0, "over_limit": 0}
+
+    data = collection.get(include=["documents", "metadatas", "embeddings"])
+    ids = data["ids"]
+    if not ids:
+        return stats
+    documents = data["documents"]
+    metadatas = [m or {} for m in data["metadatas"]]
+    vectors = np.asarray(data["embeddings"], dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    # Memories stored before timestamps were recorded count as the oldest for the
+    # count limit, but their age is unknown, so they never expire by age.
+    timestamps = np.array([float(m.get("timestamp", 0.0)) for m in metadatas])
+    dated = timestamps > 0
+
+    order = np.argsort(-timestamps, kind="stable")  # newest first
+    remove = {int(order[p]) for p in find_duplicates(vectors[order], config.duplicate_threshold)}
+    stats["duplicates"] = len(remove)
+
+    for i in order:
+        if int(i) not in remove and dated[i] and now - timestamps[i] > config.max_age_days * 86400:
+            remove.add(int(i))
+            stats["expired"] += 1
+
+    summaries: List[tuple[str, Dict]] = []
+    if summarize:
+        cutoff = now - config.summarize_after_days * 86400
+        old = [int(i) for i in order
+               if int(i) not in remove and timestamps[i] < cutoff and metadatas[i].get("type") != "summary"]
+        for members in cluster(vectors[old], config.cluster_threshold):
+            if len(members) < config.min_cluster_size:
+                continue
+            group = [old[m] for m in members]
+            text = summarize([documents[i] for i in group])
+            if text:
+                summaries.append((text, {"type": "summary", "timestamp": float(timestamps[group].max()),
+                                         "merged": len(group)}))
+                remove.update(group)
+                stats["summarized"] += len(group)
+
+    kept = [int(i) for i in order if int(i) not in remove]
+    overflow = len(kept) + len(summaries) - config.max_count
+    if overflow > 0:
+        remove.update(kept[-overflow:])
+        stats["over_limit"] = min(overflow, len(kept))
+
+    if summaries:
+        texts = [text for text, _ in summaries]
+        collection.add(
+            ids=[f"summary-{int(now * 1000)}-{n}" for n in range(len(summaries))],
+            documents=texts,
+            embeddings=embed(texts),
+            metadatas=[metadata for _, metadata in summaries],
+        )
+    if remove:
+        # Chroma updates its HNSW index on delete; nothing else to rebuild.
+        collection.delete(ids=[ids[i] for i in remove])
+        logger.info("Memory compacted: %s", stats)
+    return stats
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
 
 import torch
 import torchaudio
@@ -14,13 +14,31 @@ def _select_model_name(num_speakers: int) -> str:
 	raise ValueError("num_speakers must be 2 or 3")
 
 
+DEFAULT_SAVEDIR = Path(__file__).resolve().parent.parent / "pretrained_models"
+
+# Loaded separators keyed by model name. Populated once per process (or once in
+# the serving master before workers fork, so workers share the weights).
+_SEPARATORS: Dict[str, SepformerSeparation] = {}
+
+
+def load_separator(num_speakers: int = 2, savedir: Optional[Path] = None) -> SepformerSeparation:
+	"""Return the SepFormer model for num_speakers, loading it on first use."""
+	model_name = _select_model_name(num_speakers)
+	separer = _SEPARATORS.get(model_name)
+	if separer is None:
+		base = savedir if savedir is not None else DEFAULT_SAVEDIR
+		separer = SepformerSeparation.from_hparams(source=model_name, savedir=str(base / model_name.split("/")[-1]))
+		separer.eval()
+		_SEPARATORS[model_name] = separer
+	return separer
+
+
 def separate_speakers(wav_path: Path, output_dir: Path, num_speakers: int = 2) -> List[Path]:
 	"""Run SepFormer separation and write `speaker_*.wav` files in output_dir.
 
 	Returns the list of written paths.
 	"""
-	model_name = _select_model_name(num_speakers)
-	separer = SepformerSeparation.from_hparams(source=model_name, savedir=str(output_dir / "sepformer_ckpt"))
+	separer = load_separator(num_speakers)
 
 	# Load wav: [channels, time]
 	waveform, sample_rate = torchaudio.load(str(wav_path))
@@ -0,0 +1,195 @@
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List
+
+from rich.console import Console
+
+
+console = Console()
+
+# A worker that exits sooner than this after starting counts as a failed start;
+# its slot is respawned with exponential backoff and given up after a few in a row.
+MIN_UPTIME_S = 10.0
+MAX_FAST_FAILURES = 5
+MAX_BACKOFF_S = 30.0
+
+
+def parse_args() -> argparse.Namespace:
+	parser = argparse.ArgumentParser(description="Pre-forked production server for the web app")
+	parser.add_argument("--host", type=str, default=os.environ.get("SERVE_HOST", "0.0.0.0"), help="Bind address")
+	parser.add_argument("--port", type=int, default=int(os.environ.get("SERVE_PORT", 5000)), help="Bind port")
+	parser.add_argument(
+		"--workers",
+		type=int,
+		default=int(os.environ.get("SERVE_WORKERS", 2)),
+		help="Number of forked worker processes (each handles one job at a time)",
+	)
+	parser.add_argument(
+		"--threads-per-worker",
+		type=int,
+		default=int(os.environ.get("SERVE_THREADS_PER_WORKER", 0)),
+		help="torch intra-op thread budget per worker (0 = cpu_count // workers)",
+	)
+	parser.add_argument(
+		"--whisper-models",
+		type=str,
+		default=os.environ.get("SERVE_WHISPER_MODELS", "base"),
+		help="Comma-separated Whisper models to preload in the master",
+	)
+	parser.add_argument(
+		"--num-speakers",
+		type=str,
+		default=os.environ.get("SERVE_NUM_SPEAKERS", "2,3"),
+		help="Comma-separated SepFormer speaker counts to preload in the master",
+	)
+	return parser.parse_args()
+
+
+def _split(value: str) -> List[str]:
+	return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def preload_models(whisper_models: List[str], speaker_counts: List[int]) -> None:
+	"""Load every model once in the master so forked workers share the weights copy-on-write."""
+	import torch
+	from separation.sepformer import load_separator
+	from transcription.whisper_transcriber import load_whisper_model
+
+	# Keep the master from spinning up an OpenMP pool before fork; workers
+	# pick their own budget afterwards.
+	torch.set_num_threads(1)
+	torch.set_grad_enabled(False)
+
+	for n in speaker_counts:
+		console.log(f"Preloading SepFormer ({n} speakers)")
+		load_separator(n)
+	for name in whisper_models:
+		console.log(f"Preloading Whisper '{name}'")
+		load_whisper_model(name)
+
+	# Move everything allocated so far out of the GC's reach; otherwise the
+	# first collection in each worker touches (and copies) every object page.
+	gc.collect()
+	gc.freeze()
+
+
+def _run_worker(listen_fd: int, host: str, port: int, threads: int) -> None:
+	import torch
+	from werkzeug.serving import make_server
+	from web.app import app
+
+	signal.signal(signal.SIGTERM, signal.SIG_DFL)
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	torch.set_num_threads(threads)
+	try:
+		torch.set_num_interop_threads(1)
+	except RuntimeError:
+		# Already fixed in the master; the intra-op budget is what matters.
+		pass
+
+	server = make_server(host, port, app, threaded=False, fd=listen_fd)
+	console.log(f"Worker {os.getpid()} serving with {threads} torch thread(s)")
+	server.serve_forever()
+
+
+def _spawn(listen_fd: int, host: str, port: int, threads: int) -> int:
+	pid = os.fork()
+	if pid == 0:
+		code = 0
+		try:
+			_run_worker(listen_fd, host, port, threads)
+		except Exception as e:
+			console.log(f"[red]Worker {os.getpid()} crashed: {e}[/red]")
+			code = 1
+		finally:
+			os._exit(code)
+	return pid
+
+
+def main() -> int:
+	args = parse_args()
+	if not hasattr(os, "fork"):
+		raise RuntimeError("Pre-forked serving requires a platform with os.fork()")
+	if args.workers < 1:
+		raise ValueError("--workers must be at least 1")
+
+	threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+	speaker_counts = [int(n) for n in _split(args.num_speakers)]
+	preload_models(_split(args.whisper_models), speaker_counts)
+
+	# Importing the app here (not just in workers) keeps Flask/template state shared too.
+	from web.app import app  # noqa: F401
+
+	sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+	sock.bind((args.host, args.port))
+	sock.listen(128)
+	sock.set_inheritable(True)
+	listen_fd = sock.fileno()
+
+	workers: Dict[int, int] = {}
+	started: Dict[int, float] = {}
+	failures: Dict[int, int] = {slot: 0 for slot in range(args.workers)}
+	stopping = False
+
+	def _shutdown(signum, frame):
+		nonlocal stopping
+		stopping = True
+		for pid in list(workers):
+			try:
+				os.kill(pid, signal.SIGTERM)
+			except ProcessLookupError:
+				pass
+
+	signal.signal(signal.SIGTERM, _shutdown)
+	signal.signal(signal.SIGINT, _shutdown)
+
+	for slot in range(args.workers):
+		workers[_spawn(listen_fd, args.host, args.port, threads)] = slot
+		started[slot] = time.monotonic()
+	console.log(f"Master {os.getpid()} listening on http://{args.host}:{args.port} with {args.workers} worker(s)")
+
+	# Slots waiting out their backoff: slot -> monotonic time of the respawn
+	respawn_at: Dict[int, float] = {}
+	while workers or (respawn_at and not stopping):
+		for slot, due in list(respawn_at.items()):
+			if not stopping and time.monotonic() >= due:
+				del respawn_at[slot]
+				workers[_spawn(listen_fd, args.host, args.port, threads)] = slot
+				started[slot] = time.monotonic()
+		try:
+			pid, status = os.waitpid(-1, os.WNOHANG) if respawn_at else os.wait()
+		except ChildProcessError:
+			pid, status = 0, 0
+		except InterruptedError:
+			continue
+		if pid == 0:
+			time.sleep(0.1)
+			continue
+		slot = workers.pop(pid, None)
+		if slot is None or stopping:
+			continue
+
+		failures[slot] = failures[slot] + 1 if time.monotonic() - started[slot] < MIN_UPTIME_S else 0
+		if failures[slot] >= MAX_FAST_FAILURES:
+			console.log(f"[red]Worker slot {slot} failed {failures[slot]} times in a row at startup; not respawning[/red]")
+			continue
+		delay = min(MAX_BACKOFF_S, 2 ** (failures[slot] - 1)) if failures[slot] else 0
+		console.log(f"[yellow]Worker {pid} exited (status {status}); respawning in {delay:g}s[/yellow]")
+		respawn_at[slot] = time.monotonic() + delay
+
+	sock.close()
+	if not stopping:
+		console.print("[bold red]Every worker failed to start; server stopped.[/bold red]")
+		return 1
+	console.print("[bold green]Server stopped.[/bold green]")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
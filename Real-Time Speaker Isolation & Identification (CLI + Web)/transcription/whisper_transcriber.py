@@ -4,6 +4,20 @@ from typing import Dict, Any, List
 import whisper
 
 
+# Loaded Whisper models keyed by name, shared by every call in the process.
+_MODELS: Dict[str, Any] = {}
+
+
+def load_whisper_model(model_name: str = "base") -> Any:
+	"""Return the Whisper model for model_name, loading it on first use."""
+	model = _MODELS.get(model_name)
+	if model is None:
+		model = whisper.load_model(model_name)
+		model.eval()
+		_MODELS[model_name] = model
+	return model
+
+
 def transcribe_files(audio_paths: List[Path], model_name: str = "base") -> Dict[str, Any]:
 	"""Transcribe each audio in audio_paths using Whisper.
 
@@ -12,7 +26,7 @@ def transcribe_files(audio_paths: List[Path], model_name: str = "base") -> Dict[
 	- segments: list of {start, end, text}
 	- text: concatenated transcript
 	"""
-	model = whisper.load_model(model_name)
+	model = load_whisper_model(model_name)
 	result: Dict[str, Any] = {}
 	for ap in audio_paths:
 		out = model.transcribe(str(ap), fp16=False, temperature=0.0)
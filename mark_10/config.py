@@ -4,6 +4,7 @@ Modify these settings based on your system and preferences.
 """
 
 import os
+import json
 from pathlib import Path
 
 # =============================================================================
@@ -23,6 +24,16 @@ LLAMA_MODEL_PATHS = [
     "/home/pi/models/llama-7b.gguf"
 ]
 
+# Model benchmark (python -m utils.llm_benchmark). With --select, the chosen
+# model is written to selection_path and preferred over LLAMA_MODEL_PATHS.
+LLM_BENCHMARK_CONFIG = {
+    'report_dir': './benchmarks',           # JSON and Markdown reports
+    'selection_path': './models/selected_model.json',
+    'max_tokens': 64,                       # Tokens generated per prompt
+    'min_gen_tps': 3.0,                     # Slowest acceptable generation (tokens/s)
+    'max_ttft_s': 8.0,                      # Slowest acceptable time to first token (s)
+}
+
 # YOLOv8 model (will be downloaded automatically if not present)
 YOLO_MODEL_PATH = "yolov8n.pt"
 
@@ -49,6 +60,53 @@ You are designed to be helpful, harmless, and honest. You can assist with variou
 including answering questions, providing explanations, and helping with general inquiries. 
 Keep your responses concise but informative."""
 
+# Fixed instructions at the start of every scene summary prompt. Kept first
+# so their KV cache is reused (and restored from disk after a reboot).
+SCENE_PROMPT_PREAMBLE = """Provide a brief, natural description of what a scene likely represents, based on the objects detected in it. Keep it concise and conversational, as if describing what you see to someone."""
+
+# Token budget for chat prompts (n_ctx minus reserve_tokens). Filled by
+# priority: system prompt, recent turns + running summary, retrieved memory.
+CONTEXT_CONFIG = {
+    'reserve_tokens': 320,        # Left free for the answer (max_tokens + margin)
+    'history_fraction': 0.6,      # Share of the budget for summary + recent turns
+    'max_memory_tokens': 300,     # Cap for retrieved memory
+    'max_summary_tokens': 128,    # Length of the running summary of older turns
+    'summary_idle_seconds': 5.0,  # Idle time before older turns are summarized
+    'max_turns': 20,              # Hard cap on turns kept verbatim
+}
+
+# On-disk KV cache for fixed prompt preambles (chat system prompt, scene
+# summary instructions), so the first interaction after boot skips their
+# prompt evaluation. Entries are keyed by model file hash and prefix text.
+KV_CACHE_CONFIG = {
+    'enabled': True,
+    'path': './kv_cache',         # Cache directory (on the SD card)
+    'max_size_mb': 512,           # Size bound; least recently used entries are evicted
+    'warm_on_startup': True,      # Load cached preambles at startup (False = on first use)
+}
+
+# Speculative decoding: a cheap drafter proposes tokens that the main model
+# verifies in one batch. Compare with python -m utils.llm_benchmark --speculative
+# (acceptance rate, generation tok/s) before enabling it on a deployment.
+SPECULATIVE_CONFIG = {
+    'enabled': False,             # Keeps logits for every position: n_ctx x vocab floats of extra RAM
+    'draft': 'prompt_lookup',     # 'prompt_lookup' or a small GGUF with the main model's tokenizer
+    'draft_tokens': 4,            # Tokens per step from a draft GGUF
+    'num_pred_tokens': 10,        # Tokens per step from prompt lookup
+    'max_ngram_size': 2,          # N-gram matched by prompt lookup
+}
+
+# llama.cpp settings tuned per model file and device (python -m utils.llm_tuner).
+# Every Llama(...) applies the stored profile on top of LLM_CONFIG.
+LLM_TUNING_CONFIG = {
+    'profile_path': './models/llm_profiles.json',
+    'tune_on_first_boot': True,   # Tune a model the first time it is loaded on this device
+    'prompt_tokens': 128,         # Prompt length of each benchmark run
+    'gen_tokens': 32,             # Tokens generated per benchmark run
+    'repeats': 2,                 # Timed runs per candidate (after one warm-up run)
+    'max_cv': 0.15,               # Max relative spread between runs of a stable candidate
+}
+
 # =============================================================================
 # CAMERA CONFIGURATION
 # =============================================================================
@@ -59,10 +117,22 @@ CAMERA_CONFIG = {
     'resolution': (1920, 1080),      # Camera resolution (width, height) - 1080p for proper quality
     'fps': 1,                        # Frames per second - 1 FPS for 1-second interval capture
     'capture_interval': 1.0,         # Interval in seconds between captures (1 second)
+    'background_capture': True,      # Keep the newest frames in a ring buffer so K3 needs no wait
+    'stream_fps': 5,                 # Max frames per second read in the background (and sensor rate)
+    'buffer_size': 4,                # Frames kept in the ring buffer
+    'detection_size': (640, 360),    # lores stream fed to YOLO (same aspect ratio as resolution; None = full frames)
     'use_picamera': True,            # Use picamera2 for Raspberry Pi (True recommended for Pi)
     'backend': None,                 # OpenCV backend (None for auto-detect, used as fallback)
 }
 
+# Saving captured images (on a background thread, off the detection path)
+IMAGE_SAVE_CONFIG = {
+    'queue_size': 4,                 # Images waiting to be written; more are dropped, never waited for
+    'jpeg_quality': 90,              # JPEG quality (0-100)
+    'use_turbojpeg': True,           # Encode with libjpeg-turbo if PyTurboJPEG is installed
+    'thumbnail_size': (320, 180),    # Thumbnail saved next to each image (None = none)
+}
+
 # =============================================================================
 # OBJECT DETECTION CONFIGURATION
 # =============================================================================
@@ -74,6 +144,15 @@ YOLO_CONFIG = {
     'max_detections': 100,        # Maximum number of detections
 }
 
+# Scene summaries reused when the same objects are detected again
+SCENE_CACHE_CONFIG = {
+    'enabled': True,
+    'max_entries': 256,                         # Least recently used scenes are evicted
+    'path': './kv_cache/scene_summaries.json',  # None to keep the cache in RAM only
+    'max_age_seconds': 7 * 86400,               # Regenerate older summaries (None = never)
+    'regenerate_probability': 0.0,              # Share of hits regenerated anyway, for variety
+}
+
 # =============================================================================
 # RAG CONFIGURATION
 # =============================================================================
@@ -82,9 +161,46 @@ YOLO_CONFIG = {
 RAG_CONFIG = {
     'collection_name': 'ai_assistant_kb',
     'embedding_model': 'all-MiniLM-L6-v2',
-    'chroma_db_path': './chroma_db',
+    'embedding_backend': 'sentence_transformers',  # or 'onnx' (int8, no torch import)
+    'onnx_model_dir': './models/all-MiniLM-L6-v2-onnx',
+    'embedding_cache_size': 512,  # Recently embedded texts kept in RAM
+    'embedding_batch_size': 32,   # Max texts per embedding model call
+    'backend': 'numpy',           # 'numpy' (memory-mapped, exact search), 'bm25' (keywords, no embedding model) or 'chroma'
+    'vector_store_path': './vector_store',
+    'bm25_store_path': './bm25_store',
+    'bm25_hybrid': 'auto',        # BM25 re-scoring with embeddings: True, False or 'auto' (only if already loaded)
+    'chroma_db_path': './chroma_db',  # Copied into a new numpy store automatically (or: python -m utils.vector_store)
     'max_context_length': 500,
     'n_results': 3,
+    'write_behind': True,         # Embed/insert new memories on a background thread
+    'write_batch_size': 16,       # Max memories embedded and inserted together
+    'flush_interval': 2.0,        # Idle seconds before a partial batch is written
+    'ingest_chunk_size': 800,     # Characters per knowledge-base chunk
+    'ingest_chunk_overlap': 100,  # Characters shared by consecutive chunks
+    'ingest_batch_size': 128,     # Chunks embedded and written per batch
+}
+
+# Answers to repeated chat questions, reused without running the LLM
+RESPONSE_CACHE_CONFIG = {
+    'enabled': True,
+    'max_entries': 256,            # Least recently used answers are evicted
+    'ttl_seconds': 24 * 3600,      # Answers older than this are regenerated
+    'semantic': True,              # Also match paraphrases with the RAG embedding model
+    'similarity_threshold': 0.95,  # Minimum cosine similarity of a paraphrase hit
+    'max_question_words': 20,      # Longer questions are not cached
+}
+
+# Chat-history compaction (runs while the assistant is idle)
+MEMORY_CONFIG = {
+    'enabled': True,
+    'idle_seconds': 120.0,         # Idle time before compaction may start
+    'min_interval_seconds': 3600,  # At most one run per interval
+    'duplicate_threshold': 0.95,   # Cosine similarity of near-duplicate memories
+    'cluster_threshold': 0.8,      # Cosine similarity within a summarized cluster
+    'min_cluster_size': 3,         # Smallest cluster worth summarizing
+    'summarize_after_days': 7,     # Only older memories are summarized
+    'max_age_days': 90,            # Memories older than this are dropped
+    'max_count': 2000,             # Oldest memories beyond this are dropped
 }
 
 # =============================================================================
@@ -93,10 +209,14 @@ RAG_CONFIG = {
 
 # System monitoring settings
 SYSTEM_CONFIG = {
-    'memory_threshold': 85,       # Memory usage threshold (%)
+    'memory_threshold': 85,       # Memory usage (%) above which idle modes' models are evicted
+    'preload_next_mode': True,    # Load the likely next mode's models in the background
     'cpu_threshold': 90,          # CPU usage threshold (%)
     'disk_threshold': 90,         # Disk usage threshold (%)
     'monitor_interval': 30,       # Monitoring interval (seconds)
+    'startup_workers': 3,         # Threads loading the LLM and modes in parallel at startup
+    'warm_up_models': True,       # Run one dummy inference per mode after loading
+    'import_budget_s': 1.5,       # Max cold import time of main.py (python -m utils.import_profile)
 }
 
 # Logging configuration
@@ -117,6 +237,8 @@ UI_CONFIG = {
     'show_system_info': True,     # Show system information
     'max_conversation_history': 10, # Maximum conversation history
     'auto_save_history': True,    # Auto-save conversation history
+    'stream_responses': True,     # Speak/display chat replies sentence by sentence
+    'speech_queue_size': 3,       # Max sentences waiting for TTS while generating
 }
 
 # =============================================================================
@@ -136,6 +258,13 @@ TEST_MODE = os.getenv('TEST_MODE', '0') == '1'
 def get_model_path(model_name: str) -> str:
     """Get the full path to a model file."""
     if model_name == 'llama':
+        try:
+            with open(LLM_BENCHMARK_CONFIG['selection_path']) as f:
+                selected = json.load(f)['model_path']
+            if Path(selected).exists():
+                return selected
+        except (OSError, ValueError, KeyError):
+            pass
         for path in LLAMA_MODEL_PATHS:
             if Path(path).exists():
                 return path
@@ -209,12 +338,21 @@ def validate_config() -> bool:
 # Export main configuration
 CONFIG = {
     'llama_model_paths': LLAMA_MODEL_PATHS,
+    'llm_benchmark_config': LLM_BENCHMARK_CONFIG,
     'yolo_model_path': YOLO_MODEL_PATH,
     'llm_config': LLM_CONFIG,
+    'context_config': CONTEXT_CONFIG,
+    'kv_cache_config': KV_CACHE_CONFIG,
+    'llm_tuning_config': LLM_TUNING_CONFIG,
+    'speculative_config': SPECULATIVE_CONFIG,
     'system_prompt': SYSTEM_PROMPT,
     'camera_config': CAMERA_CONFIG,
     'yolo_config': YOLO_CONFIG,
+    'scene_cache_config': SCENE_CACHE_CONFIG,
+    'image_save_config': IMAGE_SAVE_CONFIG,
+    'response_cache_config': RESPONSE_CACHE_CONFIG,
     'rag_config': RAG_CONFIG,
+    'memory_config': MEMORY_CONFIG,
     'system_config': SYSTEM_CONFIG,
     'logging_config': LOGGING_CONFIG,
     'ui_config': UI_CONFIG,
@@ -11,35 +11,61 @@ This application provides two modes:
 import sys
 import os
 import time
-from typing import Optional
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, TYPE_CHECKING
 
 # Add project root to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append("/usr/lib/python3/dist-packages")
 
-from modes.chat_mode import ChatMode
-from modes.object_mode import ObjectMode
 from utils.display_utils import DisplayManager
 from utils.button_utils import ButtonManager
 from utils.audio_utils import AudioManager
 from utils.system_utils import check_system_requirements
+from utils.model_manager import ModelManager
+from config import SYSTEM_CONFIG
+
+if TYPE_CHECKING:
+    # The modes (and llama_cpp, ultralytics, torch behind them) are imported
+    # by the startup workers, not when this module loads
+    from modes.chat_mode import ChatMode
+    from modes.object_mode import ObjectMode
 
 
 class AIAssistant:
     """Main controller for the AI Assistant application."""
     
     def __init__(self):
-        self.chat_mode: Optional[ChatMode] = None
-        self.object_mode: Optional[ObjectMode] = None
+        self.chat_mode: Optional["ChatMode"] = None
+        self.object_mode: Optional["ObjectMode"] = None
         self.display_manager: Optional[DisplayManager] = None
         self.button_manager: Optional[ButtonManager] = None
         self.audio_manager: Optional[AudioManager] = None
         self.current_mode = None
         self.running = True
+        
+        # Modes load in the background; each is 'loading', 'ready' or 'failed'
+        self.mode_status: Dict[str, str] = {'chat': 'loading', 'object': 'loading'}
+        self._status_lock = threading.Lock()
+        self._startup_executor: Optional[ThreadPoolExecutor] = None
+        self._startup_time = 0.0
+        
+        # Loads and evicts models per mode under SYSTEM_CONFIG['memory_threshold']
+        self.model_manager = ModelManager(SYSTEM_CONFIG)
+        self._swap_requested = False
     
     def initialize_components(self):
-        """Initialize all components (display, buttons, audio, modes)."""
+        """
+        Initialize hardware, then start loading the AI modes in parallel.
+        
+        Display, buttons and audio come up first so the device is responsive
+        within a second or two; the LLM, YOLO and the camera load on worker
+        threads and each mode becomes usable as soon as its own models are in.
+        """
         try:
+            self._startup_time = time.time()
             # Initialize display
             print("Initializing OLED display...")
             self.display_manager = DisplayManager(sda_pin=2, scl_pin=3)
@@ -64,26 +90,8 @@ class AIAssistant:
                 self.audio_manager.list_audio_devices()
             print("✅ Audio initialized")
             
-            # Initialize AI modes
-            print("Initializing AI models...")
-            self.chat_mode = ChatMode(
-                display_manager=self.display_manager,
-                audio_manager=self.audio_manager
-            )
-            self.object_mode = ObjectMode(
-                display_manager=self.display_manager,
-                audio_manager=self.audio_manager
-            )
-            print("✅ AI models initialized successfully!")
-            
-            # Show ready message
-            if self.display_manager:
-                self.display_manager.show_multiline([
-                    "AI Assistant",
-                    "Ready",
-                    "K1: Chat Mode",
-                    "K2: Object Mode"
-                ], clear_first=True)
+            # AI models load in the background; buttons already respond
+            self._start_model_loading()
             
             return True
             
@@ -93,6 +101,165 @@ class AIAssistant:
                 self.display_manager.show_text(f"Error: {str(e)[:20]}")
             return False
     
+    def _start_model_loading(self):
+        """Submit the LLM and per-mode loads to a thread pool."""
+        print("Loading AI models in the background...")
+        self._show_status()
+        self._startup_executor = ThreadPoolExecutor(
+            max_workers=SYSTEM_CONFIG.get('startup_workers', 3),
+            thread_name_prefix="startup"
+        )
+        # Both modes share the LLM; loading it on its own worker lets YOLO and
+        # the camera come up meanwhile instead of queueing behind it
+        self._startup_executor.submit(self._load_llm)
+        for name in ('chat', 'object'):
+            self.model_manager.set_loading(name, True)
+            self._startup_executor.submit(self._load_mode, name)
+        self._startup_executor.shutdown(wait=False)
+    
+    def _load_llm(self):
+        """Load the shared LLM."""
+        start = time.time()
+        try:
+            from utils.llm_utils import get_shared_llm
+            get_shared_llm()
+            print(f"✅ LLM loaded in {time.time() - start:.1f}s")
+        except Exception as e:
+            # The modes report the failure when they attach to it
+            print(f"❌ Error loading LLM: {e}")
+    
+    def _load_mode(self, name: str):
+        """
+        Construct and warm up one mode, then mark it ready.
+        
+        Args:
+            name: 'chat' or 'object'
+        """
+        start = time.time()
+        try:
+            if name == 'chat':
+                from modes.chat_mode import ChatMode
+                mode = ChatMode(display_manager=self.display_manager, audio_manager=self.audio_manager)
+            else:
+                from modes.object_mode import ObjectMode
+                mode = ObjectMode(display_manager=self.display_manager, audio_manager=self.audio_manager)
+            if SYSTEM_CONFIG.get('warm_up_models', True):
+                mode.warm_up()
+            
+            if name == 'chat':
+                self.chat_mode = mode
+            else:
+                self.object_mode = mode
+            self._register_models(name, mode)
+            status = 'ready'
+            print(f"✅ {name.capitalize()} mode ready in {time.time() - start:.1f}s")
+        except Exception as e:
+            status = 'failed'
+            print(f"❌ Error initializing {name} mode: {e}")
+        
+        self.model_manager.set_loading(name, False)
+        with self._status_lock:
+            self.mode_status[name] = status
+            all_ready = all(value == 'ready' for value in self.mode_status.values())
+        if all_ready:
+            print(f"✅ Application ready in {time.time() - self._startup_time:.1f}s")
+        self._show_status()
+    
+    def _register_models(self, name: str, mode):
+        """
+        Hand a loaded mode's models to the model manager.
+        
+        Args:
+            name: 'chat' or 'object'
+            mode: The constructed mode
+        """
+        from utils.llm_utils import get_shared_llm
+        
+        llm = get_shared_llm()
+        # Both modes register the shared LLM; the second one only adds its mode
+        self.model_manager.register(
+            'llm', llm.load, llm.unload, llm.is_loaded, modes=[name],
+            # Until measured, assume the whole GGUF ends up resident
+            size_mb=os.path.getsize(llm.model_path) / (1024 * 1024)
+        )
+        
+        if name == 'chat':
+            from utils.embedding_service import peek_embedding_service
+            embedder = peek_embedding_service()
+            if embedder:
+                self.model_manager.register(
+                    'embedder', lambda: embedder.encode("warm up", cache=False), embedder.unload,
+                    embedder.is_loaded, modes=['chat']
+                )
+        else:
+            self.model_manager.register(
+                'yolo', mode.load_detector, mode.unload_detector,
+                lambda: mode.yolo_model is not None, modes=['object']
+            )
+    
+    def _enter_mode(self, name: str):
+        """Make sure the mode's models are resident before it runs."""
+        try:
+            self.model_manager.enter_mode(name)
+        except Exception as e:
+            print(f"⚠️  Could not load models for {name} mode: {e}")
+    
+    def _request_model_swap(self, signum, frame):
+        """SIGUSR1 handler: reload the GGUF from the main loop."""
+        self._swap_requested = True
+    
+    def swap_llm(self, model_path: Optional[str] = None):
+        """
+        Hot-swap the LLM weights without restarting.
+        
+        Args:
+            model_path: New GGUF file (defaults to the first existing entry of
+                LLAMA_MODEL_PATHS, re-read so a replaced file is picked up)
+        """
+        from config import get_model_path
+        from utils.llm_utils import get_shared_llm
+        
+        model_path = model_path or get_model_path('llama')
+        if self.display_manager:
+            self.display_manager.show_text("Swapping LLM...", clear_first=True)
+        try:
+            get_shared_llm().swap_model(model_path)
+        except Exception as e:
+            print(f"❌ LLM swap failed: {e}")
+        self._show_status()
+    
+    def _show_status(self):
+        """Show per-mode readiness on the home screen."""
+        if not self.display_manager or self.current_mode is not None:
+            return
+        with self._status_lock:
+            status = dict(self.mode_status)
+        self.display_manager.show_multiline([
+            "AI Assistant",
+            f"Chat: {status['chat']}",
+            f"Object: {status['object']}",
+            "K1 Chat K2 Obj"
+        ], clear_first=True)
+    
+    def _mode_unavailable(self, name: str) -> bool:
+        """Tell the user when a mode is still loading or failed to load."""
+        with self._status_lock:
+            status = self.mode_status[name]
+        if status == 'ready':
+            return False
+        label = "Chat" if name == 'chat' else "Object"
+        if status == 'loading':
+            print(f"⏳ {label} mode is still loading...")
+            message = f"{label} loading..."
+            # Back to the home screen so the status updates when loading finishes
+            self.current_mode = None
+        else:
+            print(f"❌ {label} mode not initialized.")
+            message = f"{label} mode not init"
+        if self.display_manager:
+            self.display_manager.show_text(message, clear_first=True)
+        return True
+    
     def on_k1_pressed(self):
         """Handle K1 button press (Chat Mode)."""
         print("K1 pressed - Entering Chat Mode")
@@ -120,13 +287,11 @@ class AIAssistant:
     
     def run_chat_mode(self):
         """Run one chat cycle."""
-        if not self.chat_mode:
-            error_msg = "Chat mode not init"
-            print("❌ Chat mode not initialized.")
-            if self.display_manager:
-                self.display_manager.show_text(error_msg, clear_first=True)
+        if self._mode_unavailable('chat'):
             return
         
+        self._enter_mode('chat')
+        
         # Run one chat cycle (triggered by K1 button)
         try:
             self.chat_mode.run()
@@ -137,13 +302,11 @@ class AIAssistant:
     
     def run_object_mode(self):
         """Activate object detection mode."""
-        if not self.object_mode:
-            error_msg = "Object mode not init"
-            print("❌ Object mode not initialized.")
-            if self.display_manager:
-                self.display_manager.show_text(error_msg, clear_first=True)
+        if self._mode_unavailable('object'):
             return
         
+        self._enter_mode('object')
+        
         # Show object mode on display
         if self.display_manager:
             self.display_manager.show_object_mode()
@@ -171,17 +334,30 @@ class AIAssistant:
         
         # Main application loop - wait for button presses
         print("\n" + "="*60)
-        print("Application ready!")
+        print("Controls ready (models still loading)!")
         print("Press K1 for Chat Mode")
         print("Press K2 for Object Detection Mode")
         print("Press K3 in Object Mode to capture image")
         print("="*60 + "\n")
         
+        # kill -USR1 <pid> reloads the GGUF (e.g. after replacing the model file)
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self._request_model_swap)
+        
         try:
+            last_check = time.time()
             while self.running:
                 # Main loop - buttons handle mode switching via callbacks
                 time.sleep(0.1)
                 
+                if self._swap_requested:
+                    self._swap_requested = False
+                    self.swap_llm()
+                
+                if time.time() - last_check >= SYSTEM_CONFIG['monitor_interval']:
+                    last_check = time.time()
+                    self.model_manager.enforce_memory()
+                
         except KeyboardInterrupt:
             print("\n\n👋 Application interrupted. Goodbye!")
             if self.display_manager:
@@ -197,6 +373,10 @@ class AIAssistant:
         """Clean up resources."""
         print("Cleaning up resources...")
         
+        if self._startup_executor:
+            # Drop loads that have not started; running ones finish on their own
+            self._startup_executor.shutdown(wait=False, cancel_futures=True)
+        
         if self.display_manager:
             self.display_manager.cleanup()
         
@@ -206,8 +386,11 @@ class AIAssistant:
         if self.audio_manager:
             self.audio_manager.cleanup()
         
-        if self.object_mode and self.object_mode.camera_manager:
-            self.object_mode.camera_manager.cleanup()
+        if self.chat_mode:
+            self.chat_mode.cleanup()
+        
+        if self.object_mode:
+            self.object_mode.cleanup()
         
         print("✅ Cleanup complete")
 
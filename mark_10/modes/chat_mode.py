@@ -3,13 +3,18 @@ Chat Mode Implementation
 Handles text-based conversation using local LLM via llama.cpp with RAG support.
 """
 
-import os
 import time
-from typing import Optional, List, Dict
-from llama_cpp import Llama
-from utils.rag_utils import RAGManager
+from typing import Optional, List, Dict, Callable
+from utils.llm_utils import LLMManager, get_shared_llm, iter_sentences
+from utils.rag_utils import RAGManager, store_path_for
+from utils.context_packer import ContextPacker
+from utils.memory_compactor import MemoryCompactor
+from utils.response_cache import ResponseCache
+from utils.kv_cache import model_fingerprint
+from utils.embedding_service import get_embedding_service
 from utils.display_utils import DisplayManager
-from utils.audio_utils import AudioManager
+from utils.audio_utils import AudioManager, SpeechQueue
+from config import UI_CONFIG, KV_CACHE_CONFIG, CONTEXT_CONFIG, RAG_CONFIG, MEMORY_CONFIG, RESPONSE_CACHE_CONFIG
 
 
 class ChatMode:
@@ -18,11 +23,16 @@ class ChatMode:
     def __init__(self, display_manager: Optional[DisplayManager] = None,
                  audio_manager: Optional[AudioManager] = None):
         """Initialize chat mode with LLM and RAG."""
-        self.llm: Optional[Llama] = None
+        self.llm: Optional[LLMManager] = None
         self.rag_manager: Optional[RAGManager] = None
+        self.knowledge_base: Optional[RAGManager] = None
         self.display_manager = display_manager
         self.audio_manager = audio_manager
         self.conversation_history: List[Dict[str, str]] = []
+        self.context_packer: Optional[ContextPacker] = None
+        self.memory_compactor: Optional[MemoryCompactor] = None
+        self.response_cache: Optional[ResponseCache] = None
+        self._response_cache_model: Optional[str] = None
         self.system_prompt = """You are a helpful AI assistant running locally on a Raspberry Pi 5. 
 You are designed to be helpful, harmless, and honest. You can assist with various tasks 
 including answering questions, providing explanations, and helping with general inquiries. 
@@ -30,97 +40,160 @@ Keep your responses concise but informative."""
         
         self._initialize_rag()
         self._initialize_llm()
+        self._initialize_response_cache()
     
     def _initialize_rag(self):
         """Initialize RAG manager for conversation memory."""
         try:
-            self.rag_manager = RAGManager(collection_name="ai_assistant_chat_history")
+            backend = RAG_CONFIG.get('backend', 'numpy')
+            self.rag_manager = RAGManager(
+                collection_name="ai_assistant_chat_history",
+                backend=backend,
+                store_path=store_path_for(RAG_CONFIG),
+                hybrid=RAG_CONFIG.get('bm25_hybrid', 'auto'),
+                migrate_from=RAG_CONFIG.get('chroma_db_path'),
+                write_behind=RAG_CONFIG.get('write_behind', True),
+                write_batch_size=RAG_CONFIG.get('write_batch_size', 16),
+                flush_interval=RAG_CONFIG.get('flush_interval', 2.0)
+            )
             print("✅ RAG system initialized for chat history")
+            
+            # Ingested documents (python -m utils.document_ingest), read-only here
+            self.knowledge_base = RAGManager(
+                collection_name=RAG_CONFIG['collection_name'],
+                backend=backend,
+                store_path=store_path_for(RAG_CONFIG),
+                hybrid=RAG_CONFIG.get('bm25_hybrid', 'auto'),
+                migrate_from=RAG_CONFIG.get('chroma_db_path'),
+                write_behind=False
+            )
         except Exception as e:
             print(f"⚠️  RAG initialization failed: {e}")
             self.rag_manager = None
     
     def _initialize_llm(self):
-        """Initialize the local LLM using llama.cpp."""
+        """Attach to the process-wide LLM shared with the other modes."""
         try:
-            # Look for model file in common locations
-            model_paths = [
-                "./models/gemma-3-4b-it-IQ4_XS.gguf",
-                "./models/gemma-2b-it.Q6_K.gguf",
-                 #"gemma-2b-it.Q6_K.gguf",
-                "./models/llama-2-7b-chat.Q4_0.gguf",
-                "./models/llama-7b-q4_0.gguf",
-                "./models/llama-7b.gguf", 
-                "/home/pi/models/llama-7b-q4_0.gguf",
-                "/home/pi/models/llama-7b.gguf",
-                "llama-7b-q4_0.gguf"
-            ]
-            
-            model_path = None
-            for path in model_paths:
-                if os.path.exists(path):
-                    model_path = path
-                    break
-            
-            if not model_path:
-                raise FileNotFoundError(
-                    "LLM model file not found. Please download a GGUF model file and place it in the models directory."
-                )
-            
-            print(f"Loading LLM model from: {model_path}")
-            
-            # Initialize LLM with optimized settings for Raspberry Pi 5
-            self.llm = Llama(
-                model_path=model_path,
-                n_ctx=2048,  # Context window
-                n_threads=4,  # Number of threads
-                n_gpu_layers=0,  # CPU only for Pi 5
-                verbose=False
-            )
-            
-            print("✅ LLM initialized successfully!")
-            
+            self.llm = get_shared_llm()
+            self.context_packer = ContextPacker(self.llm, CONTEXT_CONFIG)
+            if self.rag_manager and self.rag_manager.is_available():
+                self.memory_compactor = MemoryCompactor(self.rag_manager, self.llm, MEMORY_CONFIG)
+                self.memory_compactor.touch()
+            if KV_CACHE_CONFIG.get('warm_on_startup') and self.llm.warm_prefix(self._preamble(), "chat"):
+                print("✅ Chat prompt preamble restored from KV cache")
         except Exception as e:
             print(f"❌ Error initializing LLM: {e}")
             raise
     
-    def generate_response(self, user_message: str) -> str:
-        """Generate a response to the user's message with RAG context."""
+    def _initialize_response_cache(self):
+        """Create the cache of answers to repeated questions."""
+        if not RESPONSE_CACHE_CONFIG.get('enabled'):
+            return
+        embedder = None
+        if RESPONSE_CACHE_CONFIG.get('semantic') and RAG_CONFIG.get('backend') != 'bm25':
+            # Same model as the RAG memory, so no extra RAM; BM25 deployments skip it
+            try:
+                embedder = get_embedding_service()
+            except Exception as e:
+                print(f"⚠️  Response cache limited to exact matches: {e}")
+        self.response_cache = ResponseCache(RESPONSE_CACHE_CONFIG, embedder)
+        self._response_cache_model = model_fingerprint(self.llm.model_path) if self.llm else None
+    
+    def _cached_response(self, user_message: str) -> Optional[str]:
+        """Look up a reusable answer, dropping answers of a previously loaded model."""
+        if not self.response_cache:
+            return None
+        # Keyed by file hash, so a model replaced under the same path also clears it
+        model = model_fingerprint(self.llm.model_path) if self.llm else None
+        if model != self._response_cache_model:
+            self.response_cache.clear()
+            self._response_cache_model = model
+        return self.response_cache.lookup(user_message)
+    
+    def warm_up(self):
+        """Evaluate the system preamble and touch the memory store before the first question."""
+        if self.llm:
+            # Loads the weights and leaves the preamble in the chat KV cache (and on disk)
+            try:
+                self.llm.complete(self._preamble(), cache_key="chat", persist_prefix=self._preamble(), max_tokens=1)
+            except Exception as e:
+                print(f"⚠️  Could not warm up the chat prompt: {e}")
+        if self.rag_manager and self.rag_manager.is_available():
+            self.rag_manager.search("hello", n_results=1)
+    
+    def _preamble(self) -> str:
+        """Fixed start of every chat prompt (cached on disk across restarts)."""
+        return f"System: {self.system_prompt}"
+    
+    def _report_prompt_stats(self):
+        """Print how much of the last prompt was served from the KV cache."""
+        stats = self.llm.last_prompt_stats if self.llm else {}
+        if stats:
+            usage = self.context_packer.last_usage if self.context_packer else {}
+            budget = f", budget {usage['used']}/{usage['budget']}" if usage else ""
+            print(f"\n🧠 Prompt tokens: {stats['prompt_tokens']} "
+                  f"(reused {stats['reused_tokens']}, evaluated {stats['evaluated_tokens']}{budget})")
+        generation = self.llm.get_generation_stats() if self.llm else {}
+        if generation.get('speculative'):
+            speculative = generation['speculative']
+            print(f"🚀 Generation: {generation['tokens_per_s']:.1f} tok/s, "
+                  f"draft acceptance {speculative['acceptance_rate']:.0%} ({speculative['draft']})")
+    
+    def _report_cache_hit(self, elapsed: float):
+        """Print the response cache hit rate and the generation time it saved."""
+        stats = self.response_cache.get_stats()
+        print(f"\n⚡ Cached answer in {elapsed * 1000:.0f}ms (hit rate {stats['hit_rate']:.0%}, "
+              f"{stats['exact_hits']} exact / {stats['semantic_hits']} similar, "
+              f"saved {stats['saved_seconds']:.1f}s so far)")
+    
+    def generate_response(self, user_message: str,
+                          on_sentence: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Generate a response to the user's message with RAG context.
+        
+        Args:
+            user_message: The user's message
+            on_sentence: Optional callback; when given, generation is streamed and
+                the callback receives each sentence as soon as it is complete
+        
+        Returns:
+            The full generated response
+        """
         if not self.llm:
             return "❌ LLM not initialized. Please restart the application."
         
         try:
-            # Get relevant context from RAG
-            rag_context = ""
-            if self.rag_manager and self.rag_manager.is_available():
-                rag_context = self.rag_manager.get_context_for_query(user_message, max_context_length=500)
-            
-            # Build conversation history context
-            history_context = ""
-            if self.conversation_history:
-                # Include last few exchanges for context
-                recent_history = self.conversation_history[-4:]  # Last 4 exchanges
-                history_parts = []
-                for exchange in recent_history:
-                    history_parts.append(f"Human: {exchange.get('user', '')}")
-                    history_parts.append(f"Assistant: {exchange.get('assistant', '')}")
-                history_context = "\n".join(history_parts) + "\n\n"
-            
-            # Create the conversation prompt with RAG context
-            prompt_parts = [f"System: {self.system_prompt}"]
-            if rag_context:
-                prompt_parts.append(rag_context)
-            if history_context:
-                prompt_parts.append("Previous conversation:")
-                prompt_parts.append(history_context)
-            prompt_parts.append(f"Human: {user_message}")
-            prompt_parts.append("Assistant:")
-            
-            prompt = "\n\n".join(prompt_parts)
+            self.context_packer.touch()
+            if self.memory_compactor:
+                self.memory_compactor.touch()
             
-            # Generate response
-            response = self.llm(
-                prompt,
+            start_time = time.time()
+            cached = self._cached_response(user_message)
+            if cached:
+                if on_sentence:
+                    for sentence in iter_sentences([cached]):
+                        on_sentence(sentence)
+                self._report_cache_hit(time.time() - start_time)
+                # Keep the conversation coherent; the exchange is already in RAG memory
+                self.conversation_history.append({'user': user_message, 'assistant': cached})
+                return cached
+            
+            # Get relevant memories from RAG (packed by token budget below)
+            results = []
+            for source in (self.rag_manager, self.knowledge_base):
+                if source and source.is_available():
+                    results.extend(source.search(user_message, n_results=RAG_CONFIG['n_results']))
+            results.sort(key=lambda result: result['distance'])
+            memory = [result['content'] for result in results]
+            
+            # Stable prefix first (system prompt, summary, recent turns) so
+            # llama.cpp can reuse its KV cache; per-turn context goes after it
+            self.context_packer.fit_history(self.conversation_history)
+            prompt = self.context_packer.pack(
+                self._preamble(), self.conversation_history, memory, user_message
+            )
+            
+            generation_params = dict(
                 max_tokens=256,
                 temperature=0.7,
                 top_p=0.9,
@@ -128,9 +201,30 @@ Keep your responses concise but informative."""
                 echo=False
             )
             
+            # Generate response
+            if on_sentence:
+                generated_parts: List[str] = []
+                
+                def _collect():
+                    for piece in self.llm.stream(prompt, cache_key="chat",
+                                                 persist_prefix=self._preamble(), **generation_params):
+                        generated_parts.append(piece)
+                        yield piece
+                
+                for sentence in iter_sentences(_collect()):
+                    on_sentence(sentence)
+                
+                response = {'choices': [{'text': "".join(generated_parts)}]} if generated_parts else None
+            else:
+                response = self.llm.complete(prompt, cache_key="chat",
+                                             persist_prefix=self._preamble(), **generation_params)
+            self._report_prompt_stats()
+            
             # Extract the generated text
             if response and 'choices' in response and len(response['choices']) > 0:
                 generated_text = response['choices'][0]['text'].strip()
+                if self.response_cache:
+                    self.response_cache.store(user_message, generated_text, time.time() - start_time)
                 
                 # Store conversation in history
                 self.conversation_history.append({
@@ -144,13 +238,10 @@ Keep your responses concise but informative."""
                     conversation_text = f"User: {user_message}\nAssistant: {generated_text}"
                     self.rag_manager.add_document(
                         conversation_text,
-                        metadata={"type": "conversation", "user_message": user_message[:50]}
+                        metadata={"type": "conversation", "user_message": user_message[:50],
+                                  "timestamp": time.time()}
                     )
                 
-                # Limit conversation history size
-                if len(self.conversation_history) > 20:
-                    self.conversation_history = self.conversation_history[-20:]
-                
                 return generated_text
             else:
                 return "❌ Failed to generate response. Please try again."
@@ -213,6 +304,10 @@ Keep your responses concise but informative."""
             
             print(f"\nAssistant: ", end="", flush=True)
             
+            if UI_CONFIG.get('stream_responses', True):
+                self._respond_streaming(user_input)
+                return
+            
             # Generate response
             response = self.generate_response(user_input)
             print(response)
@@ -235,3 +330,42 @@ Keep your responses concise but informative."""
                 self.display_manager.show_text(error_msg, clear_first=True)
             if self.audio_manager:
                 self.audio_manager.speak("Error occurred. Please try again.")
+    
+    def _respond_streaming(self, user_input: str):
+        """Stream the response, speaking and displaying each sentence as it completes."""
+        speech = SpeechQueue(self.audio_manager, maxsize=UI_CONFIG.get('speech_queue_size', 3)) \
+            if self.audio_manager else None
+        spoken: List[str] = []
+        
+        def on_sentence(sentence: str):
+            spoken.append(sentence)
+            print(sentence, end=" ", flush=True)
+            if self.display_manager:
+                self.display_manager.show_streaming_text("AI: " + " ".join(spoken))
+            if speech:
+                speech.put(sentence)
+        
+        try:
+            response = self.generate_response(user_input, on_sentence=on_sentence)
+            if not spoken:
+                # Nothing was streamed (e.g. an error message); say it in one go
+                print(response, end="")
+                if self.display_manager:
+                    self.display_manager.show_streaming_text(f"AI: {response}")
+                if speech:
+                    speech.put(response)
+            print()
+        finally:
+            if speech:
+                speech.close()
+    
+    def cleanup(self):
+        """Stop background work and write out pending memories."""
+        if self.context_packer:
+            self.context_packer.cleanup()
+        if self.memory_compactor:
+            self.memory_compactor.cleanup()
+        if self.rag_manager:
+            self.rag_manager.close()
+        if self.knowledge_base:
+            self.knowledge_base.close()
@@ -2,19 +2,25 @@
 Object Detection Mode Implementation
 Handles camera-based object detection using YOLOv8 and scene summarization using LLM.
 """
-import os
-import cv2
+import hashlib
+import threading
 import numpy as np
 from datetime import datetime
-from typing import List, Optional, Tuple
-from ultralytics import YOLO
-from llama_cpp import Llama
+from typing import List, Optional, Tuple, TYPE_CHECKING
 from pathlib import Path
 
 from utils.camera_utils import CameraManager
+from utils.llm_utils import LLMManager, get_shared_llm
 from utils.display_utils import DisplayManager
 from utils.audio_utils import AudioManager
-from config import CAMERA_CONFIG
+from utils.summary_cache import SceneSummaryCache
+from utils.image_writer import ImageWriter
+from utils.kv_cache import model_fingerprint
+from config import (CAMERA_CONFIG, KV_CACHE_CONFIG, YOLO_MODEL_PATH, SCENE_PROMPT_PREAMBLE, SCENE_CACHE_CONFIG,
+                    IMAGE_SAVE_CONFIG)
+
+if TYPE_CHECKING:
+    from ultralytics import YOLO
 
 
 class ObjectMode:
@@ -23,59 +29,58 @@ class ObjectMode:
     def __init__(self, display_manager: Optional[DisplayManager] = None, 
                  audio_manager: Optional[AudioManager] = None):
         """Initialize object detection mode with YOLOv8 and LLM."""
-        self.yolo_model: Optional[YOLO] = None
-        self.llm: Optional[Llama] = None
+        self.yolo_model: Optional["YOLO"] = None
+        self.llm: Optional[LLMManager] = None
         self.camera_manager: Optional[CameraManager] = None
         self.display_manager = display_manager
         self.audio_manager = audio_manager
+        self.summary_cache: Optional[SceneSummaryCache] = None
+        if SCENE_CACHE_CONFIG.get('enabled'):
+            self.summary_cache = SceneSummaryCache(
+                max_entries=SCENE_CACHE_CONFIG['max_entries'],
+                path=SCENE_CACHE_CONFIG.get('path'),
+                max_age_seconds=SCENE_CACHE_CONFIG.get('max_age_seconds'),
+                regenerate_probability=SCENE_CACHE_CONFIG.get('regenerate_probability', 0.0)
+            )
         
         # Create images directory
         self.images_dir = Path("./captured_images")
         self.images_dir.mkdir(exist_ok=True)
+        self.image_writer = ImageWriter(
+            max_queue=IMAGE_SAVE_CONFIG['queue_size'],
+            jpeg_quality=IMAGE_SAVE_CONFIG['jpeg_quality'],
+            thumbnail_size=IMAGE_SAVE_CONFIG.get('thumbnail_size'),
+            use_turbojpeg=IMAGE_SAVE_CONFIG.get('use_turbojpeg', True)
+        )
+        
+        # The picamera2 warm-up is mostly waiting, so it overlaps the model load
+        camera_errors: List[Exception] = []
         
-        self._initialize_models()
-        self._initialize_camera()
+        def _camera():
+            try:
+                self._initialize_camera()
+            except Exception as e:
+                camera_errors.append(e)
+        
+        camera_thread = threading.Thread(target=_camera, name="camera-init", daemon=True)
+        camera_thread.start()
+        try:
+            self._initialize_models()
+        finally:
+            camera_thread.join()
+        if camera_errors:
+            raise camera_errors[0]
     
     def _initialize_models(self):
         """Initialize YOLOv8 and LLM models."""
         try:
-            # Initialize YOLOv8 model
-            print("Loading YOLOv8 model...")
-            self.yolo_model = YOLO('yolov8n.pt')  # nano version for Pi 5
-            print("✅ YOLOv8 model loaded successfully!")
+            self.load_detector()
             
-            # Initialize LLM for scene summarization
+            # Scene summarization shares the chat mode's LLM instance
             print("Loading LLM for scene summarization...")
-            model_paths = [
-                "./models/gemma-3-4b-it-IQ4_XS.gguf",
-                "./models/gemma-2b-it.Q6_K.gguf",
-                 #"gemma-2b-it.Q6_K.gguf",
-                "./models/llama-2-7b-chat.Q4_0.gguf",
-                "./models/llama-7b-q4_0.gguf",
-                "./models/llama-7b.gguf",
-                "/home/pi/models/llama-7b-q4_0.gguf",
-                "/home/pi/models/llama-7b.gguf",
-                "llama-7b-q4_0.gguf"
-            ]
-            
-            model_path = None
-            for path in model_paths:
-                if os.path.exists(path):
-                    model_path = path
-                    break
-            
-            if not model_path:
-                raise FileNotFoundError(
-                    "LLM model file not found for scene summarization."
-                )
-            
-            self.llm = Llama(
-                model_path=model_path,
-                n_ctx=1024,  # Smaller context for summarization
-                n_threads=4,
-                n_gpu_layers=0,
-                verbose=False
-            )
+            self.llm = get_shared_llm()
+            if KV_CACHE_CONFIG.get('warm_on_startup'):
+                self.llm.warm_prefix(SCENE_PROMPT_PREAMBLE, "object")
             
             print("✅ LLM for scene summarization loaded successfully!")
             
@@ -83,13 +88,31 @@ class ObjectMode:
             print(f"❌ Error initializing models: {e}")
             raise
     
+    def load_detector(self) -> "YOLO":
+        """Load YOLOv8 if it is not resident (it may have been evicted to free memory)."""
+        if self.yolo_model is None:
+            print("Loading YOLOv8 model...")
+            # ultralytics pulls in torch; importing it here overlaps the camera warm-up
+            from ultralytics import YOLO
+            self.yolo_model = YOLO(YOLO_MODEL_PATH)  # nano version for Pi 5
+            print("✅ YOLOv8 model loaded successfully!")
+        return self.yolo_model
+    
+    def unload_detector(self):
+        """Drop the YOLOv8 model; the next capture loads it again."""
+        self.yolo_model = None
+    
     def _initialize_camera(self):
         """Initialize camera manager with proper configuration."""
         try:
             self.camera_manager = CameraManager(
                 camera_index=CAMERA_CONFIG['index'],
                 resolution=CAMERA_CONFIG['resolution'],
-                use_picamera=CAMERA_CONFIG['use_picamera']
+                use_picamera=CAMERA_CONFIG['use_picamera'],
+                background_capture=CAMERA_CONFIG.get('background_capture', False),
+                stream_fps=CAMERA_CONFIG.get('stream_fps', 5),
+                buffer_size=CAMERA_CONFIG.get('buffer_size', 4),
+                detection_size=CAMERA_CONFIG.get('detection_size')
             )
             # Set capture interval from config
             self.camera_manager.set_capture_interval(CAMERA_CONFIG['capture_interval'])
@@ -98,40 +121,51 @@ class ObjectMode:
             print(f"❌ Error initializing camera: {e}")
             raise
     
+    def warm_up(self):
+        """Run one dummy inference so the first capture does not pay for it."""
+        if self.yolo_model:
+            self.yolo_model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+    
     def capture_and_detect(self, save_image: bool = True) -> Tuple[np.ndarray, List[str], str]:
         """
         Capture an image and detect objects.
         
         Args:
-            save_image: Whether to save the captured image
+            save_image: Whether to save the captured image (written in the
+                background; the file appears at image_path shortly after)
         
         Returns:
-            Tuple of (image, detected_objects, image_path)
+            Tuple of (detection image, detected_objects, image_path)
         """
-        if not self.camera_manager or not self.yolo_model:
-            raise RuntimeError("Camera or YOLO model not initialized")
+        if not self.camera_manager:
+            raise RuntimeError("Camera not initialized")
+        # Local reference: the model manager may evict the detector meanwhile
+        yolo_model = self.load_detector()
         
         # Show capture image on display
         if self.display_manager:
             self.display_manager.show_capture_image()
         
-        # Capture image
+        # Capture image (small detection frame; YOLO would downsize a full one anyway)
         print("Capturing image...")
-        image = self.camera_manager.capture_image()
+        if save_image and self.camera_manager.detection_size:
+            # Full-resolution frame from the same request, so the photo shows what was detected
+            full_image, image = self.camera_manager.capture_image_pair()
+        else:
+            image = full_image = self.camera_manager.capture_detection_image()
         
         if image is None:
             raise RuntimeError("Failed to capture image")
         
-        # Save image
+        # Save image (encoded and written on the writer thread)
         image_path = ""
         if save_image:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             image_path = str(self.images_dir / f"capture_{timestamp}.jpg")
-            
-            # Convert RGB to BGR for OpenCV save
-            image_bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-            cv2.imwrite(image_path, image_bgr)
-            print(f"✅ Image saved to {image_path}")
+            if self.image_writer.submit(full_image, image_path):
+                print(f"💾 Saving image to {image_path}")
+            else:
+                image_path = ""
         
         # Show detecting on display
         if self.display_manager:
@@ -139,7 +173,7 @@ class ObjectMode:
         
         # Run object detection
         print("Running object detection...")
-        results = self.yolo_model(image)
+        results = yolo_model(image)
         
         # Extract detected objects
         detected_objects = []
@@ -148,7 +182,7 @@ class ObjectMode:
             if result.boxes is not None:
                 for box in result.boxes:
                     class_id = int(box.cls[0])
-                    class_name = self.yolo_model.names[class_id]
+                    class_name = yolo_model.names[class_id]
                     confidence = float(box.conf[0])
                     
                     # Only include objects with confidence > 0.5
@@ -165,17 +199,27 @@ class ObjectMode:
         if not detected_objects:
             return "No objects detected in the scene."
         
+        # Same objects as an earlier capture: reuse its description
+        version = self._summary_version()
+        if self.summary_cache:
+            cached = self.summary_cache.get(detected_objects, version)
+            if cached:
+                print("⚡ Scene summary from cache")
+                return cached
+        
         # Create prompt for scene summarization
         objects_text = ", ".join(detected_objects)
-        prompt = f"""Based on the detected objects: {objects_text}
+        prompt = f"""{SCENE_PROMPT_PREAMBLE}
 
-Provide a brief, natural description of what this scene likely represents. Keep it concise and conversational, as if describing what you see to someone.
+Detected objects: {objects_text}
 
 Scene description:"""
         
         try:
-            response = self.llm(
+            response = self.llm.complete(
                 prompt,
+                cache_key="object",
+                persist_prefix=SCENE_PROMPT_PREAMBLE,
                 max_tokens=128,
                 temperature=0.7,
                 top_p=0.9,
@@ -185,6 +229,8 @@ Scene description:"""
             
             if response and 'choices' in response and len(response['choices']) > 0:
                 summary = response['choices'][0]['text'].strip()
+                if summary and self.summary_cache:
+                    self.summary_cache.put(detected_objects, summary, version)
                 return summary
             else:
                 return f"I can see {objects_text} in this scene."
@@ -192,6 +238,11 @@ Scene description:"""
         except Exception as e:
             return f"I can see {objects_text} in this scene."
     
+    def _summary_version(self) -> str:
+        """Identify the prompt and model, so cached summaries from others are not reused."""
+        model = model_fingerprint(self.llm.model_path) if self.llm else ""
+        return hashlib.sha256(f"{SCENE_PROMPT_PREAMBLE}\0{model}".encode('utf-8')).hexdigest()[:12]
+    
     def analyze_scene(self):
         """Analyze the current scene and provide a summary."""
         try:
@@ -245,7 +296,7 @@ Scene description:"""
         Note: This method just sets up the mode. 
         Actual capture is triggered by K3 button press via analyze_scene().
         """
-        if not self.yolo_model or not self.camera_manager:
+        if not self.camera_manager:
             error_msg = "Models not init"
             print("❌ Object detection mode not available. Models not initialized.")
             if self.display_manager:
@@ -258,3 +309,9 @@ Scene description:"""
         
         print("Object detection mode is ready!")
         print("Press K3 to capture and analyze image")
+    
+    def cleanup(self):
+        """Finish pending image writes, then release the camera."""
+        self.image_writer.close()
+        if self.camera_manager:
+            self.camera_manager.cleanup()
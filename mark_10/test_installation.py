@@ -101,6 +101,107 @@ def test_rag():
         return False
 
 
+def test_embedding_parity():
+    """Test that the int8 ONNX embedding backend matches the PyTorch model."""
+    print("\n🧮 Testing ONNX embedding parity...")
+    try:
+        from config import RAG_CONFIG
+        from utils.embedding_service import load_embedder, BENCHMARK_TEXTS
+        
+        onnx_dir = RAG_CONFIG['onnx_model_dir']
+        if not Path(onnx_dir).exists():
+            print(f"⚠️  No ONNX model in {onnx_dir} - export it with: python -m utils.embedding_service --export {onnx_dir}")
+            return True
+        
+        model_name = RAG_CONFIG['embedding_model']
+        reference = load_embedder('sentence_transformers', model_name).encode(BENCHMARK_TEXTS)
+        candidate = load_embedder('onnx', model_name, onnx_dir).encode(BENCHMARK_TEXTS)
+        
+        # Vectors are normalized, so the row-wise dot product is the cosine similarity
+        similarity = (reference * candidate).sum(axis=1)
+        print(f"   Cosine similarity to PyTorch: min {similarity.min():.4f}, mean {similarity.mean():.4f}")
+        
+        # Retrieval must not change: same nearest neighbour for every text
+        same_ranking = ((reference @ reference.T).argsort(axis=1)[:, -2] ==
+                        (candidate @ candidate.T).argsort(axis=1)[:, -2]).all()
+        
+        if similarity.min() >= 0.98 and same_ranking:
+            print("✅ ONNX embedding parity test passed")
+            return True
+        print("❌ ONNX embeddings differ too much from the PyTorch model")
+        return False
+    except Exception as e:
+        print(f"❌ ONNX embedding parity test failed: {e}")
+        return False
+
+
+def benchmark_embeddings():
+    """Benchmark encode latency and RSS of both embedding backends."""
+    print("\n⏱️  Benchmarking embedding backends...")
+    import json
+    import subprocess
+    from config import RAG_CONFIG
+    
+    for backend in ('sentence_transformers', 'onnx'):
+        # Fresh interpreter per backend so RSS only counts what that backend imports
+        result = subprocess.run(
+            [sys.executable, '-m', 'utils.embedding_service', '--benchmark', backend,
+             '--model', RAG_CONFIG['embedding_model'], '--onnx-dir', RAG_CONFIG['onnx_model_dir']],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"⚠️  {backend}: benchmark failed ({result.stderr.strip().splitlines()[-1:]})")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"   {backend:<22} load {stats['load_s']:.1f}s | 1 text {stats['single_ms']:.1f}ms | "
+              f"16 texts {stats['batch_ms']:.1f}ms | RSS {stats['rss_mb']:.0f}MB | "
+              f"torch imported: {stats['torch_imported']}")
+    return True
+
+
+def test_import_budget():
+    """Test that importing main.py stays fast and loads no heavy libraries."""
+    print("\n🚀 Testing startup import time...")
+    try:
+        from config import SYSTEM_CONFIG
+        from utils.import_profile import profile_imports
+        
+        budget = SYSTEM_CONFIG.get('import_budget_s', 1.5)
+        report = profile_imports('main')
+        slowest = ", ".join(f"{entry['module'].strip()} {entry['cumulative_ms']:.0f}ms"
+                            for entry in report['imports'][:3])
+        print(f"   Cold import of main.py: {report['total_s']:.2f}s (budget {budget:.2f}s); slowest: {slowest}")
+        
+        if report['heavy_loaded']:
+            print(f"❌ Heavy libraries imported at startup: {', '.join(report['heavy_loaded'])}")
+            return False
+        if report['total_s'] > budget:
+            print("❌ Startup imports exceed the budget - see: python -m utils.import_profile")
+            return False
+        print("✅ Import budget test passed")
+        return True
+    except Exception as e:
+        print(f"❌ Import budget test failed: {e}")
+        return False
+
+
+def benchmark_llms():
+    """Benchmark every available GGUF model (see utils/llm_benchmark.py)."""
+    print("\n⏱️  Benchmarking LLMs...")
+    from config import LLM_BENCHMARK_CONFIG
+    from utils.llm_benchmark import available_models, run_benchmarks, format_markdown, write_reports
+    
+    models = available_models()
+    if not models:
+        print("❌ No GGUF models found")
+        return False
+    results = run_benchmarks(models, LLM_BENCHMARK_CONFIG['max_tokens'])
+    print(format_markdown(results))
+    paths = write_reports(results, LLM_BENCHMARK_CONFIG['report_dir'])
+    print(f"📄 Reports: {paths['json']}, {paths['markdown']}")
+    return all('error' not in result for result in results)
+
+
 def test_system_utils():
     """Test system utilities."""
     print("\n⚙️ Testing system utilities...")
@@ -126,7 +227,8 @@ def test_project_structure():
         'utils/camera_utils.py',
         'utils/llm_utils.py',
         'utils/rag_utils.py',
-        'utils/system_utils.py'
+        'utils/system_utils.py',
+        'utils/import_profile.py'
     ]
     
     required_dirs = [
@@ -172,6 +274,8 @@ def main():
         ("YOLOv8", test_yolo),
         ("llama.cpp", test_llama),
         ("RAG Components", test_rag),
+        ("ONNX Embeddings", test_embedding_parity),
+        ("Import Budget", test_import_budget),
         ("System Utilities", test_system_utils),
         ("Camera", test_camera)
     ]
@@ -215,6 +319,10 @@ def main():
 
 
 if __name__ == "__main__":
+    if '--benchmark-embeddings' in sys.argv:
+        sys.exit(0 if benchmark_embeddings() else 1)
+    if '--benchmark-llms' in sys.argv:
+        sys.exit(0 if benchmark_llms() else 1)
     try:
         success = main()
         sys.exit(0 if success else 1)
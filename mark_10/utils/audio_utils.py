@@ -318,3 +318,51 @@ class AudioManager:
             except:
                 pass
 
+
+class SpeechQueue:
+    """Speaks queued sentences on a worker thread while the producer keeps going.
+    
+    The queue is bounded, so a producer that runs far ahead of the speaker
+    (e.g. LLM generation) blocks on put() instead of buffering a whole answer.
+    """
+    
+    def __init__(self, audio_manager: Optional[AudioManager], maxsize: int = 3):
+        """
+        Start the speech worker.
+        
+        Args:
+            audio_manager: AudioManager used for text-to-speech (None prints instead)
+            maxsize: Maximum number of sentences waiting to be spoken
+        """
+        self.audio_manager = audio_manager
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+    
+    def _run(self):
+        while True:
+            text = self._queue.get()
+            try:
+                if text is None:
+                    return
+                if self.audio_manager:
+                    self.audio_manager.speak(text)
+                else:
+                    print(f"[TTS] {text}")
+            finally:
+                self._queue.task_done()
+    
+    def put(self, text: str):
+        """Queue a sentence to be spoken, blocking while the queue is full."""
+        if text and text.strip():
+            self._queue.put(text.strip())
+    
+    def close(self, timeout: Optional[float] = None):
+        """
+        Wait for all queued sentences to be spoken and stop the worker.
+        
+        Args:
+            timeout: Maximum seconds to wait for the worker (None waits forever)
+        """
+        self._queue.put(None)
+        self._worker.join(timeout=timeout)
@@ -0,0 +1,259 @@
+"""
+BM25 Store
+Lexical memory backend that needs no embedding model.
+
+For short chat-history recall, keyword overlap is often enough, and it costs
+no model load and almost no RAM. BM25Store keeps an in-process inverted index
+that is updated incrementally on add/delete. On disk it stores only the
+documents, as an append-only JSON lines log (the same layout as
+NumpyVectorStore without the vector file); the index is rebuilt from the log
+on startup, which takes milliseconds for a few thousand entries.
+"""
+
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from utils.vector_store import VectorStore, replay_record_log
+
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do for from has have how i if in is it its me my of on or so that the
+their them there this to was we what when where which who will with you your
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split into words, drop stopwords and plural 's'."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Store(VectorStore):
+    """Okapi BM25 over an incrementally maintained inverted index."""
+
+    def __init__(self, path: str, collection_name: str, k1: float = 1.5, b: float = 0.75,
+                 compact_ratio: float = 0.25, compact_min_rows: int = 256):
+        """
+        Open (or create) a collection.
+
+        Args:
+            path: Root directory of the store
+            collection_name: Collection name (one subdirectory per collection)
+            k1: BM25 term-frequency saturation
+            b: BM25 document-length normalization
+            compact_ratio: Rewrite the log when this share of entries is deleted
+            compact_min_rows: ... and at least this many entries are deleted
+        """
+        self.directory = Path(path) / collection_name
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+        self.compact_min_rows = compact_min_rows
+
+        self._lock = threading.RLock()
+        self.generation = 0
+        self._documents: Dict[str, str] = {}
+        self._metadatas: Dict[str, Dict[str, Any]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._log_entries = 0
+        self._log = None
+
+        self.is_new = not (self.directory / "store.json").exists()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.is_new:
+            self._write_header()
+        else:
+            self._load()
+
+    # ------------------------------------------------------------------
+    # Files
+    # ------------------------------------------------------------------
+
+    def _records_path(self, generation: int) -> Path:
+        return self.directory / f"records.{generation}.jsonl"
+
+    def _write_header(self):
+        tmp_path = self.directory / "store.json.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'format': 'bm25', 'generation': self.generation}, f)
+        os.replace(tmp_path, self.directory / "store.json")
+
+    def _load(self):
+        with open(self.directory / "store.json") as f:
+            self.generation = json.load(f)['generation']
+
+        for record in replay_record_log(self._records_path(self.generation)):
+            self._log_entries += 1
+            if record['op'] == 'add':
+                self._index(record['id'], record['document'], record['metadata'])
+            elif record['op'] == 'delete':
+                self._unindex(record['id'])
+
+    def _open_log(self):
+        if self._log is None:
+            self._log = open(self._records_path(self.generation), 'a')
+        return self._log
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+
+    def _index(self, doc_id: str, document: str, metadata: Optional[Dict[str, Any]]):
+        self._unindex(doc_id)
+        terms = Counter(tokenize(document))
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._documents[doc_id] = document
+        self._metadatas[doc_id] = metadata or {}
+        self._lengths[doc_id] = sum(terms.values())
+        self._total_length += self._lengths[doc_id]
+
+    def _unindex(self, doc_id: str):
+        document = self._documents.pop(doc_id, None)
+        if document is None:
+            return
+        for term in set(tokenize(document)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._metadatas.pop(doc_id, None)
+        self._total_length -= self._lengths.pop(doc_id, 0)
+
+    # ------------------------------------------------------------------
+    # VectorStore API
+    # ------------------------------------------------------------------
+
+    def add(self, ids, embeddings, documents, metadatas=None):
+        """Add documents (embeddings are ignored and may be None); existing ids are replaced."""
+        metadatas = metadatas or [{} for _ in ids]
+        with self._lock:
+            log = self._open_log()
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                log.write(json.dumps({'op': 'add', 'id': doc_id, 'document': document,
+                                      'metadata': metadata or {}}) + "\n")
+                self._index(doc_id, document, metadata)
+                self._log_entries += 1
+            log.flush()
+
+    def query(self, query_embeddings, n_results=3):
+        raise NotImplementedError("BM25Store is searched by text; use query_text()")
+
+    def query_text(self, query: str, n_results: int = 3) -> Dict[str, List[List[Any]]]:
+        """
+        Rank documents for a text query with BM25.
+
+        Args:
+            query: Query text
+            n_results: Number of results
+
+        Returns:
+            ChromaDB-style result dict for one query, plus 'scores' (raw BM25);
+            distances are 1 / (1 + score)
+        """
+        with self._lock:
+            n_docs = len(self._documents)
+            scores: Dict[str, float] = {}
+            if n_docs:
+                avg_length = self._total_length / n_docs or 1.0
+                for term in set(tokenize(query)):
+                    postings = self._postings.get(term)
+                    if not postings:
+                        continue
+                    idf = math.log(1.0 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, tf in postings.items():
+                        norm = self.k1 * (1.0 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+            return {
+                'ids': [[doc_id for doc_id, _ in ranked]],
+                'documents': [[self._documents[doc_id] for doc_id, _ in ranked]],
+                'metadatas': [[self._metadatas[doc_id] for doc_id, _ in ranked]],
+                'distances': [[1.0 / (1.0 + score) for _, score in ranked]],
+                'scores': [[score for _, score in ranked]],
+            }
+
+    def get(self, ids=None, include_embeddings=False):
+        with self._lock:
+            ids = [doc_id for doc_id in ids if doc_id in self._documents] if ids is not None \
+                else list(self._documents)
+            # No embeddings are stored; callers that need them compute their own
+            return {
+                'ids': ids,
+                'documents': [self._documents[doc_id] for doc_id in ids],
+                'metadatas': [self._metadatas[doc_id] for doc_id in ids],
+            }
+
+    def delete(self, ids):
+        with self._lock:
+            log = self._open_log()
+            for doc_id in ids:
+                if doc_id in self._documents:
+                    self._unindex(doc_id)
+                    log.write(json.dumps({'op': 'delete', 'id': doc_id}) + "\n")
+                    self._log_entries += 1
+            log.flush()
+
+            dead = self._log_entries - len(self._documents)
+            if dead >= self.compact_min_rows and dead > self.compact_ratio * self._log_entries:
+                self.compact()
+
+    def count(self):
+        with self._lock:
+            return len(self._documents)
+
+    def compact(self):
+        """Rewrite the log with only live documents as a new generation."""
+        with self._lock:
+            if self._log_entries == len(self._documents):
+                return
+            old_generation = self.generation
+            new_path = self._records_path(old_generation + 1)
+            with open(new_path, 'w') as f:
+                for doc_id, document in self._documents.items():
+                    f.write(json.dumps({'op': 'add', 'id': doc_id, 'document': document,
+                                        'metadata': self._metadatas[doc_id]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            if self._log:
+                self._log.close()
+                self._log = None
+            self.generation = old_generation + 1
+            self._write_header()
+            self._log_entries = len(self._documents)
+            self._records_path(old_generation).unlink(missing_ok=True)
+
+    def close(self):
+        with self._lock:
+            if self._log:
+                self._log.close()
+                self._log = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get document, term and log counts."""
+        with self._lock:
+            return {
+                'documents': len(self._documents),
+                'terms': len(self._postings),
+                'log_entries': self._log_entries,
+                'size_mb': sum(p.stat().st_size for p in self.directory.iterdir() if p.is_file()) / (1024 * 1024),
+            }
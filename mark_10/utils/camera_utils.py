@@ -2,12 +2,24 @@
 Camera Utilities
 Handles camera operations for the Raspberry Pi camera module.
 Supports both picamera2 (Raspberry Pi native) and OpenCV fallback.
+
+With background capture enabled, a grabber thread reads frames continuously
+at a limited rate into a preallocated ring buffer, so capture_image() hands
+out the newest frame immediately instead of waiting for the capture interval
+and the sensor exposure.
+
+With a detection size set, picamera2 is configured with two streams: the
+full-resolution 'main' stream and a small 'lores' stream scaled by the ISP.
+Object detection reads the lores stream (capture_detection_image()); the
+full-resolution frame is only fetched when an image is saved, together with
+its detection frame from the same request (capture_image_pair()).
 """
 
 import cv2
 import numpy as np
-from typing import Optional, Callable
+from typing import Optional, Callable, Iterator, List, Dict, Any, Tuple
 import time
+import threading
 
 # Try to import picamera2 for Raspberry Pi
 try:
@@ -21,7 +33,9 @@ except ImportError:
 class CameraManager:
     """Manages camera operations for object detection."""
     
-    def __init__(self, camera_index: int = 0, resolution: tuple = (1920, 1080), use_picamera: bool = True):
+    def __init__(self, camera_index: int = 0, resolution: tuple = (1920, 1080), use_picamera: bool = True,
+                 background_capture: bool = False, stream_fps: float = 5.0, buffer_size: int = 4,
+                 detection_size: Optional[tuple] = None):
         """
         Initialize camera manager.
         
@@ -29,6 +43,11 @@ class CameraManager:
             camera_index: Camera device index (usually 0 for default camera)
             resolution: Camera resolution (width, height) - default 1920x1080 for proper quality
             use_picamera: If True, try to use picamera2 for Raspberry Pi (recommended)
+            background_capture: If True, grab frames continuously on a background thread
+            stream_fps: Maximum frames per second read by the background thread
+            buffer_size: Frames kept in the ring buffer (at least 3)
+            detection_size: Size (width, height) of the low-resolution detection stream;
+                keep the aspect ratio of `resolution` (None = detect on full frames)
         """
         self.camera_index = camera_index
         self.resolution = resolution
@@ -36,10 +55,59 @@ class CameraManager:
         self.cap: Optional[cv2.VideoCapture] = None
         self.picam2: Optional[Picamera2] = None
         self.camera_type = None
+        self.detection_size = tuple(detection_size) if detection_size else None
+        self._lores = False  # picamera2 delivers the detection stream itself
         self.last_capture_time = 0
         self.capture_interval = 1.0  # 1 second interval between captures
+        self.background_capture = background_capture
+        self.stream_fps = max(0.1, stream_fps)
+        
+        # Ring buffer of RGB frames (detection_size frames when set), allocated
+        # once the first frame's shape is known.
+        # The newest slot and the slot last handed out are never overwritten.
+        self.buffer_size = max(3, buffer_size)
+        self._frames: Optional[np.ndarray] = None
+        self._timestamps = np.zeros(self.buffer_size)
+        self._newest: Optional[int] = None
+        self._pinned: Optional[int] = None
+        self._writing: Optional[int] = None
+        self._sequence = 0
+        self._frame_ready = threading.Condition()
+        self._stop_event = threading.Event()
+        self._grabber: Optional[threading.Thread] = None
+        self._bgr: Optional[np.ndarray] = None  # OpenCV read buffer, reused
+        self._read_lock = threading.Lock()
+        self.capture_stats = {'frames': 0, 'failures': 0}
         
         self._initialize_camera()
+        if background_capture:
+            self.start_background_capture()
+    
+    def _sensor_fps(self) -> float:
+        """Frame rate requested from the sensor (1 FPS when capturing on demand)."""
+        return self.stream_fps if self.background_capture else 1.0
+    
+    def _configure_picamera(self):
+        """Configure picamera2 with the main stream and, if requested, a lores detection stream."""
+        controls = {"FrameRate": self._sensor_fps()}
+        if self.detection_size:
+            try:
+                # BGR888 gives RGB-ordered arrays, like the main stream
+                self.picam2.configure(self.picam2.create_still_configuration(
+                    main={"size": self.resolution},
+                    lores={"size": self.detection_size, "format": "BGR888"},
+                    controls=controls
+                ))
+                self._lores = True
+                return
+            except Exception as e:
+                # e.g. Pi 4, whose lores stream is YUV420 only
+                print(f"⚠️  lores stream unavailable ({e}); detection frames are downscaled on the CPU")
+        self._lores = False
+        self.picam2.configure(self.picam2.create_still_configuration(
+            main={"size": self.resolution},
+            controls=controls
+        ))
     
     def _initialize_camera(self):
         """Initialize the camera capture."""
@@ -51,11 +119,7 @@ class CameraManager:
                     
                     # Configure camera for capture with proper resolution
                     # Main stream for high quality captures
-                    capture_config = self.picam2.create_still_configuration(
-                        main={"size": self.resolution},
-                        controls={"FrameRate": 1.0}  # 1 FPS for 1-second interval
-                    )
-                    self.picam2.configure(capture_config)
+                    self._configure_picamera()
                     self.picam2.start()
                     
                     # Allow camera to warm up and stabilize
@@ -64,6 +128,8 @@ class CameraManager:
                     self.camera_type = "picamera2"
                     print(f"✅ Raspberry Pi Camera initialized with picamera2")
                     print(f"   Resolution: {self.resolution[0]}x{self.resolution[1]}")
+                    if self._lores:
+                        print(f"   Detection stream: {self.detection_size[0]}x{self.detection_size[1]}")
                     print(f"   Capture interval: {self.capture_interval} second(s)")
                     return
                     
@@ -101,7 +167,7 @@ class CameraManager:
             # Set camera properties
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
-            self.cap.set(cv2.CAP_PROP_FPS, 1)  # 1 FPS for 1-second interval
+            self.cap.set(cv2.CAP_PROP_FPS, self._sensor_fps())
             
             # Allow camera to warm up
             time.sleep(1)
@@ -113,65 +179,328 @@ class CameraManager:
             print(f"❌ Error initializing camera: {e}")
             raise
     
-    def capture_image(self, enforce_interval: bool = True) -> Optional[np.ndarray]:
+    def _read_frame(self, out: Optional[np.ndarray] = None, quiet: bool = False,
+                    detection: bool = False) -> Optional[np.ndarray]:
+        """Read one RGB frame (see _grab_frame); the grabber thread and callers take turns."""
+        with self._read_lock:
+            return self._grab_frame(out, quiet, detection)
+    
+    def _grab_frame(self, out: Optional[np.ndarray] = None, quiet: bool = False,
+                    detection: bool = False) -> Optional[np.ndarray]:
         """
-        Capture a single image from the camera.
+        Read one RGB frame from the camera.
         
         Args:
-            enforce_interval: If True, enforces 1-second interval between captures
+            out: Optional preallocated array the frame is written into (if the shape matches)
+            quiet: If True, do not print read errors (the background thread counts them)
+            detection: If True, read a detection_size frame (lores stream or downscaled)
         
         Returns:
-            Captured image as numpy array, or None if failed
+            The frame (`out` itself when it was used), or None if failed
         """
-        # Enforce 1-second interval if requested
-        if enforce_interval:
-            current_time = time.time()
-            time_since_last_capture = current_time - self.last_capture_time
-            
-            if time_since_last_capture < self.capture_interval:
-                sleep_time = self.capture_interval - time_since_last_capture
-                time.sleep(sleep_time)
-            
-            self.last_capture_time = time.time()
-        
+        detection = detection and self.detection_size is not None
         if self.camera_type == "picamera2" and self.picam2:
             try:
                 # Capture image using picamera2
-                image = self.picam2.capture_array()
+                image = self.picam2.capture_array("lores" if detection and self._lores else "main")
                 
                 # picamera2 returns RGB by default
                 # Ensure it's the right shape (height, width, channels)
                 if len(image.shape) == 3 and image.shape[2] == 3:
+                    if detection and not self._lores:
+                        image = cv2.resize(image, self.detection_size, interpolation=cv2.INTER_AREA)
+                    if out is not None and out.shape == image.shape:
+                        np.copyto(out, image)
+                        return out
                     return image
                 else:
-                    print("❌ Unexpected image format from picamera2")
+                    if not quiet:
+                        print("❌ Unexpected image format from picamera2")
                     return None
                     
             except Exception as e:
-                print(f"❌ Error capturing image with picamera2: {e}")
+                if not quiet:
+                    print(f"❌ Error capturing image with picamera2: {e}")
                 return None
         
         elif self.cap and self.cap.isOpened():
             try:
-                # Capture frame using OpenCV
-                ret, frame = self.cap.read()
+                # Capture frame using OpenCV (into the reused BGR buffer)
+                ret, frame = self.cap.read(self._bgr) if self._bgr is not None else self.cap.read()
                 
                 if not ret:
-                    print("❌ Failed to capture frame")
+                    if not quiet:
+                        print("❌ Failed to capture frame")
                     return None
+                self._bgr = frame
+                if detection:
+                    # Downscale before converting, so the conversion runs on the small frame
+                    frame = cv2.resize(frame, self.detection_size, interpolation=cv2.INTER_AREA)
                 
                 # Convert BGR to RGB (OpenCV uses BGR by default)
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                return frame_rgb
+                if out is not None and out.shape == frame.shape:
+                    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=out)
+                return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 
             except Exception as e:
-                print(f"❌ Error capturing image with OpenCV: {e}")
+                if not quiet:
+                    print(f"❌ Error capturing image with OpenCV: {e}")
                 return None
         else:
-            print("❌ Camera not initialized")
+            if not quiet:
+                print("❌ Camera not initialized")
             return None
     
+    def capture_image(self, enforce_interval: bool = True) -> Optional[np.ndarray]:
+        """
+        Capture a single image from the camera.
+        
+        With background capture running (and no separate detection stream), the
+        newest buffered frame is returned immediately and without copying; it
+        stays valid until the next call. With a detection stream, this always
+        reads a full-resolution frame.
+        
+        Args:
+            enforce_interval: If True, enforces 1-second interval between captures
+                (ignored with background capture, which is rate-limited by stream_fps)
+        
+        Returns:
+            Captured image as numpy array, or None if failed
+        """
+        if self.is_streaming() and not self.detection_size:
+            return self.latest_frame()
+        
+        # Enforce 1-second interval if requested (on-demand captures only)
+        if self.is_streaming():
+            enforce_interval = False
+        if enforce_interval:
+            current_time = time.time()
+            time_since_last_capture = current_time - self.last_capture_time
+            
+            if time_since_last_capture < self.capture_interval:
+                sleep_time = self.capture_interval - time_since_last_capture
+                time.sleep(sleep_time)
+            
+            self.last_capture_time = time.time()
+        
+        return self._read_frame()
+    
+    def capture_detection_image(self) -> Optional[np.ndarray]:
+        """
+        Capture a frame at detection_size for object detection.
+        
+        Comes from the lores stream (or is downscaled from the main frame);
+        with background capture running it is the newest buffered frame.
+        Without a detection size this is the full-resolution frame.
+        
+        Returns:
+            Captured image as numpy array, or None if failed
+        """
+        if self.is_streaming():
+            return self.latest_frame()
+        return self._read_frame(detection=True)
+    
+    def capture_image_pair(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Capture a full-resolution frame and its detection_size version together.
+        
+        Both come from the same camera request (main and lores stream), or the
+        detection frame is downscaled from the full one, so a saved photo shows
+        exactly what was detected. Bypasses the ring buffer.
+        
+        Returns:
+            Tuple of (full image, detection image), or (None, None) if failed
+        """
+        with self._read_lock:
+            if self.camera_type == "picamera2" and self.picam2 and self._lores:
+                try:
+                    (image, detection_image), _ = self.picam2.capture_arrays(["main", "lores"])
+                    return image, detection_image
+                except Exception as e:
+                    print(f"❌ Error capturing image with picamera2: {e}")
+                    return None, None
+            image = self._grab_frame()
+        
+        if image is None:
+            return None, None
+        if not self.detection_size:
+            return image, image
+        return image, cv2.resize(image, self.detection_size, interpolation=cv2.INTER_AREA)
+    
+    def start_background_capture(self):
+        """Start the thread that keeps the ring buffer filled with the newest frames."""
+        if self.is_streaming():
+            return
+        self.background_capture = True
+        self._stop_event.clear()
+        self._grabber = threading.Thread(target=self._grabber_loop, name="camera-grabber", daemon=True)
+        self._grabber.start()
+        print(f"✅ Background capture started ({self.stream_fps:g} FPS, {self.buffer_size} frame buffer)")
+    
+    def stop_background_capture(self):
+        """Stop the grabber thread; capture_image() reads from the camera again."""
+        if not self._grabber:
+            return
+        self._stop_event.set()
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+        self._grabber.join(timeout=2.0)
+        self._grabber = None
+    
+    def is_streaming(self) -> bool:
+        """Check whether the background grabber is running."""
+        return self._grabber is not None and self._grabber.is_alive()
+    
+    def _next_slot(self) -> int:
+        """Pick the oldest slot that is neither the newest frame nor handed out (lock held)."""
+        busy = {self._newest, self._pinned}
+        slots = [slot for slot in range(self.buffer_size) if slot not in busy]
+        return min(slots, key=lambda slot: self._timestamps[slot])
+    
+    def _grabber_loop(self):
+        """Read frames at up to stream_fps into the ring buffer."""
+        while not self._stop_event.is_set():
+            started = time.time()
+            with self._frame_ready:
+                slot = self._next_slot()
+                self._writing = slot
+                out = self._frames[slot] if self._frames is not None else None
+            
+            # Only the small detection frames are buffered when a detection stream is set
+            frame = self._read_frame(out, quiet=True, detection=True)
+            
+            with self._frame_ready:
+                self._writing = None
+                if frame is None:
+                    self.capture_stats['failures'] += 1
+                    if self.capture_stats['failures'] % 50 == 1:
+                        print("⚠️  Background capture failed to read a frame")
+                elif frame is out or self._store_first(slot, frame):
+                    self._timestamps[slot] = time.time()
+                    self._newest = slot
+                    self._sequence += 1
+                    self.capture_stats['frames'] += 1
+                    self._frame_ready.notify_all()
+            
+            # Rate limit; stop_event wakes the thread up on shutdown
+            self._stop_event.wait(max(0.0, 1.0 / self.stream_fps - (time.time() - started)))
+    
+    def _store_first(self, slot: int, frame: np.ndarray) -> bool:
+        """Allocate the ring buffer for a new frame shape and store the frame (lock held)."""
+        # Frames handed out earlier keep the old buffer alive until released
+        self._frames = np.empty((self.buffer_size,) + frame.shape, dtype=frame.dtype)
+        self._timestamps[:] = 0.0
+        self._newest = self._pinned = None
+        np.copyto(self._frames[slot], frame)
+        return True
+    
+    def latest_frame(self, timeout: float = 2.0) -> Optional[np.ndarray]:
+        """
+        Get the newest buffered frame without copying.
+        
+        The frame is not overwritten until the next call handing out a buffered
+        frame or release_frame(); do not modify it in place.
+        
+        Args:
+            timeout: Seconds to wait for the first frame after start-up
+        
+        Returns:
+            The newest frame, or None if none arrived in time
+        """
+        with self._frame_ready:
+            if not self._frame_ready.wait_for(
+                    lambda: self._newest is not None or self._stop_event.is_set(), timeout):
+                print("❌ No frame from background capture")
+                return None
+            if self._newest is None:
+                return None
+            self._pinned = self._newest
+            return self._frames[self._pinned]
+    
+    def release_frame(self):
+        """Allow the slot of the last frame handed out to be reused."""
+        with self._frame_ready:
+            self._pinned = None
+    
+    def recent_frames(self, count: int = 2) -> List[np.ndarray]:
+        """
+        Get copies of the newest buffered frames (e.g. to compare consecutive frames).
+        
+        Args:
+            count: Maximum number of frames (at most buffer_size - 1)
+        
+        Returns:
+            Frames, newest first
+        """
+        with self._frame_ready:
+            if self._frames is None:
+                return []
+            slots = [slot for slot in range(self.buffer_size)
+                     if self._timestamps[slot] > 0 and slot != self._writing]
+            slots.sort(key=lambda slot: self._timestamps[slot], reverse=True)
+            return [self._frames[slot].copy() for slot in slots[:count]]
+    
+    def stream_frames(self, max_fps: Optional[float] = None) -> Iterator[np.ndarray]:
+        """
+        Yield each new frame, for modes that process frames continuously.
+        
+        Frames are views into the ring buffer, valid until the next one is
+        requested. Starts background capture if it is not running.
+        
+        Args:
+            max_fps: Maximum frames yielded per second (default: stream_fps)
+        
+        Yields:
+            The newest frame whenever a new one is available
+        """
+        self.start_background_capture()
+        interval = 1.0 / max_fps if max_fps else 0.0
+        last_sequence = -1
+        while self.is_streaming():
+            started = time.time()
+            with self._frame_ready:
+                self._frame_ready.wait_for(
+                    lambda: self._sequence != last_sequence or self._stop_event.is_set(), 1.0)
+                if self._stop_event.is_set():
+                    return
+                if self._sequence == last_sequence or self._newest is None:
+                    continue
+                last_sequence = self._sequence
+                self._pinned = self._newest
+                frame = self._frames[self._pinned]
+            yield frame
+            remaining = interval - (time.time() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+    
+    def set_stream_fps(self, fps: float):
+        """
+        Set the background capture rate.
+        
+        Args:
+            fps: Frames per second read by the grabber thread
+        """
+        self.stream_fps = max(0.1, fps)
+        if self.camera_type == "picamera2" and self.picam2 and self.background_capture:
+            try:
+                self.picam2.set_controls({"FrameRate": self.stream_fps})
+            except Exception as e:
+                print(f"⚠️  Could not set camera frame rate: {e}")
+        elif self.cap and self.cap.isOpened() and self.background_capture:
+            self.cap.set(cv2.CAP_PROP_FPS, self.stream_fps)
+        print(f"✅ Stream rate set to {self.stream_fps:g} FPS")
+    
+    def get_capture_stats(self) -> Dict[str, Any]:
+        """Get background capture counters and the age of the newest frame."""
+        with self._frame_ready:
+            newest = float(self._timestamps[self._newest]) if self._newest is not None else 0.0
+            return {
+                **self.capture_stats,
+                'streaming': self.is_streaming(),
+                'stream_fps': self.stream_fps,
+                'latest_age_s': time.time() - newest if newest else None,
+            }
+    
     def capture_images_interval(self, count: int = 1, callback: Optional[Callable[[np.ndarray, int], None]] = None) -> list:
         """
         Capture multiple images at 1-second intervals.
@@ -223,15 +552,15 @@ class CameraManager:
             resolution: New resolution (width, height)
         """
         self.resolution = resolution
+        # The grabber must not read while the camera is reconfigured; the ring
+        # buffer is reallocated for the new frame size on the next frame
+        streaming = self.is_streaming()
+        self.stop_background_capture()
         
         if self.camera_type == "picamera2" and self.picam2:
             try:
                 self.picam2.stop()
-                capture_config = self.picam2.create_still_configuration(
-                    main={"size": self.resolution},
-                    controls={"FrameRate": 1.0}
-                )
-                self.picam2.configure(capture_config)
+                self._configure_picamera()
                 self.picam2.start()
                 time.sleep(1)  # Allow reconfiguration to settle
                 print(f"✅ Resolution updated to {self.resolution[0]}x{self.resolution[1]}")
@@ -241,6 +570,9 @@ class CameraManager:
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
             print(f"✅ Resolution updated to {self.resolution[0]}x{self.resolution[1]}")
+        
+        if streaming:
+            self.start_background_capture()
     
     def set_capture_interval(self, interval: float):
         """
@@ -254,6 +586,8 @@ class CameraManager:
     
     def cleanup(self):
         """Clean up camera resources."""
+        self.stop_background_capture()
+        
         if self.picam2:
             try:
                 self.picam2.stop()
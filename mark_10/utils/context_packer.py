@@ -0,0 +1,242 @@
+"""
+Context Packing Utilities
+Builds chat prompts that fit a fixed token budget.
+
+Tokens are counted with the model's own tokenizer. The budget is filled by
+priority: system prompt and the current message always, then recent turns
+(plus a running summary of older ones), then retrieved memory. Turns that no
+longer fit are summarized in the background while the assistant is idle.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any
+
+from utils.llm_utils import LLMManager
+
+
+SUMMARY_PROMPT = """Summarize the conversation below for your own future reference in at most three sentences. Keep names, facts and user preferences; drop small talk.
+
+Existing summary: {summary}
+
+New exchanges:
+{exchanges}
+
+Updated summary:"""
+
+
+class ContextPacker:
+    """Packs system prompt, history, summary and memory into a token budget."""
+
+    def __init__(self, llm_manager: LLMManager, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the context packer.
+
+        Args:
+            llm_manager: LLM used for token counting and background summaries
+            config: Optional budget configuration (see CONTEXT_CONFIG in config.py)
+        """
+        self.llm = llm_manager
+        self.config = {**self._get_default_config(), **(config or {})}
+
+        n_ctx = self.llm.config.get('n_ctx', 2048)
+        self.prompt_budget = n_ctx - self.config['reserve_tokens']
+
+        self.summary = ""
+        self._pending_turns: List[Dict[str, str]] = []
+        self._summary_lock = threading.Lock()
+        self._summary_timer: Optional[threading.Timer] = None
+        self._token_counts: "OrderedDict[str, int]" = OrderedDict()
+        self.last_usage: Dict[str, int] = {}
+
+    def _get_default_config(self) -> Dict[str, Any]:
+        """Get the default budget configuration (CONTEXT_CONFIG in config.py)."""
+        from config import CONTEXT_CONFIG
+        return dict(CONTEXT_CONFIG)
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Count tokens with the model's tokenizer (memoized for repeated texts).
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Number of tokens
+        """
+        count = self._token_counts.get(text)
+        if count is None:
+            count = self.llm.count_tokens(text)
+            self._token_counts[text] = count
+            if len(self._token_counts) > 256:
+                self._token_counts.popitem(last=False)
+        else:
+            self._token_counts.move_to_end(text)
+        return count
+
+    @staticmethod
+    def format_turn(exchange: Dict[str, str]) -> str:
+        """Format one exchange the way it appears in the prompt."""
+        return f"Human: {exchange.get('user', '')}\nAssistant: {exchange.get('assistant', '')}"
+
+    def fit_history(self, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Drop the oldest turns once the history no longer fits its budget.
+
+        When the budget is exceeded, turns are dropped until the history uses
+        at most half of it. The first kept turn therefore only moves every few
+        turns, which keeps the prompt prefix (and its KV cache) stable.
+        Dropped turns are queued for the running summary.
+
+        Args:
+            history: Conversation history, oldest first (modified in place)
+
+        Returns:
+            The turns that were dropped
+        """
+        history_budget = int(self.prompt_budget * self.config['history_fraction'])
+        turn_budget = history_budget - (self.count_tokens(self.summary) if self.summary else 0)
+
+        costs = [self.count_tokens(self.format_turn(turn)) for turn in history]
+        if sum(costs) <= turn_budget and len(history) <= self.config['max_turns']:
+            return []
+
+        target = turn_budget // 2
+        drop = 0
+        total = sum(costs)
+        while drop < len(history) - 1 and (total > target or len(history) - drop > self.config['max_turns'] // 2):
+            total -= costs[drop]
+            drop += 1
+
+        dropped = history[:drop]
+        del history[:drop]
+        self.schedule_summary(dropped)
+        return dropped
+
+    def pack(self, preamble: str, history: List[Dict[str, str]], memory: List[str],
+             user_message: str) -> str:
+        """
+        Build the prompt: stable prefix first, per-turn content last.
+
+        The prompt never exceeds the budget: an oversized message is cut to
+        what is left after the system prompt, and the oldest turns and the
+        summary are left out of this prompt if the message crowds them out.
+
+        Args:
+            preamble: System prompt section
+            history: Recent turns, already fitted with fit_history()
+            memory: Retrieved memory snippets, most relevant first
+            user_message: The current message
+
+        Returns:
+            The prompt text
+        """
+        # Preamble, "Human: ", "Assistant:" and the separators between them
+        fixed = self.count_tokens(preamble) + self.count_tokens("Human: ") + self.count_tokens("Assistant:") + 6
+        message_budget = self.prompt_budget - fixed
+        if self.count_tokens(user_message) > message_budget:
+            print(f"⚠️  Message too long for the context window; keeping its first {max(0, message_budget)} tokens")
+            user_message = self.llm.truncate_tokens(user_message, message_budget)
+        tail = [f"Human: {user_message}", "Assistant:"]
+
+        summary = self.summary
+        history = list(history)
+        while True:
+            prompt_parts = [preamble]
+            if summary:
+                prompt_parts.append(f"Summary of earlier conversation: {summary}")
+            if history:
+                prompt_parts.append("Previous conversation:")
+                prompt_parts.append("\n".join(self.format_turn(turn) for turn in history))
+            used = sum(self.count_tokens(part) for part in prompt_parts + tail) + 2 * len(prompt_parts + tail)
+            if used <= self.prompt_budget or not (history or summary):
+                break
+            if history:
+                history.pop(0)
+            else:
+                summary = ""
+
+        # Retrieved memory fills what is left, most relevant first
+        memory_budget = min(self.config['max_memory_tokens'], self.prompt_budget - used)
+        memory_parts = []
+        memory_used = 0
+        for snippet in memory:
+            cost = self.count_tokens(snippet) + 1
+            if memory_used + cost > memory_budget:
+                break
+            memory_parts.append(snippet)
+            memory_used += cost
+        if memory_parts:
+            prompt_parts.append("Relevant context:\n" + "\n".join(memory_parts))
+
+        self.last_usage = {
+            'budget': self.prompt_budget,
+            'used': used + memory_used,
+            'history_turns': len(history),
+            'memory_items': len(memory_parts),
+        }
+        return "\n\n".join(prompt_parts + tail)
+
+    def touch(self):
+        """Postpone background summarization while the user is active."""
+        with self._summary_lock:
+            pending = bool(self._pending_turns)
+        if pending:
+            self._restart_timer()
+
+    def schedule_summary(self, turns: List[Dict[str, str]]):
+        """
+        Queue turns to be folded into the running summary once idle.
+
+        Args:
+            turns: Turns that left the history window
+        """
+        if not turns:
+            return
+        with self._summary_lock:
+            self._pending_turns.extend(turns)
+        self._restart_timer()
+
+    def _restart_timer(self):
+        if self._summary_timer:
+            self._summary_timer.cancel()
+        self._summary_timer = threading.Timer(self.config['summary_idle_seconds'], self._summarize)
+        self._summary_timer.daemon = True
+        self._summary_timer.start()
+
+    def _summarize(self):
+        """Fold pending turns into the running summary (runs on the idle timer)."""
+        with self._summary_lock:
+            turns = self._pending_turns
+            self._pending_turns = []
+            previous = self.summary
+        if not turns:
+            return
+
+        prompt = SUMMARY_PROMPT.format(
+            summary=previous or "(none)",
+            exchanges="\n".join(self.format_turn(turn) for turn in turns),
+        )
+        try:
+            response = self.llm.complete(
+                prompt,
+                cache_key="summary",
+                max_tokens=self.config['max_summary_tokens'],
+                temperature=0.2,
+                stop=["\n\n", "Human:"],
+                echo=False
+            )
+            if response and 'choices' in response and len(response['choices']) > 0:
+                text = response['choices'][0]['text'].strip()
+                if text:
+                    self.summary = text
+        except Exception as e:
+            print(f"⚠️  Could not summarize conversation history: {e}")
+            with self._summary_lock:
+                self._pending_turns = turns + self._pending_turns
+
+    def cleanup(self):
+        """Cancel any pending background summary."""
+        if self._summary_timer:
+            self._summary_timer.cancel()
+            self._summary_timer = None
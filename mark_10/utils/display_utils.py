@@ -4,6 +4,7 @@ Handles OLED display (SSD1306) on I2C for Raspberry Pi.
 """
 
 import time
+import threading
 from typing import Optional
 
 try:
@@ -42,6 +43,8 @@ class DisplayManager:
         self.draw: Optional[ImageDraw.ImageDraw] = None
         self.font: Optional[ImageFont.FreeTypeFont] = None
         self.font_small: Optional[ImageFont.FreeTypeFont] = None
+        # Startup threads and button callbacks may draw at the same time
+        self._lock = threading.RLock()
         
         if DISPLAY_AVAILABLE:
             self._initialize_display()
@@ -89,12 +92,32 @@ class DisplayManager:
         if not self.display:
             return
         
-        try:
-            self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=0)
-            self.display.image(self.image)
-            self.display.show()
-        except Exception as e:
-            print(f"⚠️  Error clearing display: {e}")
+        with self._lock:
+            try:
+                self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=0)
+                self.display.image(self.image)
+                self.display.show()
+            except Exception as e:
+                print(f"⚠️  Error clearing display: {e}")
+    
+    @staticmethod
+    def _wrap_text(text: str, max_chars: int = 16) -> list:
+        """Word-wrap text into display lines of roughly max_chars characters."""
+        lines = []
+        words = text.split()
+        current_line = ""
+        
+        for word in words:
+            if len(current_line + word) <= max_chars:
+                current_line += word + " "
+            else:
+                if current_line:
+                    lines.append(current_line.strip())
+                current_line = word + " "
+        if current_line:
+            lines.append(current_line.strip())
+        
+        return lines
     
     def show_text(self, text: str, line: int = 0, clear_first: bool = True):
         """
@@ -109,38 +132,26 @@ class DisplayManager:
             print(f"[Display] {text}")
             return
         
-        try:
-            if clear_first:
-                self.clear()
-            
-            # Split text into lines if too long
-            max_chars = 16  # Approximate characters per line
-            lines = []
-            words = text.split()
-            current_line = ""
+        with self._lock:
+            try:
+                if clear_first:
+                    self.clear()
             
-            for word in words:
-                if len(current_line + word) <= max_chars:
-                    current_line += word + " "
-                else:
-                    if current_line:
-                        lines.append(current_line.strip())
-                    current_line = word + " "
-            if current_line:
-                lines.append(current_line.strip())
+                # Split text into lines if too long
+                lines = self._wrap_text(text)
             
-            # Display lines
-            y_offset = line * 16
-            for i, line_text in enumerate(lines[:4]):  # Max 4 lines
-                y_pos = y_offset + (i * 16)
-                if y_pos < self.height:
-                    self.draw.text((0, y_pos), line_text, font=self.font, fill=255)
+                # Display lines
+                y_offset = line * 16
+                for i, line_text in enumerate(lines[:4]):  # Max 4 lines
+                    y_pos = y_offset + (i * 16)
+                    if y_pos < self.height:
+                        self.draw.text((0, y_pos), line_text, font=self.font, fill=255)
             
-            self.display.image(self.image)
-            self.display.show()
+                self.display.image(self.image)
+                self.display.show()
             
-        except Exception as e:
-            print(f"⚠️  Error showing text: {e}")
+            except Exception as e:
+                print(f"⚠️  Error showing text: {e}")
     
     def show_multiline(self, lines: list, clear_first: bool = True):
         """
@@ -155,23 +166,38 @@ class DisplayManager:
                 print(f"[Display] {line}")
             return
         
-        try:
-            if clear_first:
-                self.clear()
+        with self._lock:
+            try:
+                if clear_first:
+                    self.clear()
             
-            for i, line_text in enumerate(lines[:4]):  # Max 4 lines
-                y_pos = i * 16
-                if y_pos < self.height:
-                    # Truncate if too long
-                    if len(line_text) > 16:
-                        line_text = line_text[:13] + "..."
-                    self.draw.text((0, y_pos), line_text, font=self.font, fill=255)
+                for i, line_text in enumerate(lines[:4]):  # Max 4 lines
+                    y_pos = i * 16
+                    if y_pos < self.height:
+                        # Truncate if too long
+                        if len(line_text) > 16:
+                            line_text = line_text[:13] + "..."
+                        self.draw.text((0, y_pos), line_text, font=self.font, fill=255)
             
-            self.display.image(self.image)
-            self.display.show()
+                self.display.image(self.image)
+                self.display.show()
             
-        except Exception as e:
-            print(f"⚠️  Error showing multiline: {e}")
+            except Exception as e:
+                print(f"⚠️  Error showing multiline: {e}")
+    
+    def show_streaming_text(self, text: str):
+        """
+        Show the tail of text that is still growing (e.g. a streamed response).
+        
+        Args:
+            text: Full text so far; only the last 4 wrapped lines are shown
+        """
+        lines = self._wrap_text(text)
+        if not self.display:
+            if lines:
+                print(f"[Display] {lines[-1]}")
+            return
+        self.show_multiline(lines[-4:], clear_first=True)
     
     def show_listening(self):
         """Show listening status."""
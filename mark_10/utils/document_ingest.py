@@ -0,0 +1,271 @@
+"""
+Document Ingestion Utilities
+Loads local documents (text, Markdown, PDF) into the knowledge base.
+
+Files are split into overlapping chunks, embedded in large batches and
+written to the knowledge-base collection. A manifest of content hashes makes
+re-runs incremental: unchanged files are skipped, changed files replace
+their old chunks, and chunks of deleted files are removed.
+
+Usage:
+    python -m utils.document_ingest ./docs
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+from pathlib import Path
+from typing import List, Dict, Any, Iterator
+
+from utils.rag_utils import RAGManager, store_path_for
+
+
+TEXT_SUFFIXES = {'.txt', '.md', '.markdown', '.rst'}
+PDF_SUFFIXES = {'.pdf'}
+
+
+def file_hash(path: Path) -> str:
+    """Get the sha256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_document(path: Path) -> str:
+    """
+    Read the text of a document.
+
+    Args:
+        path: Text, Markdown or PDF file
+
+    Returns:
+        Document text (PDF text layer only, no OCR)
+    """
+    if path.suffix.lower() in PDF_SUFFIXES:
+        from pypdf import PdfReader
+        return "\n\n".join(page.extract_text() or "" for page in PdfReader(str(path)).pages)
+    return path.read_text(encoding='utf-8', errors='replace')
+
+
+def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100) -> List[str]:
+    """
+    Split text into chunks of about chunk_size characters.
+
+    Paragraphs are kept together where possible; consecutive chunks share
+    about overlap characters so facts on a boundary are not cut in half.
+
+    Args:
+        text: Document text
+        chunk_size: Target chunk length in characters
+        overlap: Characters repeated at the start of the next chunk
+
+    Returns:
+        List of chunks
+    """
+    paragraphs = [" ".join(p.split()) for p in text.split("\n\n")]
+    pieces = []
+    for paragraph in paragraphs:
+        # Hard-split paragraphs that alone exceed the chunk size
+        while len(paragraph) > chunk_size:
+            cut = paragraph.rfind(" ", 0, chunk_size)
+            cut = cut if cut > chunk_size // 2 else chunk_size
+            pieces.append(paragraph[:cut])
+            paragraph = paragraph[cut:].strip()
+        if paragraph:
+            pieces.append(paragraph)
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 1 > chunk_size:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            tail = tail[tail.find(" ") + 1:] if " " in tail else tail
+            current = f"{tail} {piece}".strip()
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class DocumentIngestor:
+    """Incrementally ingests a directory of documents into a RAG collection."""
+
+    def __init__(self, rag_manager: RAGManager, manifest_path: str = "./vector_store/ingest_manifest.json",
+                 chunk_size: int = 800, overlap: int = 100, batch_size: int = 128):
+        """
+        Initialize the ingestor.
+
+        Args:
+            rag_manager: RAG manager of the knowledge-base collection
+            manifest_path: JSON file recording the hash and chunk ids of each ingested file
+            chunk_size: Target chunk length in characters
+            overlap: Characters shared between consecutive chunks
+            batch_size: Chunks embedded and written per batch
+        """
+        self.rag = rag_manager
+        self.manifest_path = Path(manifest_path)
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.batch_size = max(1, batch_size)
+        self.manifest: Dict[str, Dict[str, Any]] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable ingest manifest: {e}")
+            return {}
+
+    def _save_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def iter_files(root: Path) -> Iterator[Path]:
+        """Yield supported documents below root."""
+        for path in sorted(root.rglob('*')):
+            if path.is_file() and path.suffix.lower() in TEXT_SUFFIXES | PDF_SUFFIXES:
+                yield path
+
+    def _write(self, chunks: List[str], ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Embed and write chunks in batches."""
+        for start in range(0, len(chunks), self.batch_size):
+            batch = chunks[start:start + self.batch_size]
+            # Bulk text bypasses the query cache so it does not evict cached queries
+            embeddings = self.rag.embedder.encode(batch, cache=False).tolist() if self.rag.embedder else None
+            self.rag.collection.add(
+                ids=ids[start:start + self.batch_size],
+                embeddings=embeddings,
+                documents=batch,
+                metadatas=metadatas[start:start + self.batch_size]
+            )
+
+    def ingest(self, root: str, prune: bool = True) -> Dict[str, Any]:
+        """
+        Ingest new and changed documents below root.
+
+        Args:
+            root: Directory to walk
+            prune: Remove chunks of files that no longer exist under root
+
+        Returns:
+            Counts of new/changed/unchanged/removed/failed files, chunks
+            written, elapsed seconds and chunks per second
+        """
+        if not self.rag.is_available():
+            raise RuntimeError("RAG system is not available")
+
+        root_path = Path(root).resolve()
+        stats = {'new': 0, 'changed': 0, 'unchanged': 0, 'removed': 0, 'failed': 0, 'chunks': 0}
+        start_time = time.perf_counter()
+        seen = set()
+
+        pending_chunks: List[str] = []
+        pending_ids: List[str] = []
+        pending_metadatas: List[Dict[str, Any]] = []
+
+        for path in self.iter_files(root_path):
+            key = str(path)
+            seen.add(key)
+            digest = file_hash(path)
+            entry = self.manifest.get(key)
+            if entry and entry['sha256'] == digest:
+                stats['unchanged'] += 1
+                continue
+
+            try:
+                chunks = chunk_text(read_document(path), self.chunk_size, self.overlap)
+            except Exception as e:
+                print(f"❌ Could not read {path.name}: {e}")
+                stats['failed'] += 1
+                continue
+
+            if entry:
+                self.rag.collection.delete(entry['ids'])
+                stats['changed'] += 1
+            else:
+                stats['new'] += 1
+
+            # Ids depend on path and content, so identical copies of a file stay independent
+            doc_key = hashlib.sha256(f"{key}\0{digest}".encode('utf-8')).hexdigest()[:16]
+            ids = [f"kb_{doc_key}_{i}" for i in range(len(chunks))]
+            pending_chunks.extend(chunks)
+            pending_ids.extend(ids)
+            pending_metadatas.extend(
+                {'type': 'document', 'source': path.name, 'path': key, 'chunk': i}
+                for i in range(len(chunks))
+            )
+            self.manifest[key] = {'sha256': digest, 'ids': ids, 'ingested_at': time.time()}
+
+            # Write in full batches across file boundaries
+            if len(pending_chunks) >= self.batch_size:
+                full = len(pending_chunks) - len(pending_chunks) % self.batch_size
+                self._write(pending_chunks[:full], pending_ids[:full], pending_metadatas[:full])
+                stats['chunks'] += full
+                del pending_chunks[:full], pending_ids[:full], pending_metadatas[:full]
+
+        if pending_chunks:
+            self._write(pending_chunks, pending_ids, pending_metadatas)
+            stats['chunks'] += len(pending_chunks)
+
+        if prune:
+            for key in [k for k in self.manifest if k not in seen and Path(k).is_relative_to(root_path)]:
+                self.rag.collection.delete(self.manifest.pop(key)['ids'])
+                stats['removed'] += 1
+
+        self._save_manifest()
+        if hasattr(self.rag.collection, 'compact') and (stats['changed'] or stats['removed']):
+            self.rag.collection.compact()
+
+        stats['seconds'] = time.perf_counter() - start_time
+        stats['chunks_per_second'] = stats['chunks'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+        return stats
+
+
+def main():
+    """Command-line entry point."""
+    from config import RAG_CONFIG
+
+    parser = argparse.ArgumentParser(description="Ingest local documents into the assistant's knowledge base")
+    parser.add_argument("directory", help="Directory with .txt/.md/.pdf files")
+    parser.add_argument("--collection", default=RAG_CONFIG['collection_name'], help="Knowledge-base collection")
+    parser.add_argument("--chunk-size", type=int, default=RAG_CONFIG.get('ingest_chunk_size', 800))
+    parser.add_argument("--overlap", type=int, default=RAG_CONFIG.get('ingest_chunk_overlap', 100))
+    parser.add_argument("--batch-size", type=int, default=RAG_CONFIG.get('ingest_batch_size', 128))
+    parser.add_argument("--no-prune", action="store_true", help="Keep chunks of files that were deleted")
+    args = parser.parse_args()
+
+    store_path = store_path_for(RAG_CONFIG)
+    rag = RAGManager(collection_name=args.collection, backend=RAG_CONFIG.get('backend', 'numpy'),
+                     store_path=store_path, write_behind=False,
+                     migrate_from=RAG_CONFIG.get('chroma_db_path'))
+    ingestor = DocumentIngestor(
+        rag,
+        manifest_path=os.path.join(store_path, f"{args.collection}_manifest.json"),
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        batch_size=args.batch_size
+    )
+
+    stats = ingestor.ingest(args.directory, prune=not args.no_prune)
+    rag.close()
+    print(f"✅ Ingested {stats['chunks']} chunks in {stats['seconds']:.1f}s "
+          f"({stats['chunks_per_second']:.1f} chunks/sec)")
+    print(f"   Files: {stats['new']} new, {stats['changed']} changed, {stats['unchanged']} unchanged, "
+          f"{stats['removed']} removed, {stats['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
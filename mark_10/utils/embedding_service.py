@@ -0,0 +1,429 @@
+"""
+Embedding Service
+One sentence-embedding model per process, shared by every RAG component.
+
+Requests from different threads (chat search, the RAG write-behind thread,
+document ingestion) are coalesced into batched encode() calls by a single
+worker thread, and recently embedded texts are served from a bounded LRU
+keyed by normalized text. Returned vectors are L2-normalized float32.
+
+Two model backends are available:
+- 'sentence_transformers': the PyTorch model (imports all of torch)
+- 'onnx': an int8-quantized ONNX export of the same model, run with
+  onnxruntime and the standalone `tokenizers` package (no torch import).
+  Create it once, on any machine with torch installed, with:
+      python -m utils.embedding_service --export ./models/all-MiniLM-L6-v2-onnx
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Union
+
+import numpy as np
+
+
+class SentenceTransformerEmbedder:
+    """PyTorch sentence-transformers backend."""
+
+    def __init__(self, model_name: str):
+        """
+        Load the model.
+
+        Args:
+            model_name: SentenceTransformer model name or path
+        """
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Embed texts into L2-normalized float32 vectors."""
+        embeddings = self.model.encode(texts, batch_size=batch_size,
+                                       normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class OnnxEmbedder:
+    """onnxruntime backend for an exported (optionally int8) transformer encoder.
+
+    Reproduces sentence-transformers' pipeline for MiniLM-style models:
+    tokenize, run the encoder, mean-pool over the attention mask, normalize.
+    """
+
+    MODEL_FILES = ('model_int8.onnx', 'model.onnx')
+
+    def __init__(self, model_dir: str, num_threads: int = 0, max_length: int = 256):
+        """
+        Load the ONNX model and its tokenizer.
+
+        Args:
+            model_dir: Directory with model_int8.onnx (or model.onnx) and tokenizer.json
+            num_threads: onnxruntime intra-op threads (0 = onnxruntime default)
+            max_length: Maximum tokens per text (longer texts are truncated)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        model_path = next((model_dir / name for name in self.MODEL_FILES if (model_dir / name).exists()), None)
+        if model_path is None:
+            raise FileNotFoundError(f"No ONNX embedding model in {model_dir} (run with --export first)")
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=['CPUExecutionProvider'])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.dimension = self.encode(["dimension probe"]).shape[1]
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Embed texts into L2-normalized float32 vectors."""
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if 'token_type_ids' in self.input_names:
+                feeds['token_type_ids'] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            hidden = self.session.run(None, feeds)[0]
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            outputs.append(pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12))
+        return np.concatenate(outputs).astype(np.float32)
+
+
+def load_embedder(backend: str, model_name: str = 'all-MiniLM-L6-v2', onnx_model_dir: Optional[str] = None,
+                  num_threads: int = 0):
+    """
+    Load an embedding model backend.
+
+    Args:
+        backend: 'sentence_transformers' or 'onnx'
+        model_name: SentenceTransformer model name (sentence_transformers backend)
+        onnx_model_dir: Exported model directory (onnx backend)
+        num_threads: onnxruntime thread count (onnx backend, 0 = default)
+
+    Returns:
+        Embedder with encode(texts, batch_size) and dimension
+    """
+    if backend == 'onnx':
+        return OnnxEmbedder(onnx_model_dir or f"./models/{model_name}-onnx", num_threads=num_threads)
+    if backend == 'sentence_transformers':
+        return SentenceTransformerEmbedder(model_name)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+class EmbeddingService:
+    """Batched, cached access to a shared sentence-embedding model."""
+
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', cache_size: int = 512,
+                 max_batch_size: int = 32, batch_wait: float = 0.005,
+                 backend: str = 'sentence_transformers', onnx_model_dir: Optional[str] = None):
+        """
+        Initialize the embedding service and load the model.
+
+        Args:
+            model_name: SentenceTransformer model name or path
+            cache_size: Maximum number of cached text embeddings
+            max_batch_size: Maximum texts encoded in one model call
+            batch_wait: Seconds to wait for more requests before encoding a batch
+            backend: 'sentence_transformers' or 'onnx'
+            onnx_model_dir: Exported ONNX model directory (onnx backend)
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.onnx_model_dir = onnx_model_dir
+        self.cache_size = max(0, cache_size)
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_wait = batch_wait
+
+        print(f"Loading embedding model ({model_name}, {backend})...")
+        self.model = load_embedder(backend, model_name, onnx_model_dir)
+        self.dimension = self.model.dimension
+        self._model_lock = threading.Lock()
+
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._requests: queue.Queue = queue.Queue()
+        self.stats = {'requests': 0, 'cache_hits': 0, 'encoded': 0, 'batches': 0}
+
+        self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+        self._worker.start()
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normalize text for cache lookups (case and whitespace insensitive)."""
+        return " ".join(text.lower().split())
+
+    def encode(self, texts: Union[str, List[str]], cache: bool = True) -> np.ndarray:
+        """
+        Embed one text or a list of texts.
+
+        Args:
+            texts: Text or list of texts
+            cache: Look up and store results in the LRU (disable for bulk
+                ingestion so it does not evict cached queries)
+
+        Returns:
+            1-D vector for a single text, (len(texts), dim) matrix for a list
+        """
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        keys = [self.normalize_text(text) for text in batch]
+        vectors: Dict[str, np.ndarray] = {}
+        with self._cache_lock:
+            self.stats['requests'] += len(keys)
+            for key in keys if cache else ():
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    vectors[key] = cached
+                    self.stats['cache_hits'] += 1
+
+        # The model sees the caller's text; the normalized key only indexes the cache
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, batch):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            future: Future = Future()
+            self._requests.put((list(missing.items()), future, cache))
+            vectors.update(zip(missing, future.result()))
+
+        result = np.stack([vectors[key] for key in keys])
+        return result[0] if single else result
+
+    def _worker_loop(self):
+        """Coalesce queued requests into batched model calls."""
+        while True:
+            requests = [self._requests.get()]
+            size = len(requests[0][0])
+            while size < self.max_batch_size:
+                try:
+                    request = self._requests.get(timeout=self.batch_wait)
+                except queue.Empty:
+                    break
+                requests.append(request)
+                size += len(request[0])
+
+            texts = list(dict.fromkeys(text for items, _, _ in requests for _, text in items))
+            try:
+                with self._model_lock:
+                    if self.model is None:
+                        # Unloaded under memory pressure; reload on the next request
+                        self.model = load_embedder(self.backend, self.model_name, self.onnx_model_dir)
+                    model = self.model
+                embeddings = model.encode(texts, batch_size=self.max_batch_size)
+            except Exception as e:
+                for _, future, _ in requests:
+                    future.set_exception(e)
+                continue
+
+            by_text = dict(zip(texts, embeddings))
+            with self._cache_lock:
+                self.stats['encoded'] += len(texts)
+                self.stats['batches'] += 1
+                if self.cache_size:
+                    for items, _, cache in requests:
+                        for key, text in items if cache else ():
+                            self._cache[key] = by_text[text]
+                            self._cache.move_to_end(key)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+
+            for items, future, _ in requests:
+                future.set_result([by_text[text] for _, text in items])
+
+    def is_loaded(self) -> bool:
+        """Check whether the model is resident."""
+        return self.model is not None
+
+    def unload(self):
+        """Free the model; cached vectors stay and the next cache miss reloads it."""
+        with self._model_lock:
+            self.model = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get request, cache and batching counters."""
+        with self._cache_lock:
+            return {
+                **self.stats,
+                'model': self.model_name,
+                'backend': self.backend,
+                'cached': len(self._cache),
+            }
+
+
+_shared_service: Optional[EmbeddingService] = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_service(config: Optional[Dict[str, Any]] = None) -> EmbeddingService:
+    """
+    Get the process-wide embedding service, loading the model on first use.
+
+    Args:
+        config: Optional RAG configuration (defaults to RAG_CONFIG)
+
+    Returns:
+        The shared EmbeddingService
+    """
+    global _shared_service
+    with _shared_lock:
+        if _shared_service is None:
+            if config is None:
+                from config import RAG_CONFIG
+                config = RAG_CONFIG
+            _shared_service = EmbeddingService(
+                model_name=config.get('embedding_model', 'all-MiniLM-L6-v2'),
+                cache_size=config.get('embedding_cache_size', 512),
+                max_batch_size=config.get('embedding_batch_size', 32),
+                backend=config.get('embedding_backend', 'sentence_transformers'),
+                onnx_model_dir=config.get('onnx_model_dir'),
+            )
+        return _shared_service
+
+
+def peek_embedding_service() -> Optional[EmbeddingService]:
+    """Get the shared embedding service only if some component already loaded it."""
+    return _shared_service
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True) -> Path:
+    """
+    Export a sentence-transformers model to ONNX and quantize it to int8.
+
+    Needs torch and transformers (only for the export, not at runtime).
+
+    Args:
+        model_name: Hugging Face model id, e.g. 'sentence-transformers/all-MiniLM-L6-v2'
+        output_dir: Directory for model.onnx, model_int8.onnx and tokenizer.json
+        quantize: Also write the dynamically int8-quantized model
+
+    Returns:
+        Path of the model file the onnx backend will load
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if '/' not in model_name:
+        model_name = f"sentence-transformers/{model_name}"
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(str(output_dir))  # Writes tokenizer.json for the `tokenizers` package
+
+    sample = tokenizer(["export sample"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    fp32_path = output_dir / 'model.onnx'
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in input_names), str(fp32_path),
+            input_names=input_names, output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes, opset_version=14
+        )
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    int8_path = output_dir / 'model_int8.onnx'
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    return int8_path
+
+
+BENCHMARK_TEXTS = [
+    "What can you help me with?",
+    "The Raspberry Pi 5 has a quad-core ARM Cortex-A76 processor.",
+    "Remind me what we talked about yesterday regarding the camera setup.",
+    "YOLOv8 detects objects in images.",
+]
+
+
+def benchmark(backend: str, model_name: str = 'all-MiniLM-L6-v2', onnx_model_dir: Optional[str] = None,
+              repeats: int = 20) -> Dict[str, Any]:
+    """
+    Measure load time, encode latency and RSS of one backend in this process.
+
+    Run each backend in a fresh process; RSS includes everything imported.
+
+    Args:
+        backend: 'sentence_transformers' or 'onnx'
+        model_name: Model name
+        onnx_model_dir: Exported ONNX model directory
+        repeats: Timed encode calls per measurement
+
+    Returns:
+        Dictionary with load_s, single_ms, batch_ms and rss_mb
+    """
+    import psutil
+
+    process = psutil.Process()
+    start = time.perf_counter()
+    embedder = load_embedder(backend, model_name, onnx_model_dir)
+    load_s = time.perf_counter() - start
+
+    def median_ms(texts):
+        embedder.encode(texts)  # Warm-up
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            embedder.encode(texts)
+            timings.append((time.perf_counter() - start) * 1000)
+        return float(np.median(timings))
+
+    return {
+        'backend': backend,
+        'load_s': load_s,
+        'single_ms': median_ms(BENCHMARK_TEXTS[:1]),
+        'batch_ms': median_ms(BENCHMARK_TEXTS * 4),
+        'rss_mb': process.memory_info().rss / (1024 * 1024),
+        'torch_imported': 'torch' in sys.modules,
+    }
+
+
+def main():
+    """Command-line entry point: export the ONNX model or benchmark a backend."""
+    parser = argparse.ArgumentParser(description="Embedding model tools")
+    parser.add_argument("--model", default='all-MiniLM-L6-v2', help="Model name")
+    parser.add_argument("--export", metavar="DIR", help="Export an int8 ONNX model to DIR")
+    parser.add_argument("--benchmark", choices=['sentence_transformers', 'onnx'],
+                        help="Benchmark one backend and print the results as JSON")
+    parser.add_argument("--onnx-dir", default=None, help="Exported ONNX model directory")
+    args = parser.parse_args()
+
+    if args.export:
+        path = export_onnx(args.model, args.export)
+        print(f"✅ Exported {args.model} to {path} ({os.path.getsize(path) / (1024 * 1024):.1f} MB)")
+    elif args.benchmark:
+        print(json.dumps(benchmark(args.benchmark, args.model, args.onnx_dir)))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Image Writer
+Saves captured images on a background thread, off the detection path.
+
+Encoding a full-HD JPEG takes tens to hundreds of milliseconds on the Pi,
+and none of it is needed to detect objects or speak the summary. Captures
+are queued (bounded; when the queue is full a capture is dropped rather
+than making the caller wait) and a worker thread encodes and writes them:
+- with libjpeg-turbo (PyTurboJPEG) when it is installed, else OpenCV
+- optionally with a small thumbnail next to each image
+- atomically (temporary file, then rename), so no reader sees half a file
+"""
+
+import os
+import time
+import queue
+import threading
+from pathlib import Path
+from typing import Optional, Union, Dict, Any
+
+import cv2
+import numpy as np
+
+
+def _load_turbojpeg():
+    """Get a TurboJPEG encoder, or None if PyTurboJPEG/libjpeg-turbo is missing."""
+    try:
+        from turbojpeg import TurboJPEG
+        return TurboJPEG()
+    except Exception:
+        return None
+
+
+class ImageWriter:
+    """Bounded queue of images encoded and saved by a worker thread."""
+
+    def __init__(self, max_queue: int = 4, jpeg_quality: int = 90,
+                 thumbnail_size: Optional[tuple] = None, use_turbojpeg: bool = True):
+        """
+        Start the image writer.
+
+        Args:
+            max_queue: Images waiting to be written; further ones are dropped
+            jpeg_quality: JPEG quality (0-100)
+            thumbnail_size: Size (width, height) of a '<name>_thumb.jpg' written
+                next to each image (None = no thumbnails)
+            use_turbojpeg: Encode with libjpeg-turbo when PyTurboJPEG is installed
+        """
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_size = tuple(thumbnail_size) if thumbnail_size else None
+        self.turbojpeg = _load_turbojpeg() if use_turbojpeg else None
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'encode_seconds': 0.0}
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_queue))
+        self._stats_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._worker_loop, name="image-writer", daemon=True)
+        self._worker.start()
+
+    @property
+    def encoder(self) -> str:
+        """Name of the JPEG encoder in use."""
+        return "libjpeg-turbo" if self.turbojpeg else "opencv"
+
+    def submit(self, image: np.ndarray, path: Union[str, Path]) -> bool:
+        """
+        Queue an RGB image to be saved as JPEG; returns immediately.
+
+        Args:
+            image: RGB array; arrays that do not own their memory (camera buffer
+                views) are copied, since the camera may reuse the buffer before the write
+            path: Destination file
+
+        Returns:
+            True if queued, False if the queue was full and the image was dropped
+        """
+        if not image.flags.owndata:
+            image = image.copy()
+        try:
+            self._queue.put_nowait((image, str(path)))
+        except queue.Full:
+            with self._stats_lock:
+                self.stats['dropped'] += 1
+            print(f"⚠️  Image writer busy; not saving {path}")
+            return False
+        with self._stats_lock:
+            self.stats['queued'] += 1
+        return True
+
+    def _encode(self, image: np.ndarray) -> bytes:
+        if self.turbojpeg:
+            from turbojpeg import TJPF_RGB
+            return self.turbojpeg.encode(np.ascontiguousarray(image), quality=self.jpeg_quality,
+                                         pixel_format=TJPF_RGB)
+        ok, data = cv2.imencode('.jpg', cv2.cvtColor(image, cv2.COLOR_RGB2BGR),
+                                [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise RuntimeError("JPEG encoding failed")
+        return data.tobytes()
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _write(self, image: np.ndarray, path: str):
+        start_time = time.time()
+        self._write_atomic(path, self._encode(image))
+        if self.thumbnail_size:
+            thumbnail = cv2.resize(image, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+            stem, ext = os.path.splitext(path)
+            self._write_atomic(f"{stem}_thumb{ext}", self._encode(thumbnail))
+        with self._stats_lock:
+            self.stats['written'] += 1
+            self.stats['encode_seconds'] += time.time() - start_time
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                image, path = item
+                try:
+                    self._write(image, path)
+                except Exception as e:
+                    with self._stats_lock:
+                        self.stats['failed'] += 1
+                    print(f"❌ Could not save image {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Wait until every queued image is written."""
+        self._queue.join()
+
+    def close(self):
+        """Write the queued images and stop the worker."""
+        if not self._worker.is_alive():
+            return
+        self._queue.put(None)
+        self._worker.join()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get write/drop counters and the average encode time."""
+        with self._stats_lock:
+            written = self.stats['written']
+            return {
+                **self.stats,
+                'encoder': self.encoder,
+                'pending': self._queue.qsize(),
+                'avg_encode_ms': 1000 * self.stats['encode_seconds'] / written if written else 0.0,
+            }
@@ -0,0 +1,113 @@
+"""
+Import Profiling Utilities
+Measures how long importing the assistant takes, the way `python -X importtime` does.
+
+Heavy libraries (llama_cpp, ultralytics, torch, cv2, chromadb,
+sentence_transformers) are only imported when the feature that needs them
+is first used. This module checks that nothing brings them back into the
+startup path: it imports a module in a fresh interpreter with
+`-X importtime` and reports the slowest imports and which heavy libraries
+got loaded.
+
+Usage:
+    python -m utils.import_profile          # profile main.py
+    python -m utils.import_profile --top 30 modes.chat_mode
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import List, Dict, Any
+
+
+# Libraries that must not be imported just by starting the application
+HEAVY_MODULES = (
+    'llama_cpp',
+    'ultralytics',
+    'torch',
+    'cv2',
+    'chromadb',
+    'sentence_transformers',
+    'onnxruntime',
+    'transformers',
+)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_imports(module: str = 'main') -> Dict[str, Any]:
+    """
+    Import a module in a fresh interpreter and time every import.
+
+    Args:
+        module: Dotted module name, relative to the project directory
+
+    Returns:
+        Dict with 'total_s' (wall time of the import), 'imports' (list of
+        {'module', 'self_ms', 'cumulative_ms'}, slowest first) and
+        'heavy_loaded' (heavy libraries present in sys.modules afterwards)
+    """
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "import json\n"
+        f"heavy = sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)\n"
+        "print(json.dumps({'total_s': elapsed, 'heavy_loaded': heavy}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed: {result.stderr.strip().splitlines()[-1:]}")
+
+    # stderr lines look like: "import time:   self [us] | cumulative | imported package"
+    imports: List[Dict[str, Any]] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            imports.append({
+                'module': name.rstrip(),
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+            })
+        except ValueError:
+            continue
+    imports.sort(key=lambda entry: entry['cumulative_ms'], reverse=True)
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['imports'] = imports
+    return report
+
+
+def print_report(report: Dict[str, Any], top: int = 15):
+    """Print the slowest imports of a profile_imports() report."""
+    print(f"⏱️  Import took {report['total_s'] * 1000:.0f}ms")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for entry in report['imports'][:top]:
+        # Nested imports are indented by importtime; keep that for readability
+        print(f"{entry['cumulative_ms']:>10.1f}ms {entry['self_ms']:>8.1f}ms  {entry['module']}")
+    if report['heavy_loaded']:
+        print(f"⚠️  Heavy libraries imported at startup: {', '.join(report['heavy_loaded'])}")
+    else:
+        print("✅ No heavy libraries imported at startup")
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Profile the import time of the assistant")
+    parser.add_argument("module", nargs="?", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to show")
+    args = parser.parse_args()
+
+    print_report(profile_imports(args.module), top=args.top)
+
+
+if __name__ == "__main__":
+    main()
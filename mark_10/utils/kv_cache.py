@@ -0,0 +1,355 @@
+"""
+KV Cache Utilities
+Keeps llama.cpp's evaluated prompt state (KV cache) reusable across calls.
+
+llama.cpp already skips re-evaluating the longest common token prefix between
+the previous and the next prompt. That only helps if the model still holds
+the caller's previous state, which is not the case when several modes share
+one model. KVStateManager saves the outgoing caller's state when another
+caller takes over the model and restores it when the first caller comes back,
+and it records how many prompt tokens were reused vs evaluated per call.
+
+PromptDiskCache persists the state of long fixed prompt preambles on disk so
+the first call after a reboot does not have to evaluate them again.
+"""
+
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # llama_cpp is imported where it is used so importing this module stays cheap
+    from llama_cpp import Llama, LlamaState
+
+
+def compact_state(state: "LlamaState") -> "LlamaState":
+    """
+    Drop the per-token logits from a saved state.
+
+    save_state() copies one row of scores per evaluated token (n_vocab floats
+    each, hundreds of MB for large vocabularies). They are only needed for
+    logprobs; sampling re-evaluates the last prompt token anyway. A single row
+    is kept because load_state() broadcasts it over the restored rows.
+    """
+    from llama_cpp import LlamaState
+    
+    scores = state.scores[-1:].copy() if len(state.scores) else state.scores
+    return LlamaState(
+        input_ids=state.input_ids,
+        scores=scores,
+        n_tokens=state.n_tokens,
+        llama_state=state.llama_state,
+        llama_state_size=state.llama_state_size,
+        seed=state.seed,
+    )
+
+
+class KVStateManager:
+    """Tracks which caller owns the model's KV cache and swaps saved states."""
+
+    def __init__(self, max_saved_states: int = 2):
+        """
+        Initialize KV state manager.
+
+        Args:
+            max_saved_states: Maximum number of inactive callers' states kept in RAM
+        """
+        self.max_saved_states = max(0, max_saved_states)
+        self.owner: Optional[str] = None
+        self._saved_states: "OrderedDict[str, Any]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def activate(self, llm: "Llama", cache_key: Optional[str]):
+        """
+        Make the model's KV cache belong to cache_key.
+
+        Must be called with exclusive access to llm (LLMManager holds its lock).
+
+        Args:
+            llm: The llama.cpp model
+            cache_key: Caller identity, e.g. 'chat' (None for one-off prompts)
+        """
+        if cache_key == self.owner:
+            return
+
+        # Save the outgoing caller's state before it gets overwritten
+        if self.owner is not None and self.max_saved_states > 0 and llm.n_tokens > 0:
+            try:
+                self._saved_states[self.owner] = compact_state(llm.save_state())
+                self._saved_states.move_to_end(self.owner)
+                while len(self._saved_states) > self.max_saved_states:
+                    self._saved_states.popitem(last=False)
+            except Exception as e:
+                print(f"⚠️  Could not save KV state for '{self.owner}': {e}")
+
+        if cache_key is not None and cache_key in self._saved_states:
+            try:
+                llm.load_state(self._saved_states[cache_key])
+            except Exception as e:
+                print(f"⚠️  Could not restore KV state for '{cache_key}': {e}")
+
+        self.owner = cache_key
+
+    def preload(self, cache_key: str, state: "LlamaState"):
+        """
+        Register a saved state for cache_key without touching the model.
+
+        Used to warm a caller's prefix from disk before its first call.
+
+        Args:
+            cache_key: Caller identity
+            state: State to restore on the caller's next activate()
+        """
+        if cache_key == self.owner or cache_key in self._saved_states or self.max_saved_states == 0:
+            return
+        self._saved_states[cache_key] = state
+        while len(self._saved_states) > self.max_saved_states:
+            self._saved_states.popitem(last=False)
+
+    def measure(self, llm: "Llama", prompt: str, cache_key: Optional[str] = None,
+                already_evaluated: int = 0) -> Dict[str, int]:
+        """
+        Count how many prompt tokens llama.cpp will reuse from the KV cache.
+
+        Args:
+            llm: The llama.cpp model (in the state it will generate from)
+            prompt: The prompt about to be evaluated
+            cache_key: Caller identity used to accumulate totals
+            already_evaluated: Prefix tokens evaluated for this call just before
+                (e.g. by PromptDiskCache.ensure_prefix); counted as evaluated
+
+        Returns:
+            Dictionary with prompt_tokens, reused_tokens and evaluated_tokens
+        """
+        tokens = llm.tokenize(prompt.encode("utf-8"), add_bos=True, special=True)
+        # llama.cpp always re-evaluates at least the last prompt token
+        reused = type(llm).longest_token_prefix(llm._input_ids.tolist(), tokens[:-1]) if llm.n_tokens else 0
+        reused = max(0, reused - already_evaluated)
+        stats = {
+            'prompt_tokens': len(tokens),
+            'reused_tokens': reused,
+            'evaluated_tokens': len(tokens) - reused,
+        }
+
+        totals = self._stats.setdefault(cache_key or 'default', {
+            'calls': 0, 'prompt_tokens': 0, 'reused_tokens': 0, 'evaluated_tokens': 0
+        })
+        totals['calls'] += 1
+        for name, value in stats.items():
+            totals[name] += value
+
+        return stats
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get accumulated token counts per caller."""
+        return {key: dict(value) for key, value in self._stats.items()}
+
+
+_model_fingerprints: Dict[str, str] = {}
+
+
+def model_fingerprint(model_path: str, sample_bytes: int = 4 * 1024 * 1024, refresh: bool = False) -> str:
+    """
+    Get a stable hash identifying a model file.
+
+    Hashing a multi-GB GGUF on an SD card takes minutes, so only the file size
+    and the first and last sample_bytes are hashed.
+
+    Args:
+        model_path: Path to the GGUF model file
+        sample_bytes: Bytes hashed from each end of the file
+        refresh: Hash again even if cached (the file was replaced in place)
+
+    Returns:
+        Hex digest identifying the model file
+    """
+    path = os.path.abspath(model_path)
+    if path in _model_fingerprints and not refresh:
+        return _model_fingerprints[path]
+
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(sample_bytes))
+        if size > sample_bytes:
+            f.seek(max(sample_bytes, size - sample_bytes))
+            digest.update(f.read(sample_bytes))
+
+    _model_fingerprints[path] = digest.hexdigest()
+    return _model_fingerprints[path]
+
+
+class PromptDiskCache:
+    """Disk-backed cache of evaluated prompt prefixes with an LRU size bound.
+
+    Entries are keyed by model fingerprint, KV cache variant and prefix
+    text, so swapping the GGUF, changing the KV cache type or editing a
+    preamble never restores a stale state.
+    """
+
+    SUFFIX = '.kvstate'
+
+    def __init__(self, model_path: str, cache_dir: str = "./kv_cache", max_size_mb: float = 512,
+                 variant: str = ""):
+        """
+        Initialize the disk cache.
+
+        Args:
+            model_path: Path to the GGUF model the states belong to
+            cache_dir: Directory holding the cached states
+            max_size_mb: Total size bound; least recently used entries are evicted
+            variant: Settings that change the state format (e.g. KV cache type)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.model_hash = ""
+        self.set_model(model_path, variant)
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def set_model(self, model_path: str, variant: str = "", refresh: bool = False):
+        """
+        Switch to another model's entries (after a hot swap).
+
+        Args:
+            model_path: Path to the GGUF model file
+            variant: Settings that change the state format (e.g. KV cache type)
+            refresh: Hash the model file again even if it was hashed before
+        """
+        fingerprint = model_fingerprint(model_path, refresh=refresh)
+        # f16 is the default, so entries written before variants existed stay valid
+        self.model_hash = fingerprint if variant in ("", "f16") else f"{fingerprint}:{variant}"
+
+    def _path_for(self, prefix: str) -> Path:
+        key = hashlib.sha256(f"{self.model_hash}\0{prefix}".encode('utf-8')).hexdigest()[:32]
+        return self.cache_dir / f"{key}{self.SUFFIX}"
+
+    def load(self, prefix: str) -> Optional["LlamaState"]:
+        """
+        Load the saved state for a prefix.
+
+        Args:
+            prefix: Prompt prefix text
+
+        Returns:
+            The saved state, or None if it is not cached
+        """
+        from llama_cpp import LlamaState
+
+        path = self._path_for(prefix)
+        if not path.exists():
+            self.stats['misses'] += 1
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            if entry.get('model_hash') != self.model_hash:
+                self.stats['misses'] += 1
+                return None
+            os.utime(path)  # Mark as recently used
+            self.stats['hits'] += 1
+            return LlamaState(**entry['state'])
+        except Exception as e:
+            print(f"⚠️  Discarding unreadable KV cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            self.stats['misses'] += 1
+            return None
+
+    def store(self, prefix: str, state: "LlamaState"):
+        """
+        Save the state for a prefix and evict old entries above the size bound.
+
+        Args:
+            prefix: Prompt prefix text
+            state: State of the model right after evaluating the prefix
+        """
+        state = compact_state(state)
+        entry = {
+            'model_hash': self.model_hash,
+            'state': {
+                'input_ids': state.input_ids,
+                'scores': state.scores,
+                'n_tokens': state.n_tokens,
+                'llama_state': state.llama_state,
+                'llama_state_size': state.llama_state_size,
+                'seed': state.seed,
+            },
+        }
+
+        path = self._path_for(prefix)
+        tmp_path = path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self.stats['stores'] += 1
+        except Exception as e:
+            print(f"⚠️  Could not write KV cache entry: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        self._evict()
+
+    def ensure_prefix(self, llm: "Llama", prefix: str) -> int:
+        """
+        Make sure the model's KV cache starts with the evaluated prefix.
+
+        Restores the prefix from disk when that beats what the model already
+        holds; otherwise evaluates it once and writes it to disk. Must be
+        called with exclusive access to llm.
+
+        Args:
+            llm: The llama.cpp model
+            prefix: Fixed prompt preamble
+
+        Returns:
+            Number of prefix tokens that had to be evaluated (0 on a cache hit)
+        """
+        tokens = llm.tokenize(prefix.encode('utf-8'), add_bos=True, special=True)
+        reused = type(llm).longest_token_prefix(llm._input_ids.tolist(), tokens) if llm.n_tokens else 0
+        if reused >= len(tokens):
+            return 0
+
+        state = self.load(prefix)
+        if state is not None and state.n_tokens > reused:
+            llm.load_state(state)
+            return 0
+
+        # Not cached: evaluate only the missing part, then persist
+        llm.n_tokens = reused
+        llm.eval(tokens[reused:])
+        self.store(prefix, llm.save_state())
+        return len(tokens) - reused
+
+    def _entries(self) -> List[Path]:
+        return list(self.cache_dir.glob(f"*{self.SUFFIX}"))
+
+    def _evict(self):
+        entries = []
+        for path in self._entries():
+            try:
+                st = path.stat()
+                entries.append((st.st_mtime, st.st_size, path))
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.stats['evictions'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache hit/miss counters and current disk usage."""
+        entries = self._entries()
+        return {
+            **self.stats,
+            'entries': len(entries),
+            'size_mb': sum(p.stat().st_size for p in entries) / (1024 * 1024),
+        }
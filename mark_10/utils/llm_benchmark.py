@@ -0,0 +1,331 @@
+"""
+LLM Benchmark Utilities
+Compares the GGUF models listed in LLAMA_MODEL_PATHS on this device.
+
+Each available model is loaded in a fresh interpreter (so peak RSS only
+counts that model) with its tuned llama.cpp profile, and runs the two
+prompts the assistant actually sends: a chat turn and a scene summary.
+Reported per model: load time, prompt-eval tokens/s, generation tokens/s,
+time to first token and peak RSS. Results are written as JSON and Markdown.
+
+With --speculative, generation runs with the drafter from SPECULATIVE_CONFIG
+and the draft acceptance rate is reported per prompt, so the speed-up can
+be compared against a plain run on the same device.
+
+With --select, the largest model that is fast enough (LLM_BENCHMARK_CONFIG
+min_gen_tps / max_ttft_s) and fits under SYSTEM_CONFIG['memory_threshold']
+becomes the default model (see config.get_model_path).
+
+Usage:
+    python -m utils.llm_benchmark
+    python -m utils.llm_benchmark --select
+    python -m utils.llm_benchmark --speculative
+    python -m utils.llm_benchmark --models ./models/a.gguf ./models/b.gguf
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from config import SYSTEM_PROMPT, SCENE_PROMPT_PREAMBLE
+
+
+# The prompts ChatMode and ObjectMode build (see ContextPacker.pack and
+# ObjectMode.generate_scene_summary), with typical history and context
+BENCHMARK_PROMPTS = {
+    'chat': (
+        f"System: {SYSTEM_PROMPT}\n\n"
+        "Previous conversation:\n"
+        "Human: What's a good way to start learning to play the guitar?\n"
+        "Assistant: Start with a few basic open chords like G, C and D, practice switching between "
+        "them slowly, and play along with simple songs you enjoy for ten to fifteen minutes a day.\n\n"
+        "Relevant context:\nThe user mentioned they have a nylon-string classical guitar.\n\n"
+        "Human: How long will it take before my fingertips stop hurting?\n\n"
+        "Assistant:"
+    ),
+    'scene': (
+        f"{SCENE_PROMPT_PREAMBLE}\n\n"
+        "Detected objects: person, laptop, cup, chair, keyboard, mouse, potted plant\n\n"
+        "Scene description:"
+    ),
+}
+
+
+def available_models(paths: Optional[List[str]] = None) -> List[str]:
+    """
+    Get the existing GGUF files among the candidates.
+
+    Args:
+        paths: Candidate paths (defaults to LLAMA_MODEL_PATHS)
+
+    Returns:
+        Existing paths, duplicates removed
+    """
+    if paths is None:
+        from config import LLAMA_MODEL_PATHS
+        paths = LLAMA_MODEL_PATHS
+    seen = set()
+    models = []
+    for path in paths:
+        resolved = os.path.realpath(path)
+        if resolved not in seen and os.path.isfile(path):
+            seen.add(resolved)
+            models.append(path)
+    return models
+
+
+def run_prompt(llm, prompt: str, max_tokens: int) -> Dict[str, float]:
+    """
+    Time one completion from a cold KV cache.
+
+    Args:
+        llm: Loaded llama_cpp.Llama (optionally with a tracked draft model)
+        prompt: Prompt text
+        max_tokens: Tokens to generate
+
+    Returns:
+        Prompt/generated token counts, time to first token, prompt and
+        generation tokens/s, and the draft acceptance rate if speculating
+    """
+    prompt_tokens = len(llm.tokenize(prompt.encode('utf-8')))
+    llm.reset()  # No prefix reuse from the previous prompt
+    tracker = llm.draft_model
+    if tracker is not None:
+        tracker.reset_pending()
+        proposed, accepted = tracker.proposed, tracker.accepted
+
+    start_time = time.perf_counter()
+    first_token_time = None
+    generated = 0
+    for chunk in llm(prompt, max_tokens=max_tokens, temperature=0.0, stream=True):
+        if first_token_time is None:
+            first_token_time = time.perf_counter()
+        generated += 1
+    end_time = time.perf_counter()
+
+    ttft = (first_token_time or end_time) - start_time
+    generation_s = end_time - (first_token_time or end_time)
+    result = {
+        'prompt_tokens': prompt_tokens,
+        'generated_tokens': generated,
+        'ttft_s': ttft,
+        # The first token's time is mostly prompt evaluation
+        'prompt_tps': prompt_tokens / ttft if ttft > 0 else 0.0,
+        'gen_tps': (generated - 1) / generation_s if generated > 1 and generation_s > 0 else 0.0,
+    }
+    if tracker is not None:
+        proposed = tracker.proposed - proposed
+        result['draft_acceptance'] = (tracker.accepted - accepted) / proposed if proposed else 0.0
+    return result
+
+
+def benchmark_model(model_path: str, max_tokens: int = 64, speculative: bool = False) -> Dict[str, Any]:
+    """
+    Load a model and run the benchmark prompts (call in a fresh process).
+
+    Args:
+        model_path: Path to the GGUF model file
+        max_tokens: Tokens generated per prompt
+        speculative: Attach the drafter from SPECULATIVE_CONFIG
+
+    Returns:
+        Load time, per-prompt results and peak RSS
+    """
+    import resource
+    from llama_cpp import Llama
+    from utils.llm_tuner import llama_params, load_profile
+
+    start_time = time.perf_counter()
+    llm = Llama(**llama_params(model_path, speculative=speculative))
+    load_s = time.perf_counter() - start_time
+
+    draft = None
+    if speculative:
+        from config import SPECULATIVE_CONFIG
+        from utils.speculative import make_draft_model
+        llm.draft_model = make_draft_model(llm, {**SPECULATIVE_CONFIG, 'enabled': True})
+        draft = llm.draft_model.name
+
+    prompts = {name: run_prompt(llm, prompt, max_tokens) for name, prompt in BENCHMARK_PROMPTS.items()}
+    # ru_maxrss is in KB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        'model_path': model_path,
+        'model': Path(model_path).name,
+        'size_mb': os.path.getsize(model_path) / (1024 * 1024),
+        'tuned': load_profile(model_path) is not None,
+        'draft': draft,
+        'load_s': load_s,
+        'prompts': prompts,
+        'peak_rss_mb': peak_rss_mb,
+    }
+
+
+def run_benchmarks(models: List[str], max_tokens: int = 64, speculative: bool = False) -> List[Dict[str, Any]]:
+    """
+    Benchmark each model in its own interpreter.
+
+    Args:
+        models: GGUF paths
+        max_tokens: Tokens generated per prompt
+        speculative: Run with the drafter from SPECULATIVE_CONFIG
+
+    Returns:
+        One result per model; failed models have an 'error'
+    """
+    results = []
+    for model_path in models:
+        print(f"⏱️  Benchmarking {Path(model_path).name}...")
+        command = [sys.executable, '-m', 'utils.llm_benchmark', '--worker', model_path,
+                   '--max-tokens', str(max_tokens)]
+        if speculative:
+            command.append('--speculative')
+        process = subprocess.run(
+            command,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            error = (process.stderr.strip().splitlines() or ["unknown error"])[-1]
+            print(f"❌ {Path(model_path).name}: {error}")
+            results.append({'model_path': model_path, 'model': Path(model_path).name, 'error': error})
+            continue
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        chat = result['prompts']['chat']
+        acceptance = f" | draft acceptance {chat['draft_acceptance']:.0%}" if 'draft_acceptance' in chat else ""
+        print(f"   load {result['load_s']:.1f}s | TTFT {chat['ttft_s']:.2f}s | "
+              f"gen {chat['gen_tps']:.1f} tok/s | peak RSS {result['peak_rss_mb']:.0f}MB{acceptance}")
+        results.append(result)
+    return results
+
+
+def select_model(results: List[Dict[str, Any]], min_gen_tps: float, max_ttft_s: float,
+                 max_rss_mb: float) -> Optional[Dict[str, Any]]:
+    """
+    Pick the default model.
+
+    The largest model (a proxy for answer quality) that meets the speed
+    limits on both prompts and fits in memory wins; if none does, the
+    fastest model that fits.
+
+    Args:
+        results: run_benchmarks() output
+        min_gen_tps: Slowest acceptable generation speed
+        max_ttft_s: Slowest acceptable time to first token
+        max_rss_mb: Memory the model may use
+
+    Returns:
+        The chosen result, or None
+    """
+    fitting = [r for r in results if 'error' not in r and r['peak_rss_mb'] <= max_rss_mb]
+    fast_enough = [
+        r for r in fitting
+        if all(p['gen_tps'] >= min_gen_tps and p['ttft_s'] <= max_ttft_s for p in r['prompts'].values())
+    ]
+    if fast_enough:
+        return max(fast_enough, key=lambda r: r['size_mb'])
+    if fitting:
+        return max(fitting, key=lambda r: r['prompts']['chat']['gen_tps'])
+    return None
+
+
+def format_markdown(results: List[Dict[str, Any]], selected: Optional[Dict[str, Any]] = None) -> str:
+    """Render results as a Markdown table."""
+    lines = [
+        "# LLM Benchmark",
+        "",
+        "| Model | Size (MB) | Load (s) | Prompt | TTFT (s) | Prompt eval (tok/s) | Generation (tok/s) "
+        "| Draft acceptance | Peak RSS (MB) |",
+        "|---|---:|---:|---|---:|---:|---:|---:|---:|",
+    ]
+    for result in results:
+        name = result['model'] + (" **(selected)**" if selected and result is selected else "")
+        if 'error' in result:
+            lines.append(f"| {name} | | | | | | | | failed: {result['error']} |")
+            continue
+        for prompt_name, p in result['prompts'].items():
+            acceptance = f"{p['draft_acceptance']:.0%}" if 'draft_acceptance' in p else "-"
+            lines.append(
+                f"| {name} | {result['size_mb']:.0f} | {result['load_s']:.1f} | {prompt_name} | "
+                f"{p['ttft_s']:.2f} | {p['prompt_tps']:.1f} | {p['gen_tps']:.1f} | {acceptance} | "
+                f"{result['peak_rss_mb']:.0f} |"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def write_reports(results: List[Dict[str, Any]], report_dir: str,
+                  selected: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """
+    Write the JSON and Markdown reports.
+
+    Returns:
+        Paths of the written 'json' and 'markdown' files
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    json_path = os.path.join(report_dir, f"llm_benchmark_{stamp}.json")
+    markdown_path = os.path.join(report_dir, f"llm_benchmark_{stamp}.md")
+
+    from utils.llm_tuner import device_id
+    with open(json_path, 'w') as f:
+        json.dump({'device': device_id(), 'timestamp': time.time(), 'results': results,
+                   'selected': selected['model_path'] if selected else None}, f, indent=2)
+    with open(markdown_path, 'w') as f:
+        f.write(format_markdown(results, selected))
+    return {'json': json_path, 'markdown': markdown_path}
+
+
+def main():
+    """Command-line entry point."""
+    from config import LLM_BENCHMARK_CONFIG, SYSTEM_CONFIG
+
+    parser = argparse.ArgumentParser(description="Benchmark the configured GGUF models")
+    parser.add_argument("--models", nargs="+", default=None, help="GGUF files (default: LLAMA_MODEL_PATHS)")
+    parser.add_argument("--max-tokens", type=int, default=LLM_BENCHMARK_CONFIG['max_tokens'])
+    parser.add_argument("--select", action="store_true", help="Make the best model the default")
+    parser.add_argument("--speculative", action="store_true",
+                        help="Generate with the SPECULATIVE_CONFIG drafter and report its acceptance rate")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        # Child process: one model, JSON on the last stdout line
+        print(json.dumps(benchmark_model(args.worker, args.max_tokens, args.speculative)))
+        return
+
+    models = available_models(args.models)
+    if not models:
+        print("❌ No GGUF models found")
+        sys.exit(1)
+
+    results = run_benchmarks(models, args.max_tokens, args.speculative)
+
+    import psutil
+    max_rss_mb = psutil.virtual_memory().total / (1024 * 1024) * SYSTEM_CONFIG['memory_threshold'] / 100
+    selected = select_model(results, LLM_BENCHMARK_CONFIG['min_gen_tps'],
+                            LLM_BENCHMARK_CONFIG['max_ttft_s'], max_rss_mb)
+
+    paths = write_reports(results, LLM_BENCHMARK_CONFIG['report_dir'], selected)
+    print()
+    print(format_markdown(results, selected))
+    print(f"📄 Reports: {paths['json']}, {paths['markdown']}")
+
+    if selected is None:
+        print("⚠️  No model fits in memory; default model unchanged")
+    elif args.select:
+        selection_path = LLM_BENCHMARK_CONFIG['selection_path']
+        os.makedirs(os.path.dirname(os.path.abspath(selection_path)), exist_ok=True)
+        with open(selection_path, 'w') as f:
+            json.dump({'model_path': selected['model_path'], 'selected_at': time.time()}, f, indent=2)
+        print(f"✅ Default model: {selected['model']}")
+    else:
+        print(f"💡 Recommended model: {selected['model']} (use --select to make it the default)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""
+LLM Auto-Tuning Utilities
+Finds the fastest stable llama.cpp settings for a model on this device.
+
+The best n_threads, n_batch, memory mapping and KV cache type depend on the
+board, the SD card or SSD, and the model, so they are measured instead of
+guessed. LLMTuner loads the model with candidate settings, times a short
+prompt evaluation and generation, and keeps the fastest setting whose
+repeated runs agree (coordinate search: one parameter at a time). The
+winner is stored per model file and device in LLM_TUNING_CONFIG
+['profile_path'], and every Llama(...) in the project is built from
+llama_params(), which applies the stored profile.
+
+Usage:
+    python -m utils.llm_tuner                 # tune the configured model
+    python -m utils.llm_tuner --model ./models/x.gguf --full
+    python -m utils.llm_tuner --show
+"""
+
+import os
+import gc
+import json
+import time
+import platform
+import argparse
+import statistics
+from typing import Optional, Dict, Any, List
+
+import psutil
+
+from utils.kv_cache import model_fingerprint
+
+
+# Representative chat-style prompt; repeated to reach the prompt length
+TUNING_PROMPT = ("System: You are a helpful AI assistant running locally on a Raspberry Pi 5. "
+                 "Keep your responses concise but informative.\n\n"
+                 "Human: I keep forgetting where I put my keys. Any practical tips for remembering "
+                 "everyday things better, and is there anything about memory I should know?\n\n")
+
+# Settings that stay at llama.cpp's defaults unless a profile overrides them
+DEFAULT_PROFILE = {
+    'n_batch': 512,
+    'use_mmap': True,
+    'use_mlock': False,
+    'kv_type': 'f16',
+}
+
+
+def device_id() -> str:
+    """
+    Identify this board well enough that profiles are not shared across hardware.
+
+    Returns:
+        e.g. 'aarch64|Raspberry Pi 5 Model B Rev 1.0|4cpu|8gb'
+    """
+    model = platform.processor() or ""
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key.strip() in ('Model', 'model name'):
+                    model = value.strip()
+                    # 'Model' (the board) is more specific than the CPU name
+                    if key.strip() == 'Model':
+                        break
+    except OSError:
+        pass
+    memory_gb = round(psutil.virtual_memory().total / (1024 ** 3))
+    return f"{platform.machine()}|{model}|{os.cpu_count()}cpu|{memory_gb}gb"
+
+
+def _profile_key(model_path: str) -> str:
+    return f"{model_fingerprint(model_path)[:16]}|{device_id()}"
+
+
+def _read_profiles(profile_path: str) -> Dict[str, Any]:
+    try:
+        with open(profile_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def load_profile(model_path: str, profile_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Get the tuned settings for a model on this device.
+
+    Args:
+        model_path: Path to the GGUF model file
+        profile_path: Profile file (defaults to LLM_TUNING_CONFIG['profile_path'])
+
+    Returns:
+        Profile entry with 'params' and the measured speeds, or None
+    """
+    if profile_path is None:
+        from config import LLM_TUNING_CONFIG
+        profile_path = LLM_TUNING_CONFIG['profile_path']
+    if not os.path.exists(model_path):
+        return None
+    return _read_profiles(profile_path).get(_profile_key(model_path))
+
+
+def save_profile(model_path: str, entry: Dict[str, Any], profile_path: str):
+    """Store a profile entry for a model on this device."""
+    profiles = _read_profiles(profile_path)
+    profiles[_profile_key(model_path)] = entry
+    os.makedirs(os.path.dirname(os.path.abspath(profile_path)), exist_ok=True)
+    tmp_path = f"{profile_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(tmp_path, profile_path)
+
+
+def llama_kwargs(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Translate tuned settings into Llama(...) keyword arguments.
+
+    Args:
+        profile: Settings (n_threads, n_batch, use_mmap, use_mlock, kv_type)
+
+    Returns:
+        Keyword arguments for llama_cpp.Llama
+    """
+    kwargs = {key: profile[key] for key in ('n_threads', 'n_batch', 'use_mmap', 'use_mlock') if key in profile}
+    kv_type = profile.get('kv_type', 'f16')
+    if kv_type != 'f16':
+        import llama_cpp
+        ggml_type = getattr(llama_cpp, f"GGML_TYPE_{kv_type.upper()}")
+        # A quantized V cache needs flash attention in llama.cpp
+        kwargs.update(type_k=ggml_type, type_v=ggml_type, flash_attn=True)
+    return kwargs
+
+
+def llama_params(model_path: str, config: Optional[Dict[str, Any]] = None,
+                 use_profile: bool = True, speculative: bool = False) -> Dict[str, Any]:
+    """
+    Build the Llama(...) arguments for a model: configuration plus tuned profile.
+
+    Args:
+        model_path: Path to the GGUF model file
+        config: LLM configuration (defaults to LLM_CONFIG); n_ctx, n_threads,
+            n_gpu_layers and verbose are used
+        use_profile: Apply the stored profile for this model and device
+        speculative: A draft model will be attached, so keep logits for every
+            position (llama.cpp only computes the last one of a batch otherwise)
+
+    Returns:
+        Keyword arguments for llama_cpp.Llama, including model_path
+    """
+    if config is None:
+        from config import LLM_CONFIG
+        config = LLM_CONFIG
+    params = {
+        'model_path': model_path,
+        'n_ctx': config.get('n_ctx', 2048),
+        'n_threads': config.get('n_threads', 4),
+        'n_gpu_layers': config.get('n_gpu_layers', 0),
+        'verbose': config.get('verbose', False),
+    }
+    if speculative:
+        params['logits_all'] = True
+    profile = load_profile(model_path) if use_profile else None
+    if profile:
+        params.update(llama_kwargs(profile['params']))
+    return params
+
+
+def profile_variant(model_path: str) -> str:
+    """Settings that change the saved KV state format (for cache keys)."""
+    profile = load_profile(model_path)
+    return profile['params'].get('kv_type', 'f16') if profile else 'f16'
+
+
+class LLMTuner:
+    """Benchmarks llama.cpp settings for one model and keeps the fastest stable one."""
+
+    def __init__(self, model_path: str, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the tuner.
+
+        Args:
+            model_path: Path to the GGUF model file
+            config: Optional configuration (see LLM_TUNING_CONFIG in config.py)
+        """
+        self.model_path = model_path
+        self.config = {**self._get_default_config(), **(config or {})}
+        self.results: List[Dict[str, Any]] = []
+
+    def _get_default_config(self) -> Dict[str, Any]:
+        """Get default tuning configuration."""
+        return {
+            'profile_path': './models/llm_profiles.json',
+            'n_ctx': 2048,
+            'prompt_tokens': 128,   # Prompt length of each trial
+            'gen_tokens': 32,       # Tokens generated per trial
+            'repeats': 2,           # Runs per candidate (plus one discarded warm-up)
+            'max_cv': 0.15,         # Max relative spread between runs of a stable candidate
+        }
+
+    def candidates(self, full: bool = False) -> Dict[str, list]:
+        """
+        Get the values tried for each setting.
+
+        Args:
+            full: Try every batch size and both KV cache types (slower)
+
+        Returns:
+            Candidate values per setting, in search order
+        """
+        cores = os.cpu_count() or 4
+        return {
+            'n_threads': sorted({max(1, cores - 1), cores, max(1, cores // 2)}),
+            'n_batch': [64, 128, 256, 512] if full else [128, 512],
+            'memory': [(True, False), (True, True), (False, False)],  # (use_mmap, use_mlock)
+            'kv_type': ['f16', 'q8_0'] if full else ['f16'],
+        }
+
+    def _prompt_tokens(self, llm) -> List[int]:
+        text = TUNING_PROMPT
+        tokens = llm.tokenize(text.encode('utf-8'))
+        while len(tokens) < self.config['prompt_tokens']:
+            text += TUNING_PROMPT
+            tokens = llm.tokenize(text.encode('utf-8'))
+        return tokens[:self.config['prompt_tokens']]
+
+    def measure(self, profile: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Load the model with one set of settings and time it.
+
+        Args:
+            profile: Settings to try
+
+        Returns:
+            Median prompt and generation tokens/s, load time and stability,
+            or None if the settings do not work on this device
+        """
+        from llama_cpp import Llama
+
+        params = llama_params(self.model_path, {'n_ctx': self.config['n_ctx']}, use_profile=False)
+        params.update(llama_kwargs(profile))
+        llm = None
+        try:
+            start_time = time.perf_counter()
+            llm = Llama(**params)
+            load_s = time.perf_counter() - start_time
+
+            tokens = self._prompt_tokens(llm)
+            prompt_speeds, gen_speeds = [], []
+            # The first run warms caches and page-ins and is discarded
+            for run in range(self.config['repeats'] + 1):
+                llm.reset()
+                start_time = time.perf_counter()
+                llm.eval(tokens)
+                prompt_s = time.perf_counter() - start_time
+
+                start_time = time.perf_counter()
+                generated = 0
+                for token in llm.generate([], temp=0.0, reset=False):
+                    generated += 1
+                    if generated >= self.config['gen_tokens'] or token == llm.token_eos():
+                        break
+                gen_s = time.perf_counter() - start_time
+
+                if run > 0:
+                    prompt_speeds.append(len(tokens) / prompt_s)
+                    gen_speeds.append(generated / gen_s)
+        except Exception as e:
+            print(f"   ⚠️  {profile}: {e}")
+            return None
+        finally:
+            llm = None
+            gc.collect()
+
+        def spread(values):
+            return (max(values) - min(values)) / statistics.median(values) if len(values) > 1 else 0.0
+
+        prompt_tps = statistics.median(prompt_speeds)
+        gen_tps = statistics.median(gen_speeds)
+        return {
+            'params': dict(profile),
+            'prompt_tps': prompt_tps,
+            'gen_tps': gen_tps,
+            'load_s': load_s,
+            # Time for one representative request: the quantity being minimized
+            'request_s': self.config['prompt_tokens'] / prompt_tps + self.config['gen_tokens'] / gen_tps,
+            'stable': max(spread(prompt_speeds), spread(gen_speeds)) <= self.config['max_cv'],
+        }
+
+    def tune(self, full: bool = False, save: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Search the settings one at a time, keeping the best stable value of each.
+
+        Args:
+            full: Search more values (see candidates())
+            save: Store the winning profile
+
+        Returns:
+            The best result (see measure()), or None if nothing ran
+        """
+        print(f"🔧 Tuning llama.cpp settings for {os.path.basename(self.model_path)} on {device_id()}")
+        candidates = self.candidates(full)
+        best_profile = {**DEFAULT_PROFILE, 'n_threads': max(candidates['n_threads'])}
+        best = None
+
+        for setting, values in candidates.items():
+            for value in values:
+                profile = dict(best_profile)
+                if setting == 'memory':
+                    profile['use_mmap'], profile['use_mlock'] = value
+                else:
+                    profile[setting] = value
+                if best and profile == best['params']:
+                    continue
+
+                result = self.measure(profile)
+                if result is None:
+                    continue
+                self.results.append(result)
+                print(f"   {profile}: prompt {result['prompt_tps']:.1f} tok/s, "
+                      f"gen {result['gen_tps']:.1f} tok/s{'' if result['stable'] else ' (unstable)'}")
+                if result['stable'] and (best is None or result['request_s'] < best['request_s']):
+                    best = result
+            if best:
+                best_profile = dict(best['params'])
+
+        if best is None:
+            print("❌ No stable llama.cpp settings found")
+            return None
+
+        best['tuned_at'] = time.time()
+        best['model_path'] = os.path.abspath(self.model_path)
+        if save:
+            save_profile(self.model_path, best, self.config['profile_path'])
+        print(f"✅ Best settings: {best['params']} "
+              f"(prompt {best['prompt_tps']:.1f} tok/s, gen {best['gen_tps']:.1f} tok/s)")
+        return best
+
+
+def ensure_profile(model_path: str, config: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Tune a model on first use if LLM_TUNING_CONFIG asks for it.
+
+    Args:
+        model_path: Path to the GGUF model file
+        config: LLM configuration the model will be loaded with (defaults to
+            get_config_for_system()); tuning runs at its n_ctx
+
+    Returns:
+        The stored or newly tuned profile, or None
+    """
+    from config import LLM_TUNING_CONFIG, get_config_for_system
+
+    profile = load_profile(model_path, LLM_TUNING_CONFIG['profile_path'])
+    if profile or not LLM_TUNING_CONFIG.get('tune_on_first_boot') or not os.path.exists(model_path):
+        return profile
+    print("No tuned llama.cpp profile for this model and device yet; tuning (one-time)...")
+    try:
+        n_ctx = (config or get_config_for_system())['n_ctx']
+        return LLMTuner(model_path, {**LLM_TUNING_CONFIG, 'n_ctx': n_ctx}).tune()
+    except Exception as e:
+        print(f"⚠️  Tuning failed, using default settings: {e}")
+        return None
+
+
+def main():
+    """Command-line entry point."""
+    from config import LLM_TUNING_CONFIG, get_model_path, get_config_for_system
+
+    parser = argparse.ArgumentParser(description="Tune llama.cpp settings for this device")
+    parser.add_argument("--model", default=None, help="GGUF file (default: the configured model)")
+    parser.add_argument("--full", action="store_true", help="Try more batch sizes and the q8_0 KV cache")
+    parser.add_argument("--show", action="store_true", help="Print the stored profile and exit")
+    args = parser.parse_args()
+
+    model_path = args.model or get_model_path('llama')
+    if args.show:
+        print(json.dumps(load_profile(model_path, LLM_TUNING_CONFIG['profile_path']), indent=2))
+        return
+
+    # Same context size the assistant loads the model with
+    n_ctx = get_config_for_system()['n_ctx']
+    LLMTuner(model_path, {**LLM_TUNING_CONFIG, 'n_ctx': n_ctx}).tune(full=args.full)
+
+
+if __name__ == "__main__":
+    main()
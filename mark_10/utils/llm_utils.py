@@ -4,25 +4,54 @@ Handles LLM operations using llama.cpp for local inference.
 """
 
 import os
+import re
+import time
+import threading
 import psutil
-from typing import Optional, Dict, Any
-from llama_cpp import Llama
+from typing import Optional, Dict, Any, Iterable, Iterator, TYPE_CHECKING
+
+from utils.kv_cache import KVStateManager, PromptDiskCache, model_fingerprint
+from utils.llm_tuner import llama_params, ensure_profile, profile_variant
+
+if TYPE_CHECKING:
+    # Imported on first model load; llama_cpp alone takes seconds on an SD card
+    from llama_cpp import Llama
 
 
 class LLMManager:
-    """Manages LLM operations and configurations."""
+    """Manages LLM operations and configurations.
+    
+    A single instance can be shared by several modes (see get_shared_llm).
+    Calls into the model are serialized with a lock, and each call may pass
+    its own generation parameters on top of the manager's defaults. Callers
+    that pass a cache_key get their KV cache (evaluated prompt prefix) back
+    after other callers have used the model, and a persist_prefix is restored
+    from disk across restarts when a PromptDiskCache is attached.
+    """
     
-    def __init__(self, model_path: str, config: Optional[Dict[str, Any]] = None):
+    def __init__(self, model_path: str, config: Optional[Dict[str, Any]] = None,
+                 prompt_cache: Optional[PromptDiskCache] = None,
+                 speculative: Optional[Dict[str, Any]] = None):
         """
         Initialize LLM manager.
         
         Args:
             model_path: Path to the GGUF model file
             config: Optional configuration dictionary
+            prompt_cache: Optional on-disk cache for fixed prompt preambles
+            speculative: Optional speculative decoding configuration (see SPECULATIVE_CONFIG)
         """
         self.model_path = model_path
         self.config = config or self._get_default_config()
-        self.llm: Optional[Llama] = None
+        self.llm: Optional["Llama"] = None
+        self._lock = threading.RLock()
+        self.kv_cache = KVStateManager()
+        self.prompt_cache = prompt_cache
+        self.last_prompt_stats: Dict[str, int] = {}
+        self.speculative = speculative or {}
+        self.draft_model = None
+        # Decode-only timing of streamed generations (effective tokens/s)
+        self.generation_stats = {'tokens': 0, 'seconds': 0.0}
         
         self._initialize_llm()
     
@@ -45,15 +74,12 @@ class LLMManager:
                 raise FileNotFoundError(f"Model file not found: {self.model_path}")
             
             print(f"Loading LLM model from: {self.model_path}")
+            from llama_cpp import Llama
             
-            # Initialize LLM with configuration
-            self.llm = Llama(
-                model_path=self.model_path,
-                n_ctx=self.config['n_ctx'],
-                n_threads=self.config['n_threads'],
-                n_gpu_layers=self.config['n_gpu_layers'],
-                verbose=self.config['verbose']
-            )
+            # Configuration plus the tuned profile for this model and device
+            self.llm = Llama(**llama_params(self.model_path, self.config,
+                                            speculative=bool(self.speculative.get('enabled'))))
+            self._attach_draft_model()
             
             print("✅ LLM initialized successfully!")
             
@@ -61,6 +87,242 @@ class LLMManager:
             print(f"❌ Error initializing LLM: {e}")
             raise
     
+    def _attach_draft_model(self):
+        """Set up speculative decoding if configured (failures leave it off)."""
+        if not self.speculative.get('enabled'):
+            return
+        try:
+            from utils.speculative import make_draft_model
+            self.draft_model = make_draft_model(self.llm, self.speculative, self.config)
+            self.llm.draft_model = self.draft_model
+        except Exception as e:
+            print(f"⚠️  Speculative decoding disabled: {e}")
+            self.draft_model = None
+    
+    def get_generation_stats(self) -> Dict[str, Any]:
+        """
+        Get effective generation speed and, with speculative decoding, draft acceptance.
+        
+        Returns:
+            Generated tokens, decode seconds, tokens/s and draft statistics
+        """
+        tokens = self.generation_stats['tokens']
+        seconds = self.generation_stats['seconds']
+        return {
+            'tokens': tokens,
+            'seconds': seconds,
+            'tokens_per_s': tokens / seconds if seconds > 0 else 0.0,
+            'speculative': self.draft_model.get_stats() if self.draft_model else None,
+        }
+    
+    def is_loaded(self) -> bool:
+        """Check whether the weights are resident."""
+        return self.llm is not None
+    
+    def load(self):
+        """Load the weights if they were unloaded (calls do this on demand)."""
+        with self._lock:
+            if self.llm is None:
+                self._initialize_llm()
+    
+    def unload(self):
+        """
+        Free the weights and KV states; the next call loads them again.
+        
+        Waits for a running generation to finish.
+        """
+        with self._lock:
+            self.llm = None
+            self.draft_model = None
+            # Saved KV states belong to the released context
+            self.kv_cache = KVStateManager()
+    
+    def swap_model(self, model_path: str):
+        """
+        Replace the GGUF without restarting the process.
+        
+        The old weights are freed before the new ones load so both never
+        have to fit in RAM at once; if the new model fails to load, the old
+        one is loaded again.
+        
+        Args:
+            model_path: Path to the new GGUF model file
+        """
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+        
+        with self._lock:
+            old_path = self.model_path
+            self.unload()
+            self.model_path = model_path
+            # A model new to this device is tuned first (while no weights are resident)
+            ensure_profile(model_path, self.config)
+            try:
+                self._initialize_llm()
+            except Exception:
+                self.model_path = old_path
+                self._initialize_llm()
+                raise
+            
+            # Hash the file again, it may have been replaced under the same path
+            model_fingerprint(model_path, refresh=True)
+            if self.prompt_cache:
+                # Cached preambles are keyed by model, so the old ones are simply not hit
+                self.prompt_cache.set_model(model_path, variant=profile_variant(model_path))
+            print(f"✅ Swapped LLM to {model_path}")
+    
+    def _prepare_prompt(self, prompt: str, cache_key: Optional[str], persist_prefix: Optional[str]):
+        """Restore the caller's KV state and record prompt reuse (lock must be held)."""
+        self.kv_cache.activate(self.llm, cache_key)
+        
+        prefix_evaluated = 0
+        if persist_prefix and self.prompt_cache and prompt.startswith(persist_prefix):
+            try:
+                prefix_evaluated = self.prompt_cache.ensure_prefix(self.llm, persist_prefix)
+            except Exception as e:
+                print(f"⚠️  Prompt cache unavailable: {e}")
+        
+        try:
+            self.last_prompt_stats = self.kv_cache.measure(self.llm, prompt, cache_key, prefix_evaluated)
+        except Exception:
+            self.last_prompt_stats = {}
+    
+    def warm_prefix(self, persist_prefix: str, cache_key: str) -> bool:
+        """
+        Load a caller's fixed preamble state from disk ahead of its first call.
+        
+        Args:
+            persist_prefix: Fixed prompt preamble the caller's prompts start with
+            cache_key: Caller identity (e.g. 'chat')
+            
+        Returns:
+            True if a cached state was found
+        """
+        if not self.prompt_cache:
+            return False
+        
+        with self._lock:
+            state = self.prompt_cache.load(persist_prefix)
+            if state is None:
+                return False
+            self.kv_cache.preload(cache_key, state)
+            return True
+    
+    def complete(self, prompt: str, cache_key: Optional[str] = None,
+                 persist_prefix: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Run a raw completion with exclusive access to the model.
+        
+        Args:
+            prompt: Input prompt
+            cache_key: Caller identity whose KV cache should be reused (e.g. 'chat')
+            persist_prefix: Fixed preamble of prompt to keep in the on-disk cache
+            **kwargs: Generation parameters for this call (max_tokens, stop, ...)
+            
+        Returns:
+            The llama.cpp completion response dictionary
+        """
+        generation_params = {
+            'max_tokens': self.config.get('max_tokens', 256),
+            'temperature': self.config.get('temperature', 0.7),
+            'top_p': self.config.get('top_p', 0.9),
+            **kwargs
+        }
+        
+        with self._lock:
+            self.load()
+            self._prepare_prompt(prompt, cache_key, persist_prefix)
+            if self.draft_model:
+                self.draft_model.reset_pending()
+            return self.llm(prompt, **generation_params)
+    
+    def stream(self, prompt: str, cache_key: Optional[str] = None,
+               persist_prefix: Optional[str] = None, **kwargs) -> Iterator[str]:
+        """
+        Stream generated text token by token with exclusive access to the model.
+        
+        The model stays locked until the generator is exhausted or closed.
+        
+        Args:
+            prompt: Input prompt
+            cache_key: Caller identity whose KV cache should be reused (e.g. 'chat')
+            persist_prefix: Fixed preamble of prompt to keep in the on-disk cache
+            **kwargs: Generation parameters for this call (max_tokens, stop, ...)
+            
+        Yields:
+            Text pieces as they are generated
+        """
+        generation_params = {
+            'max_tokens': self.config.get('max_tokens', 256),
+            'temperature': self.config.get('temperature', 0.7),
+            'top_p': self.config.get('top_p', 0.9),
+            **kwargs,
+            'stream': True,
+        }
+        
+        with self._lock:
+            self.load()
+            self._prepare_prompt(prompt, cache_key, persist_prefix)
+            if self.draft_model:
+                self.draft_model.reset_pending()
+            
+            first_token_time = None
+            tokens = 0
+            try:
+                for chunk in self.llm(prompt, **generation_params):
+                    # Timing starts at the first token, so prompt evaluation is excluded
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+                    else:
+                        tokens += 1
+                    if chunk and 'choices' in chunk and len(chunk['choices']) > 0:
+                        text = chunk['choices'][0].get('text', '')
+                        if text:
+                            yield text
+            finally:
+                if tokens:
+                    self.generation_stats['tokens'] += tokens
+                    self.generation_stats['seconds'] += time.perf_counter() - first_token_time
+    
+    def count_tokens(self, text: str) -> int:
+        """
+        Count tokens in text with the model's tokenizer.
+        
+        Args:
+            text: Text to count
+            
+        Returns:
+            Number of tokens (without BOS)
+        """
+        with self._lock:
+            self.load()
+            return len(self.llm.tokenize(text.encode('utf-8'), add_bos=False, special=True))
+    
+    def truncate_tokens(self, text: str, max_tokens: int) -> str:
+        """
+        Cut text to at most max_tokens tokens of the model's tokenizer.
+        
+        Args:
+            text: Text to truncate
+            max_tokens: Maximum number of tokens to keep
+            
+        Returns:
+            The text, shortened at a token boundary if it was too long
+        """
+        with self._lock:
+            self.load()
+            tokens = self.llm.tokenize(text.encode('utf-8'), add_bos=False, special=True)
+            if len(tokens) <= max_tokens:
+                return text
+            kept = tokens[:max(0, max_tokens)]
+            while True:
+                truncated = self.llm.detokenize(kept).decode('utf-8', errors='ignore')
+                # Detokenizing does not always round-trip (e.g. a leading space)
+                if not kept or len(self.llm.tokenize(truncated.encode('utf-8'), add_bos=False,
+                                                     special=True)) <= max_tokens:
+                    return truncated
+                kept = kept[:-1]
+    
     def generate_text(self, prompt: str, **kwargs) -> str:
         """
         Generate text using the LLM.
@@ -72,19 +334,8 @@ class LLMManager:
         Returns:
             Generated text
         """
-        if not self.llm:
-            return "❌ LLM not initialized"
-        
         try:
-            # Merge default config with kwargs
-            generation_params = {
-                'max_tokens': self.config['max_tokens'],
-                'temperature': self.config['temperature'],
-                'top_p': self.config['top_p'],
-                **kwargs
-            }
-            
-            response = self.llm(prompt, **generation_params)
+            response = self.complete(prompt, **kwargs)
             
             if response and 'choices' in response and len(response['choices']) > 0:
                 return response['choices'][0]['text'].strip()
@@ -105,9 +356,6 @@ class LLMManager:
         Returns:
             Generated response
         """
-        if not self.llm:
-            return "❌ LLM not initialized"
-        
         try:
             # Format messages into prompt
             prompt_parts = []
@@ -133,12 +381,93 @@ class LLMManager:
         return {
             'model_path': self.model_path,
             'config': self.config,
+            'kv_cache': self.kv_cache.get_stats(),
+            'prompt_cache': self.prompt_cache.get_stats() if self.prompt_cache else None,
+            'generation': self.get_generation_stats(),
             'memory_usage': psutil.virtual_memory().percent,
             'cpu_usage': psutil.cpu_percent(),
             'is_initialized': self.llm is not None
         }
 
 
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def iter_sentences(pieces: Iterable[str], min_length: int = 2) -> Iterator[str]:
+    """
+    Group a stream of generated text pieces into complete sentences.
+    
+    Args:
+        pieces: Text pieces, e.g. from LLMManager.stream()
+        min_length: Fragments shorter than this are merged into the next sentence
+        
+    Yields:
+        Each sentence as soon as its terminating punctuation has been generated
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        parts = _SENTENCE_END.split(buffer)
+        # The last part may still be growing
+        buffer = parts.pop()
+        pending = ""
+        for part in parts:
+            pending = f"{pending} {part}".strip() if pending else part.strip()
+            if len(pending) >= min_length:
+                yield pending
+                pending = ""
+        if pending:
+            buffer = f"{pending} {buffer}"
+    
+    if buffer.strip():
+        yield buffer.strip()
+
+
+_shared_llm: Optional[LLMManager] = None
+_shared_llm_lock = threading.Lock()
+
+
+def get_shared_llm(model_path: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> LLMManager:
+    """
+    Get the process-wide LLM manager, loading the model on first use.
+    
+    Every mode should go through this so the GGUF weights are only loaded
+    once per process. Later calls ignore model_path/config. On first boot
+    the model is tuned for this device (see utils.llm_tuner).
+    
+    Args:
+        model_path: Path to the GGUF model file (defaults to config.get_model_path('llama'))
+        config: Optional configuration dictionary (defaults to config.get_config_for_system())
+        
+    Returns:
+        The shared LLMManager instance
+    """
+    global _shared_llm
+    
+    with _shared_llm_lock:
+        if _shared_llm is None:
+            from config import KV_CACHE_CONFIG, SPECULATIVE_CONFIG, get_model_path, get_config_for_system
+            model_path = model_path or get_model_path('llama')
+            config = config or get_config_for_system()
+            ensure_profile(model_path, config)
+            
+            prompt_cache = None
+            if KV_CACHE_CONFIG.get('enabled') and os.path.exists(model_path):
+                try:
+                    prompt_cache = PromptDiskCache(
+                        model_path,
+                        cache_dir=KV_CACHE_CONFIG['path'],
+                        max_size_mb=KV_CACHE_CONFIG['max_size_mb'],
+                        variant=profile_variant(model_path),
+                    )
+                except Exception as e:
+                    print(f"⚠️  Prompt cache disabled: {e}")
+            
+            _shared_llm = LLMManager(model_path, config, prompt_cache=prompt_cache,
+                                     speculative=SPECULATIVE_CONFIG)
+        return _shared_llm
+
+
 def find_model_file(model_name: str = "llama-7b-q4_0.gguf") -> Optional[str]:
     """
     Find a model file in common locations.
@@ -203,7 +532,8 @@ def check_model_compatibility(model_path: str) -> bool:
             return False
         
         # Try to load the model briefly
-        test_llm = Llama(model_path, n_ctx=512, n_threads=1, verbose=False)
+        from llama_cpp import Llama
+        test_llm = Llama(**{**llama_params(model_path), 'n_ctx': 512, 'verbose': False})
         test_llm = None  # Release memory
         
         return True
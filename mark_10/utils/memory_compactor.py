@@ -0,0 +1,258 @@
+"""
+Memory Compaction Utilities
+Keeps the chat-history collection small and useful.
+
+Every chat turn is stored as a memory, so the collection grows without bound
+and fills up with near-identical repeats. While the assistant is idle,
+MemoryCompactor:
+- drops near-duplicates (cosine >= duplicate_threshold), keeping the newest
+- folds clusters of similar old memories into one LLM-written summary
+- enforces a maximum age and a maximum count
+- rebuilds the store (NumpyVectorStore.compact) to reclaim deleted rows
+
+Only memories the assistant wrote itself (metadata type 'conversation' or
+'summary') are managed; seeded knowledge is never touched. Without
+embeddings (BM25 backend, no model loaded) only exact repeats are merged and
+clusters are not summarized.
+"""
+
+import time
+import threading
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+
+from utils.rag_utils import RAGManager
+
+
+MANAGED_TYPES = ('conversation', 'summary')
+
+CLUSTER_SUMMARY_PROMPT = """Merge the related conversation snippets below into one short memory (at most two sentences). Keep names, facts and user preferences.
+
+{snippets}
+
+Memory:"""
+
+
+def find_duplicates(embeddings: np.ndarray, threshold: float) -> List[int]:
+    """
+    Find near-duplicate rows, keeping the first row of each duplicate group.
+
+    Args:
+        embeddings: L2-normalized vectors, in priority order (kept rows first)
+        threshold: Cosine similarity at or above which rows are duplicates
+
+    Returns:
+        Indices of rows to drop
+    """
+    similarity = embeddings @ embeddings.T
+    dropped = np.zeros(len(embeddings), dtype=bool)
+    for i in range(len(embeddings)):
+        if not dropped[i]:
+            dropped[i + 1:] |= similarity[i, i + 1:] >= threshold
+    return np.flatnonzero(dropped).tolist()
+
+
+def cluster(embeddings: np.ndarray, threshold: float) -> List[List[int]]:
+    """
+    Greedily group rows around seeds with cosine similarity >= threshold.
+
+    Args:
+        embeddings: L2-normalized vectors
+        threshold: Minimum similarity to a cluster's seed
+
+    Returns:
+        Clusters as lists of row indices
+    """
+    similarity = embeddings @ embeddings.T
+    assigned = np.zeros(len(embeddings), dtype=bool)
+    clusters = []
+    for i in range(len(embeddings)):
+        if assigned[i]:
+            continue
+        members = np.flatnonzero(~assigned & (similarity[i] >= threshold))
+        assigned[members] = True
+        clusters.append(members.tolist())
+    return clusters
+
+
+class MemoryCompactor:
+    """Deduplicates, summarizes and expires chat memories while idle."""
+
+    def __init__(self, rag_manager: RAGManager, llm_manager=None, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the memory compactor.
+
+        Args:
+            rag_manager: RAG manager holding the chat-history collection
+            llm_manager: Optional LLM used to summarize old clusters
+            config: Optional configuration (see MEMORY_CONFIG in config.py)
+        """
+        self.rag = rag_manager
+        self.llm = llm_manager
+        self.config = {**self._get_default_config(), **(config or {})}
+
+        self.last_run = 0.0
+        self.last_stats: Dict[str, int] = {}
+        self._run_lock = threading.Lock()
+        self._idle_timer: Optional[threading.Timer] = None
+
+    def _get_default_config(self) -> Dict[str, Any]:
+        """Get default compaction configuration."""
+        return {
+            'enabled': True,
+            'idle_seconds': 120.0,         # Idle time before compaction may start
+            'min_interval_seconds': 3600,  # At most one run per interval
+            'duplicate_threshold': 0.95,   # Cosine similarity of near-duplicates
+            'cluster_threshold': 0.8,      # Cosine similarity within a summarized cluster
+            'min_cluster_size': 3,         # Smallest cluster worth summarizing
+            'summarize_after_days': 7,     # Only clusters older than this are summarized
+            'max_age_days': 90,            # Memories older than this are dropped
+            'max_count': 2000,             # Oldest memories beyond this are dropped
+            'max_summary_tokens': 96,
+        }
+
+    def touch(self):
+        """Restart the idle countdown (call after every interaction)."""
+        if not self.config['enabled']:
+            return
+        if self._idle_timer:
+            self._idle_timer.cancel()
+        self._idle_timer = threading.Timer(self.config['idle_seconds'], self._on_idle)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _on_idle(self):
+        if time.time() - self.last_run >= self.config['min_interval_seconds']:
+            self.run()
+
+    def run(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Compact the collection once.
+
+        Args:
+            now: Reference time for age limits (defaults to the current time)
+
+        Returns:
+            Counts of duplicates, summarized, expired and over_limit memories removed
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return {}
+        try:
+            return self._run(time.time() if now is None else now)
+        except Exception as e:
+            print(f"⚠️  Memory compaction failed: {e}")
+            return {}
+        finally:
+            self.last_run = time.time()
+            self._run_lock.release()
+
+    def _run(self, now: float) -> Dict[str, int]:
+        if not self.rag.is_available():
+            return {}
+        self.rag.flush()
+        store = self.rag.collection
+
+        data = store.get(include_embeddings=True)
+        rows = [i for i, metadata in enumerate(data['metadatas'])
+                if (metadata or {}).get('type') in MANAGED_TYPES]
+        stats = {'duplicates': 0, 'summarized': 0, 'expired': 0, 'over_limit': 0}
+        if not rows:
+            return stats
+
+        ids = [data['ids'][i] for i in rows]
+        documents = [data['documents'][i] for i in rows]
+        metadatas = [data['metadatas'][i] or {} for i in rows]
+        vectors = None
+        if 'embeddings' in data:
+            vectors = np.asarray([data['embeddings'][i] for i in rows], dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        elif self.rag.embedder:
+            vectors = self.rag.embedder.encode(documents, cache=False)
+        # Memories from before timestamps were recorded count as the oldest for
+        # the count limit, but their age is unknown, so they never expire by age
+        timestamps = np.array([float(m.get('timestamp', 0.0)) for m in metadatas])
+        dated = timestamps > 0
+
+        # Newest first: duplicates keep their most recent copy, limits drop the oldest
+        order = np.argsort(-timestamps, kind='stable')
+        remove = set()
+
+        if vectors is not None:
+            for position in find_duplicates(vectors[order], self.config['duplicate_threshold']):
+                remove.add(int(order[position]))
+        else:
+            # Stores without embeddings (BM25): only exact repeats are duplicates
+            seen = set()
+            for i in order:
+                text = " ".join(documents[i].lower().split())
+                if text in seen:
+                    remove.add(int(i))
+                seen.add(text)
+        stats['duplicates'] = len(remove)
+
+        max_age = self.config['max_age_days'] * 86400
+        for i in order:
+            if i not in remove and dated[i] and now - timestamps[i] > max_age:
+                remove.add(int(i))
+                stats['expired'] += 1
+
+        summaries = []
+        if self.llm and vectors is not None:
+            cutoff = now - self.config['summarize_after_days'] * 86400
+            old = [int(i) for i in order if i not in remove and timestamps[i] < cutoff
+                   and metadatas[i].get('type') == 'conversation']
+            for members in cluster(vectors[old], self.config['cluster_threshold']):
+                if len(members) < self.config['min_cluster_size']:
+                    continue
+                group = [old[m] for m in members]
+                summary = self._summarize([documents[i] for i in group])
+                if summary:
+                    summaries.append({
+                        'content': summary,
+                        'metadata': {'type': 'summary', 'timestamp': float(timestamps[group].max()),
+                                     'merged': len(group)}
+                    })
+                    remove.update(group)
+                    stats['summarized'] += len(group)
+
+        kept = [int(i) for i in order if i not in remove]
+        overflow = len(kept) + len(summaries) - self.config['max_count']
+        if overflow > 0:
+            for i in kept[-overflow:]:
+                remove.add(i)
+            stats['over_limit'] = min(overflow, len(kept))
+
+        if summaries:
+            self.rag.add_documents(summaries)
+        if remove:
+            store.delete([ids[i] for i in remove])
+            # Rebuild without the deleted rows (ChromaDB maintains its index itself)
+            if hasattr(store, 'compact'):
+                store.compact()
+
+        self.last_stats = stats
+        if remove:
+            print(f"🧹 Memory compacted: {stats}")
+        return stats
+
+    def _summarize(self, snippets: List[str]) -> Optional[str]:
+        """Ask the LLM to merge a cluster of memories into one."""
+        prompt = CLUSTER_SUMMARY_PROMPT.format(snippets="\n---\n".join(snippets))
+        response = self.llm.complete(
+            prompt,
+            cache_key="summary",
+            max_tokens=self.config['max_summary_tokens'],
+            temperature=0.2,
+            stop=["\n\n", "---"],
+            echo=False
+        )
+        if response and 'choices' in response and len(response['choices']) > 0:
+            return response['choices'][0]['text'].strip() or None
+        return None
+
+    def cleanup(self):
+        """Cancel a pending idle run."""
+        if self._idle_timer:
+            self._idle_timer.cancel()
+            self._idle_timer = None
@@ -0,0 +1,264 @@
+"""
+Model Manager
+Loads models when a mode needs them and evicts idle ones under memory pressure.
+
+The Pi has 4-8GB of RAM shared by the LLM, YOLO (with torch) and the
+embedding model. Each model is registered with the modes that use it and
+with load/unload callbacks. On a mode switch, ModelManager:
+- loads the mode's models that are not resident
+- evicts least-recently-used models of other modes while system memory is
+  above SYSTEM_CONFIG['memory_threshold']
+- pre-loads the models of the mode most likely to be entered next, in the
+  background, when they fit under the threshold
+
+Footprints are measured as the process RSS growth while a model loads, so
+they are estimates (other threads allocate meanwhile), refined on each load.
+"""
+
+import gc
+import time
+import threading
+from collections import Counter
+from typing import Optional, Callable, Dict, Any, List, Iterable, Set
+
+import psutil
+
+
+class ModelManager:
+    """On-demand loading and LRU eviction of models shared between modes."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the model manager.
+
+        Args:
+            config: Optional configuration (see SYSTEM_CONFIG in config.py)
+        """
+        self.config = {**self._get_default_config(), **(config or {})}
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self.active_mode: Optional[str] = None
+        # Modes still starting up; their models are never evicted
+        self.loading_modes: Set[str] = set()
+        self.stats = {'loads': 0, 'evictions': 0, 'preloads': 0}
+
+        self._lock = threading.RLock()
+        self._process = psutil.Process()
+        # Mode switch counts, used to predict the next mode
+        self._transitions: Dict[str, Counter] = {}
+        self._preload_thread: Optional[threading.Thread] = None
+
+    def _get_default_config(self) -> Dict[str, Any]:
+        """Get default model manager configuration."""
+        return {
+            'memory_threshold': 85,    # Evict inactive models above this system memory use (%)
+            'preload_next_mode': True, # Pre-load the likely next mode's models in the background
+        }
+
+    def register(self, name: str, load: Callable[[], Any], unload: Callable[[], None],
+                 is_loaded: Callable[[], bool], modes: Iterable[str], size_mb: float = 0.0):
+        """
+        Register a model, or add modes to one registered before.
+
+        Modes that load in parallel may register a shared model at the same
+        time; the first registration's callbacks are kept and later ones
+        only add their modes.
+
+        Args:
+            name: Model name, e.g. 'llm'
+            load: Loads the model (no-op if it is already resident)
+            unload: Releases every reference to the model
+            is_loaded: Reports whether the model is resident (models may also
+                reload themselves on use, so this is asked rather than tracked)
+            modes: Modes that need the model
+            size_mb: Footprint estimate until the first measured load
+        """
+        with self._lock:
+            if name in self.models:
+                self.models[name]['modes'].update(modes)
+                return
+            self.models[name] = {
+                'load': load,
+                'unload': unload,
+                'modes': set(modes),
+                'is_loaded': is_loaded,
+                'size_mb': size_mb,
+                'last_used': time.time() if is_loaded() else 0.0,
+                'lock': threading.Lock(),
+            }
+
+    def _rss_mb(self) -> float:
+        return self._process.memory_info().rss / (1024 * 1024)
+
+    @staticmethod
+    def memory_percent() -> float:
+        """Get system memory use (%)."""
+        return psutil.virtual_memory().percent
+
+    def ensure_loaded(self, name: str):
+        """
+        Load a model if it is not resident and mark it as used.
+
+        Args:
+            name: Registered model name
+        """
+        entry = self.models[name]
+        with entry['lock']:
+            if not entry['is_loaded']():
+                print(f"Loading model '{name}'...")
+                start_time = time.time()
+                rss_before = self._rss_mb()
+                entry['load']()
+                growth = self._rss_mb() - rss_before
+                if growth > 0:
+                    entry['size_mb'] = growth
+                self.stats['loads'] += 1
+                print(f"✅ Model '{name}' loaded in {time.time() - start_time:.1f}s (~{entry['size_mb']:.0f}MB)")
+            entry['last_used'] = time.time()
+
+    def evict(self, name: str) -> bool:
+        """
+        Unload a model.
+
+        Args:
+            name: Registered model name
+
+        Returns:
+            True if the model was resident
+        """
+        entry = self.models[name]
+        with entry['lock']:
+            if not entry['is_loaded']():
+                return False
+            try:
+                entry['unload']()
+            except Exception as e:
+                print(f"⚠️  Could not unload model '{name}': {e}")
+                return False
+            self.stats['evictions'] += 1
+        # Weights are only freed once the last reference is collected
+        gc.collect()
+        print(f"🧹 Evicted model '{name}' (~{entry['size_mb']:.0f}MB)")
+        return True
+
+    def _models_for(self, mode: Optional[str]) -> List[str]:
+        return [name for name, entry in self.models.items() if mode in entry['modes']]
+
+    def enforce_memory(self) -> List[str]:
+        """
+        Evict least-recently-used models of inactive modes while memory is above the threshold.
+
+        Returns:
+            Names of evicted models
+        """
+        evicted = []
+        with self._lock:
+            if self.active_mode is None:
+                # Still starting up: every resident model is about to be used
+                return evicted
+            keep = set(self._models_for(self.active_mode))
+            for mode in self.loading_modes:
+                keep.update(self._models_for(mode))
+            candidates = sorted(
+                (name for name, entry in self.models.items() if entry['is_loaded']() and name not in keep),
+                key=lambda name: self.models[name]['last_used']
+            )
+        for name in candidates:
+            if self.memory_percent() <= self.config['memory_threshold']:
+                break
+            if self.evict(name):
+                evicted.append(name)
+        return evicted
+
+    def set_loading(self, mode: str, loading: bool):
+        """
+        Mark a mode as starting up (its models are kept) or as done.
+
+        Args:
+            mode: Mode name, e.g. 'chat'
+            loading: True while the mode is being constructed and warmed up
+        """
+        with self._lock:
+            if loading:
+                self.loading_modes.add(mode)
+            else:
+                self.loading_modes.discard(mode)
+
+    def enter_mode(self, mode: str):
+        """
+        Make a mode's models resident, free memory and pre-load the likely next mode.
+
+        Args:
+            mode: Mode being entered, e.g. 'chat'
+        """
+        with self._lock:
+            if self.active_mode and self.active_mode != mode:
+                self._transitions.setdefault(self.active_mode, Counter())[mode] += 1
+            self.active_mode = mode
+            names = self._models_for(mode)
+
+        for name in names:
+            self.ensure_loaded(name)
+        self.enforce_memory()
+
+        if self.config['preload_next_mode']:
+            self._start_preload(self.predict_next_mode(mode))
+
+    def predict_next_mode(self, mode: str) -> Optional[str]:
+        """
+        Guess the mode entered after this one.
+
+        Args:
+            mode: Current mode
+
+        Returns:
+            The most frequent successor so far, else any other mode
+        """
+        with self._lock:
+            successors = self._transitions.get(mode)
+            if successors:
+                return successors.most_common(1)[0][0]
+            others = sorted({m for entry in self.models.values() for m in entry['modes']} - {mode})
+            return others[0] if others else None
+
+    def _fits(self, size_mb: float) -> bool:
+        """Check that loading size_mb more keeps memory under the threshold."""
+        memory = psutil.virtual_memory()
+        used_mb = (memory.total - memory.available) / (1024 * 1024)
+        return 100.0 * (used_mb + size_mb) / (memory.total / (1024 * 1024)) <= self.config['memory_threshold']
+
+    def _start_preload(self, mode: Optional[str]):
+        if mode is None or (self._preload_thread and self._preload_thread.is_alive()):
+            return
+        with self._lock:
+            pending = [name for name in self._models_for(mode) if not self.models[name]['is_loaded']()]
+        if not pending:
+            return
+
+        def _preload():
+            for name in pending:
+                if not self._fits(self.models[name]['size_mb']):
+                    print(f"⚠️  Not pre-loading '{name}': not enough free memory")
+                    return
+                try:
+                    self.ensure_loaded(name)
+                    self.stats['preloads'] += 1
+                except Exception as e:
+                    print(f"⚠️  Pre-loading '{name}' failed: {e}")
+                    return
+
+        self._preload_thread = threading.Thread(target=_preload, name="model-preload", daemon=True)
+        self._preload_thread.start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-model residency and footprint, plus load/eviction counters."""
+        with self._lock:
+            return {
+                **self.stats,
+                'active_mode': self.active_mode,
+                'memory_percent': self.memory_percent(),
+                'rss_mb': self._rss_mb(),
+                'models': {
+                    name: {'loaded': entry['is_loaded'](), 'size_mb': entry['size_mb'], 'modes': sorted(entry['modes'])}
+                    for name, entry in self.models.items()
+                },
+            }
@@ -1,67 +1,119 @@
 """
 RAG (Retrieval-Augmented Generation) Utilities
-Optional RAG implementation using sentence transformers and ChromaDB.
+Optional RAG implementation using the shared embedding service and a vector
+store (the numpy backend or ChromaDB, see utils/vector_store.py), or the
+lexical BM25 backend (utils/bm25_store.py), which needs no embedding model.
 """
 
 import os
 import json
-from typing import List, Dict, Any, Optional
-import chromadb
-from sentence_transformers import SentenceTransformer
+import uuid
+import queue
+import atexit
+import threading
+from typing import List, Dict, Any, Optional, Union
+
+from utils.embedding_service import EmbeddingService, get_embedding_service, peek_embedding_service
+from utils.vector_store import VectorStore, open_vector_store
+
+
+# Queue marker asking the writer thread to write out its current batch now
+_FLUSH = object()
+
+
+def store_path_for(config: Dict[str, Any]) -> str:
+    """
+    Get the storage directory of the backend selected in a RAG configuration.
+
+    Args:
+        config: RAG configuration (RAG_CONFIG)
+
+    Returns:
+        Directory passed to the vector store
+    """
+    backend = config.get('backend', 'numpy')
+    if backend == 'chroma':
+        return config['chroma_db_path']
+    if backend == 'bm25':
+        return config.get('bm25_store_path', './bm25_store')
+    return config['vector_store_path']
 
 
 class RAGManager:
     """Manages RAG operations for enhanced context retrieval."""
     
-    def __init__(self, collection_name: str = "ai_assistant_kb"):
+    def __init__(self, collection_name: str = "ai_assistant_kb", backend: str = "numpy",
+                 store_path: Optional[str] = None, write_behind: bool = True,
+                 write_batch_size: int = 16, flush_interval: float = 2.0,
+                 hybrid: Union[bool, str] = 'auto', hybrid_weight: float = 0.5,
+                 migrate_from: Optional[str] = None):
         """
         Initialize RAG manager.
         
         Args:
-            collection_name: Name of the ChromaDB collection
+            collection_name: Name of the vector store collection
+            backend: Vector store backend, 'numpy', 'bm25' or 'chroma'
+            store_path: Storage directory (defaults to ./vector_store, ./bm25_store or ./chroma_db)
+            write_behind: Embed and insert add_document() calls on a background thread
+            write_batch_size: Maximum documents embedded and inserted together
+            flush_interval: Idle seconds after which a partial batch is written
+            hybrid: BM25 backend only - re-score BM25 candidates with embeddings:
+                True loads the embedding model, 'auto' uses it only if another
+                component already loaded it, False never does
+            hybrid_weight: Share of the embedding similarity in hybrid scores
+            migrate_from: ChromaDB directory copied into a new numpy collection
+                (memories stored before the numpy backend became the default)
         """
         self.collection_name = collection_name
-        self.embedding_model: Optional[SentenceTransformer] = None
-        self.chroma_client: Optional[chromadb.ClientAPI] = None
-        self.collection: Optional[chromadb.Collection] = None
+        self.backend = backend
+        self.store_path = store_path or store_path_for({
+            'backend': backend, 'chroma_db_path': './chroma_db', 'vector_store_path': './vector_store'
+        })
+        self.embedder: Optional[EmbeddingService] = None
+        self.collection: Optional[VectorStore] = None
+        self.hybrid = hybrid
+        self.hybrid_weight = hybrid_weight
+        self.migrate_from = migrate_from
+        
+        self.write_batch_size = max(1, write_batch_size)
+        self.flush_interval = flush_interval
+        self._write_queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
         
         self._initialize_rag()
+        
+        if write_behind and self.collection:
+            self._write_queue = queue.Queue()
+            self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
     
     def _initialize_rag(self):
         """Initialize RAG components."""
         try:
-            # Initialize embedding model
-            print("Loading embedding model...")
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            # Attach to the process-wide embedding model (BM25 works without one)
+            if self.backend != 'bm25' or self.hybrid is True:
+                self.embedder = get_embedding_service()
             
-            # Initialize ChromaDB
-            print("Initializing ChromaDB...")
-            self.chroma_client = chromadb.PersistentClient(
-                path="./chroma_db"
-            )
+            # Open (or create) the collection
+            print(f"Initializing vector store ({self.backend})...")
+            self.collection = open_vector_store(self.backend, self.store_path, self.collection_name,
+                                                chroma_path=self.migrate_from)
             
-            # Get or create collection
-            try:
-                self.collection = self.chroma_client.get_collection(
-                    name=self.collection_name
-                )
-                print(f"✅ Loaded existing collection: {self.collection_name}")
-            except:
-                self.collection = self.chroma_client.create_collection(
-                    name=self.collection_name
-                )
+            if self.collection.is_new:
                 print(f"✅ Created new collection: {self.collection_name}")
                 
                 # Add some default knowledge
                 self._add_default_knowledge()
+            else:
+                print(f"✅ Loaded existing collection: {self.collection_name}")
             
             print("✅ RAG system initialized successfully!")
             
         except Exception as e:
             print(f"❌ Error initializing RAG: {e}")
             print("RAG functionality will be disabled.")
-            self.embedding_model = None
-            self.chroma_client = None
+            self.embedder = None
             self.collection = None
     
     def _add_default_knowledge(self):
@@ -87,10 +139,55 @@ class RAGManager:
         
         self.add_documents(default_knowledge)
     
+    @staticmethod
+    def _new_id() -> str:
+        """Allocate a collision-free document id without scanning the collection."""
+        return f"doc_{uuid.uuid4().hex}"
+    
+    def _write_batch(self, contents: List[str], metadatas: List[Dict[str, Any]]):
+        """Embed and insert a batch of documents in one call."""
+        embeddings = self.embedder.encode(contents).tolist() if self.backend != 'bm25' else None
+        self.collection.add(
+            embeddings=embeddings,
+            documents=contents,
+            metadatas=metadatas,
+            ids=[self._new_id() for _ in contents]
+        )
+    
+    def _writer_loop(self):
+        """Background writer: batch queued documents and insert them off the response path."""
+        running = True
+        while running:
+            item = self._write_queue.get()
+            items = [item]
+            
+            # Gather more documents until the batch is full or the queue goes idle
+            while item is not None and item is not _FLUSH and len(items) < self.write_batch_size:
+                try:
+                    item = self._write_queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                items.append(item)
+            
+            documents = [doc for doc in items if doc is not None and doc is not _FLUSH]
+            running = None not in items
+            
+            if documents:
+                try:
+                    self._write_batch([doc[0] for doc in documents], [doc[1] for doc in documents])
+                except Exception as e:
+                    print(f"❌ Error writing {len(documents)} document(s): {e}")
+            
+            for _ in items:
+                self._write_queue.task_done()
+    
     def add_document(self, content: str, metadata: Optional[Dict[str, Any]] = None):
         """
         Add a single document to the knowledge base.
         
+        With write-behind enabled the document is queued and embedded/inserted
+        in the background, so this returns immediately.
+        
         Args:
             content: Document content
             metadata: Optional metadata
@@ -98,18 +195,12 @@ class RAGManager:
         if not self.collection:
             return False
         
+        if self._writer and self._writer.is_alive():
+            self._write_queue.put((content, metadata or {}))
+            return True
+        
         try:
-            # Generate embedding
-            embedding = self.embedding_model.encode(content).tolist()
-            
-            # Add to collection
-            self.collection.add(
-                embeddings=[embedding],
-                documents=[content],
-                metadatas=[metadata or {}],
-                ids=[f"doc_{len(self.collection.get()['ids'])}"]
-            )
-            
+            self._write_batch([content], [metadata or {}])
             return True
             
         except Exception as e:
@@ -130,19 +221,7 @@ class RAGManager:
             contents = [doc['content'] for doc in documents]
             metadatas = [doc.get('metadata', {}) for doc in documents]
             
-            # Generate embeddings
-            embeddings = self.embedding_model.encode(contents).tolist()
-            
-            # Generate IDs
-            ids = [f"doc_{i}" for i in range(len(contents))]
-            
-            # Add to collection
-            self.collection.add(
-                embeddings=embeddings,
-                documents=contents,
-                metadatas=metadatas,
-                ids=ids
-            )
+            self._write_batch(contents, metadatas)
             
             print(f"✅ Added {len(documents)} documents to knowledge base")
             return True
@@ -151,6 +230,21 @@ class RAGManager:
             print(f"❌ Error adding documents: {e}")
             return False
     
+    def flush(self):
+        """Block until every queued document has been written."""
+        if self._writer and self._writer.is_alive():
+            self._write_queue.put(_FLUSH)
+            self._write_queue.join()
+    
+    def close(self):
+        """Write out queued documents and stop the background writer."""
+        if self._writer and self._writer.is_alive():
+            self._write_queue.put(None)
+            self._write_queue.join()
+            self._writer.join(timeout=5.0)
+        if self.collection:
+            self.collection.close()
+    
     def search(self, query: str, n_results: int = 3) -> List[Dict[str, Any]]:
         """
         Search the knowledge base for relevant documents.
@@ -165,9 +259,12 @@ class RAGManager:
         if not self.collection:
             return []
         
+        if self.backend == 'bm25':
+            return self._search_lexical(query, n_results)
+        
         try:
-            # Generate query embedding
-            query_embedding = self.embedding_model.encode(query).tolist()
+            # Generate query embedding (repeated queries come from the cache)
+            query_embedding = self.embedder.encode(query).tolist()
             
             # Search collection
             results = self.collection.query(
@@ -191,6 +288,38 @@ class RAGManager:
             print(f"❌ Error searching knowledge base: {e}")
             return []
     
+    def _search_lexical(self, query: str, n_results: int) -> List[Dict[str, Any]]:
+        """BM25 search, optionally re-scored with embedding similarity."""
+        try:
+            embedder = self.embedder or (peek_embedding_service() if self.hybrid == 'auto' else None)
+            # Re-scoring needs a wider candidate pool than the final result count
+            n_candidates = n_results * 4 if embedder else n_results
+            results = self.collection.query_text(query, n_results=n_candidates)
+            documents = results['documents'][0]
+            if not documents:
+                return []
+            
+            formatted_results = [
+                {'content': doc, 'metadata': results['metadatas'][0][i], 'distance': results['distances'][0][i]}
+                for i, doc in enumerate(documents)
+            ]
+            if embedder is None:
+                return formatted_results
+            
+            # Hybrid: blend cosine similarity with max-normalized BM25
+            query_vector = embedder.encode(query)
+            similarities = embedder.encode(documents) @ query_vector
+            top_score = max(results['scores'][0]) or 1.0
+            for result, similarity, score in zip(formatted_results, similarities, results['scores'][0]):
+                combined = self.hybrid_weight * float(similarity) + (1 - self.hybrid_weight) * score / top_score
+                result['distance'] = 1.0 - combined
+            formatted_results.sort(key=lambda result: result['distance'])
+            return formatted_results[:n_results]
+            
+        except Exception as e:
+            print(f"❌ Error searching knowledge base: {e}")
+            return []
+    
     def get_context_for_query(self, query: str, max_context_length: int = 500) -> str:
         """
         Get relevant context for a query to enhance LLM responses.
@@ -225,7 +354,7 @@ class RAGManager:
     
     def is_available(self) -> bool:
         """Check if RAG functionality is available."""
-        return self.collection is not None and self.embedding_model is not None
+        return self.collection is not None and (self.embedder is not None or self.backend == 'bm25')
     
     def get_stats(self) -> Dict[str, Any]:
         """Get RAG system statistics."""
@@ -233,11 +362,12 @@ class RAGManager:
             return {"available": False}
         
         try:
-            collection_data = self.collection.get()
             return {
                 "available": True,
-                "document_count": len(collection_data['ids']) if collection_data['ids'] else 0,
-                "collection_name": self.collection_name
+                "document_count": self.collection.count(),
+                "pending_writes": self._write_queue.qsize() if self._write_queue else 0,
+                "collection_name": self.collection_name,
+                "backend": self.backend
             }
         except:
             return {"available": False}
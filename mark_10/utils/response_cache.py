@@ -0,0 +1,226 @@
+"""
+Response Cache
+Answers repeated chat questions without running the LLM.
+
+Household users ask the same things again and again ("what can you do",
+"how far away is the moon"). The cache sits in front of the LLM:
+- exact match on the normalized question (case and whitespace insensitive)
+- semantic match: cosine similarity of question embeddings above a strict
+  threshold, so "What can you do?" also answers "what are you able to do"
+- entries expire after a TTL and can be invalidated one by one
+- questions whose answer depends on the clock ("what time is it", "today's
+  weather") or on the conversation ("what did I just say", "tell me more
+  about it") are never cached
+
+Each entry remembers how long its answer took to generate, so the stats
+report the latency saved by hits.
+"""
+
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from utils.embedding_service import EmbeddingService
+
+
+# Answers that change with the clock or the outside world
+_TIME_SENSITIVE = re.compile(
+    r"\b(time|date|day|today|tonight|tomorrow|yesterday|now|current(ly)?|latest|recent(ly)?|"
+    r"news|weather|forecast|temperature|timer|alarm|remind(er)?|schedule|this (week|month|year))\b"
+)
+
+# Answers that depend on earlier turns or on what the assistant knows about the user
+_HISTORY_DEPENDENT = re.compile(
+    r"\b(i|me|my|mine|we|us|our|you said|you told|earlier|before|previous(ly)?|last|again|"
+    r"more|else|it|that|this|these|those|he|she|they|them|his|her|their)\b"
+)
+
+
+class ResponseCache:
+    """Exact and embedding-similarity cache of chat answers."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None,
+                 embedder: Optional[EmbeddingService] = None):
+        """
+        Initialize the response cache.
+
+        Args:
+            config: Optional configuration (see RESPONSE_CACHE_CONFIG in config.py)
+            embedder: Embedding service for semantic lookups (exact match only if None)
+        """
+        self.config = {**self._get_default_config(), **(config or {})}
+        self.embedder = embedder
+        self.stats = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0, 'bypassed': 0,
+                      'expired': 0, 'invalidated': 0, 'saved_seconds': 0.0}
+
+        # question key -> {'question', 'answer', 'vector', 'expires', 'latency'}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_default_config(self) -> Dict[str, Any]:
+        """Get default response cache configuration."""
+        return {
+            'max_entries': 256,            # Least recently used answers are evicted
+            'ttl_seconds': 24 * 3600,      # Default lifetime of an answer
+            'semantic': True,              # Also match paraphrases by embedding similarity
+            'similarity_threshold': 0.95,  # Minimum cosine similarity of a semantic hit
+            'max_question_words': 20,      # Longer questions are too specific to repeat
+        }
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """Normalize a question for exact lookups (case, whitespace and punctuation insensitive)."""
+        return " ".join(re.sub(r"[^\w\s']", " ", question.lower()).split())
+
+    def is_cacheable(self, question: str) -> bool:
+        """
+        Check whether a question's answer can be reused.
+
+        Args:
+            question: User question
+
+        Returns:
+            False for empty, long, time-sensitive or history-dependent questions
+        """
+        key = self.normalize(question)
+        if not key or len(key.split()) > self.config['max_question_words']:
+            return False
+        return not (_TIME_SENSITIVE.search(key) or _HISTORY_DEPENDENT.search(key))
+
+    def _embed(self, key: str) -> Optional[np.ndarray]:
+        if not (self.embedder and self.config['semantic']):
+            return None
+        try:
+            vector = np.asarray(self.embedder.encode(key), dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️  Response cache embedding failed: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _purge_expired(self, now: float):
+        """Drop expired entries (lock must be held)."""
+        expired = [key for key, entry in self._entries.items() if entry['expires'] <= now]
+        for key in expired:
+            del self._entries[key]
+        self.stats['expired'] += len(expired)
+
+    def _nearest(self, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        """Find the most similar cached question (lock must be held)."""
+        keys = [key for key, entry in self._entries.items() if entry['vector'] is not None]
+        if not keys:
+            return None, 0.0
+        similarities = np.stack([self._entries[key]['vector'] for key in keys]) @ vector
+        best = int(np.argmax(similarities))
+        return keys[best], float(similarities[best])
+
+    def lookup(self, question: str) -> Optional[str]:
+        """
+        Get the cached answer to a question.
+
+        Args:
+            question: User question
+
+        Returns:
+            The cached answer, or None if the LLM must answer
+        """
+        if not self.is_cacheable(question):
+            with self._lock:
+                self.stats['bypassed'] += 1
+            return None
+
+        key = self.normalize(question)
+        with self._lock:
+            self._purge_expired(time.time())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats['exact_hits'] += 1
+                self.stats['saved_seconds'] += entry['latency']
+                return entry['answer']
+            if not any(entry['vector'] is not None for entry in self._entries.values()):
+                self.stats['misses'] += 1
+                return None
+
+        # Embed outside the lock; the model call may take a few milliseconds
+        vector = self._embed(key)
+        with self._lock:
+            if vector is not None:
+                match, similarity = self._nearest(vector)
+                if match is not None and similarity >= self.config['similarity_threshold']:
+                    entry = self._entries[match]
+                    self._entries.move_to_end(match)
+                    self.stats['semantic_hits'] += 1
+                    self.stats['saved_seconds'] += entry['latency']
+                    return entry['answer']
+            self.stats['misses'] += 1
+            return None
+
+    def store(self, question: str, answer: str, latency: float = 0.0, ttl: Optional[float] = None):
+        """
+        Cache the answer to a question (ignored if the question is not cacheable).
+
+        Args:
+            question: User question
+            answer: Generated answer
+            latency: Seconds the LLM took to generate it
+            ttl: Lifetime in seconds (defaults to config['ttl_seconds'])
+        """
+        if not answer or not self.is_cacheable(question):
+            return
+        key = self.normalize(question)
+        vector = self._embed(key)
+        ttl = self.config['ttl_seconds'] if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = {
+                'question': question,
+                'answer': answer,
+                'vector': vector,
+                'expires': time.time() + ttl,
+                'latency': latency,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config['max_entries']:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, question: str) -> bool:
+        """
+        Remove the cached answer to a question (exact match).
+
+        Args:
+            question: Question whose answer is stale
+
+        Returns:
+            True if an entry was removed
+        """
+        with self._lock:
+            if self._entries.pop(self.normalize(question), None) is None:
+                return False
+            self.stats['invalidated'] += 1
+            return True
+
+    def clear(self):
+        """Remove all cached answers (e.g. after swapping the LLM)."""
+        with self._lock:
+            self.stats['invalidated'] += len(self._entries)
+            self._entries.clear()
+
+    def questions(self) -> List[str]:
+        """Get the cached questions, least recently used first."""
+        with self._lock:
+            return [entry['question'] for entry in self._entries.values()]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters, hit rate and the generation time saved."""
+        with self._lock:
+            hits = self.stats['exact_hits'] + self.stats['semantic_hits']
+            lookups = hits + self.stats['misses']
+            return {
+                **self.stats,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+            }
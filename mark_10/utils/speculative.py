@@ -0,0 +1,173 @@
+"""
+Speculative Decoding Utilities
+Draft models that let the main LLM verify several tokens per forward pass.
+
+Generation on the Pi is memory-bandwidth bound: every token reads all the
+weights once. With speculative decoding a cheap drafter proposes a few
+tokens and the main model checks them in a single batched evaluation, so
+each accepted draft token is nearly free. Two drafters are supported:
+- 'prompt_lookup': copies continuations of n-grams already in the prompt
+  (no extra RAM; good for answers that quote context or history)
+- a GGUF path: a small model with the same tokenizer (e.g. gemma-2b for a
+  gemma-2b-based larger model); loaded alongside the main model
+
+DraftTracker wraps either one and counts how many proposed tokens the main
+model accepted, which together with the effective tokens/s recorded by
+LLMManager tells whether speculation pays off on a deployment.
+"""
+
+import os
+from typing import Optional, Dict, Any, TYPE_CHECKING
+
+import numpy as np
+
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+from utils.llm_tuner import llama_params
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama
+
+
+# Text whose tokenization must match between draft and main model
+_VOCAB_PROBE = "Hello! The quick brown fox jumps over the lazy dog, 3.14 times. Détectée: 猫."
+
+
+class GGUFDraftModel(LlamaDraftModel):
+    """Greedy drafts from a small llama.cpp model."""
+
+    def __init__(self, model_path: str, num_draft_tokens: int = 4, config: Optional[Dict[str, Any]] = None):
+        """
+        Load the draft model.
+
+        Args:
+            model_path: Path to the draft GGUF model file
+            num_draft_tokens: Tokens proposed per step
+            config: LLM configuration (n_ctx should match the main model)
+        """
+        from llama_cpp import Llama
+
+        self.model_path = model_path
+        self.num_draft_tokens = num_draft_tokens
+        self.llm = Llama(**llama_params(model_path, config))
+
+    def __call__(self, input_ids: np.ndarray, **kwargs) -> np.ndarray:
+        tokens = []
+        # generate() reuses the longest common prefix with the previous call,
+        # so only the tokens accepted since then are evaluated
+        for token in self.llm.generate(input_ids.tolist(), temp=0.0, reset=True):
+            tokens.append(token)
+            if len(tokens) >= self.num_draft_tokens or token == self.llm.token_eos():
+                break
+        return np.array(tokens, dtype=np.intc)
+
+
+class DraftTracker(LlamaDraftModel):
+    """Counts proposed and accepted draft tokens of a wrapped draft model."""
+
+    def __init__(self, draft_model: LlamaDraftModel, name: str):
+        """
+        Wrap a draft model.
+
+        Args:
+            draft_model: Draft model to track
+            name: Label for reports ('prompt_lookup' or the draft GGUF file name)
+        """
+        self.draft_model = draft_model
+        self.name = name
+        self.proposed = 0
+        self.accepted = 0
+        self._pending = None
+
+    def reset_pending(self):
+        """Forget the last proposal (a new generation starts)."""
+        self._pending = None
+
+    def __call__(self, input_ids: np.ndarray, **kwargs) -> np.ndarray:
+        # llama.cpp calls the drafter with the context up to the last sampled
+        # token; whatever follows the previous context is what the main model
+        # kept, so the matching prefix of the previous draft was accepted
+        if self._pending is not None:
+            context_length, draft = self._pending
+            kept = input_ids[context_length:context_length + len(draft)]
+            if len(input_ids) > context_length:
+                matched = 0
+                for proposed, actual in zip(draft, kept):
+                    if proposed != actual:
+                        break
+                    matched += 1
+                self.proposed += len(draft)
+                self.accepted += matched
+
+        draft = self.draft_model(input_ids, **kwargs)
+        self._pending = (len(input_ids), draft.copy()) if len(draft) else None
+        return draft
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get proposal and acceptance counts."""
+        return {
+            'draft': self.name,
+            'proposed': self.proposed,
+            'accepted': self.accepted,
+            'acceptance_rate': self.accepted / self.proposed if self.proposed else 0.0,
+        }
+
+
+def vocab_compatible(main: "Llama", draft: "Llama") -> bool:
+    """
+    Check that two models share a tokenizer (draft token ids mean the same).
+
+    Args:
+        main: Main model
+        draft: Draft model
+
+    Returns:
+        True if vocabulary size and a sample tokenization agree
+    """
+    probe = _VOCAB_PROBE.encode('utf-8')
+    return main.n_vocab() == draft.n_vocab() and main.tokenize(probe) == draft.tokenize(probe)
+
+
+def make_draft_model(main: "Llama", config: Dict[str, Any],
+                     llm_config: Optional[Dict[str, Any]] = None) -> Optional[DraftTracker]:
+    """
+    Build the configured draft model for a loaded main model.
+
+    A draft GGUF whose tokenizer differs from the main model's cannot be
+    used (its token ids would be verified as different tokens); prompt
+    lookup is used instead.
+
+    Args:
+        main: Loaded main model
+        config: Speculative configuration (see SPECULATIVE_CONFIG in config.py)
+        llm_config: Main model's configuration (n_ctx, n_threads)
+
+    Returns:
+        Tracked draft model, or None when speculation is disabled
+    """
+    if not config.get('enabled'):
+        return None
+
+    draft = config.get('draft', 'prompt_lookup')
+    if draft != 'prompt_lookup':
+        if not os.path.exists(draft):
+            print(f"⚠️  Draft model not found: {draft}; using prompt lookup")
+        elif os.path.realpath(draft) == os.path.realpath(main.model_path):
+            print("⚠️  Draft model is the main model; using prompt lookup")
+        else:
+            print(f"Loading draft model from: {draft}")
+            draft_model = GGUFDraftModel(draft, config.get('draft_tokens', 4), llm_config)
+            if vocab_compatible(main, draft_model.llm):
+                print("✅ Speculative decoding enabled (draft model)")
+                return DraftTracker(draft_model, os.path.basename(draft))
+            print("⚠️  Draft model uses a different tokenizer than the main model; using prompt lookup")
+            draft_model = None
+
+    print("✅ Speculative decoding enabled (prompt lookup)")
+    return DraftTracker(
+        LlamaPromptLookupDecoding(
+            max_ngram_size=config.get('max_ngram_size', 2),
+            num_pred_tokens=config.get('num_pred_tokens', 10)
+        ),
+        'prompt_lookup'
+    )
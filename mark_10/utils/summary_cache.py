@@ -0,0 +1,135 @@
+"""
+Scene Summary Cache
+Reuses LLM scene descriptions when the same objects are detected again.
+
+Pressing K3 repeatedly at the same desk yields the same labels ("person,
+laptop, cup") and would otherwise cost a full LLM generation each time.
+Summaries are keyed by the sorted multiset of labels plus a version string
+(prompt and model), kept in an LRU and optionally persisted as JSON. Old
+entries, or a random share of hits, can be regenerated so descriptions do
+not stay frozen forever.
+"""
+
+import os
+import json
+import time
+import random
+import threading
+from collections import Counter, OrderedDict
+from typing import Optional, List, Dict, Any
+
+
+class SceneSummaryCache:
+    """LRU cache of scene summaries keyed by detected label multisets."""
+
+    def __init__(self, max_entries: int = 256, path: Optional[str] = None,
+                 max_age_seconds: Optional[float] = None, regenerate_probability: float = 0.0):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum cached scenes; least recently used are evicted
+            path: Optional JSON file the cache is loaded from and saved to
+            max_age_seconds: Entries older than this are regenerated (None = never)
+            regenerate_probability: Chance that a hit is treated as a miss anyway
+        """
+        self.max_entries = max(1, max_entries)
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.regenerate_probability = regenerate_probability
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'refreshed': 0}
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    @staticmethod
+    def key_for(labels: List[str], version: str = "") -> str:
+        """
+        Build the cache key of a scene.
+
+        Args:
+            labels: Detected labels, in any order, with repeats
+            version: Prompt/model version; a change invalidates all entries
+
+        Returns:
+            e.g. 'v1|cup,laptop,person*2'
+        """
+        counts = Counter(label.strip().lower() for label in labels)
+        scene = ",".join(f"{label}*{n}" if n > 1 else label for label, n in sorted(counts.items()))
+        return f"{version}|{scene}"
+
+    def get(self, labels: List[str], version: str = "") -> Optional[str]:
+        """
+        Look up the summary of a scene.
+
+        Args:
+            labels: Detected labels
+            version: Prompt/model version
+
+        Returns:
+            The cached summary, or None if it should be generated
+        """
+        key = self.key_for(labels, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if self.max_age_seconds is not None and time.time() - entry['created'] > self.max_age_seconds:
+                self.stats['expired'] += 1
+                return None
+            if self.regenerate_probability and random.random() < self.regenerate_probability:
+                self.stats['refreshed'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry['summary']
+
+    def put(self, labels: List[str], summary: str, version: str = ""):
+        """
+        Store the summary of a scene.
+
+        Args:
+            labels: Detected labels
+            summary: Generated description
+            version: Prompt/model version
+        """
+        key = self.key_for(labels, version)
+        with self._lock:
+            self._entries[key] = {'summary': summary, 'created': time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.path:
+                self._save()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable scene summary cache: {e}")
+            return
+        # Saved least recently used first, so insertion order restores the LRU order
+        for key, entry in entries[-self.max_entries:]:
+            self._entries[key] = entry
+
+    def _save(self):
+        """Write the cache atomically (lock must be held)."""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(list(self._entries.items()), f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️  Could not save scene summary cache: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and size."""
+        with self._lock:
+            return {**self.stats, 'entries': len(self._entries)}
@@ -0,0 +1,564 @@
+"""
+Vector Store Utilities
+Storage backends for the assistant's RAG memory.
+
+The chat memory holds at most a few thousand short turns, for which ChromaDB
+(SQLite, HNSW index, telemetry and background threads) costs seconds of
+startup and tens of MB of RAM. NumpyVectorStore keeps the embeddings in a
+memory-mapped float16 matrix and the documents in an append-only JSON lines
+log, and answers queries exactly with one matrix multiply.
+
+Both backends expose the subset of the ChromaDB collection API RAGManager
+uses (add / query / get / delete / count), so they are interchangeable.
+The lexical BM25Store (utils/bm25_store.py) implements the same interface
+but is searched by text.
+"""
+
+import os
+import json
+import argparse
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator
+
+import numpy as np
+
+
+def replay_record_log(path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the records of a JSON lines log, repairing a torn last record.
+
+    A crash mid-write can leave a partial line at the end of the log. Once
+    every record has been read, the file is truncated after the last
+    complete record, so the next append starts on a fresh line instead of
+    being joined onto the fragment (and lost on the next load).
+
+    Args:
+        path: Log file (nothing is yielded if it does not exist)
+
+    Yields:
+        One decoded record per complete line
+    """
+    if not path.exists():
+        return
+    valid_bytes = 0
+    missing_newline = False
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                break  # Torn write at the end of the log
+            valid_bytes += len(line)
+            missing_newline = not line.endswith(b"\n")
+            yield record
+
+    if valid_bytes < path.stat().st_size:
+        print(f"⚠️  Dropping a torn record at the end of {path}")
+        os.truncate(path, valid_bytes)
+    if missing_newline:
+        # The record was written completely but its newline was not
+        with open(path, 'ab') as f:
+            f.write(b"\n")
+
+
+class VectorStore:
+    """Interface shared by the vector store backends."""
+
+    # True when the store was created empty by this process (used to seed defaults)
+    is_new: bool = False
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+            metadatas: Optional[List[Dict[str, Any]]] = None):
+        """
+        Add documents with their embeddings.
+
+        Args:
+            ids: Unique document ids
+            embeddings: One embedding per document
+            documents: Document texts
+            metadatas: Optional metadata per document
+        """
+        raise NotImplementedError
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 3) -> Dict[str, List[List[Any]]]:
+        """
+        Find the nearest documents for each query embedding.
+
+        Args:
+            query_embeddings: Query embeddings
+            n_results: Number of results per query
+
+        Returns:
+            ChromaDB-style result dict with ids, documents, metadatas and
+            distances, each holding one list per query
+        """
+        raise NotImplementedError
+
+    def get(self, ids: Optional[List[str]] = None, include_embeddings: bool = False) -> Dict[str, List[Any]]:
+        """
+        Get stored documents.
+
+        Args:
+            ids: Ids to fetch (all documents if None)
+            include_embeddings: Also return the stored embeddings
+
+        Returns:
+            Dict with ids, documents, metadatas (and embeddings)
+        """
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        """
+        Delete documents by id.
+
+        Args:
+            ids: Ids to delete
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Get the number of stored documents."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release files and handles held by the store."""
+
+
+class ChromaVectorStore(VectorStore):
+    """VectorStore backed by a persistent ChromaDB collection."""
+
+    def __init__(self, path: str, collection_name: str):
+        """
+        Open (or create) a ChromaDB collection.
+
+        Args:
+            path: ChromaDB directory
+            collection_name: Collection name
+        """
+        import chromadb
+
+        self.client = chromadb.PersistentClient(path=path)
+        try:
+            self.collection = self.client.get_collection(name=collection_name)
+        except Exception:
+            self.collection = self.client.create_collection(name=collection_name)
+            self.is_new = True
+
+    def add(self, ids, embeddings, documents, metadatas=None):
+        self.collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def query(self, query_embeddings, n_results=3):
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results)
+
+    def get(self, ids=None, include_embeddings=False):
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        return self.collection.get(ids=ids, include=include)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def count(self):
+        return self.collection.count()
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact-search vector store on a memory-mapped float16 matrix.
+
+    Layout of a collection directory:
+        store.json            - embedding dimension and current generation
+        vectors.<gen>.f16     - float16 matrix, one L2-normalized row per add
+        records.<gen>.jsonl   - append-only log of adds (row, id, text,
+                                metadata) and deletes
+
+    Deletes only append to the log; rows are reclaimed by compact(), which
+    writes the next generation and switches store.json atomically.
+    """
+
+    INITIAL_CAPACITY = 1024
+    QUERY_CHUNK_ROWS = 8192
+
+    def __init__(self, path: str, collection_name: str, compact_ratio: float = 0.25,
+                 compact_min_rows: int = 256):
+        """
+        Open (or create) a collection.
+
+        Args:
+            path: Root directory of the store
+            collection_name: Collection name (one subdirectory per collection)
+            compact_ratio: Compact automatically when this share of rows is deleted
+            compact_min_rows: ... and at least this many rows are deleted
+        """
+        self.directory = Path(path) / collection_name
+        self.compact_ratio = compact_ratio
+        self.compact_min_rows = compact_min_rows
+
+        self._lock = threading.RLock()
+        self.dim: Optional[int] = None
+        self.generation = 0
+        self._vectors: Optional[np.memmap] = None
+        self._live = np.zeros(0, dtype=bool)
+        self._rows = 0
+        self._ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._row_of: Dict[str, int] = {}
+        self._log = None
+
+        self.is_new = not (self.directory / "store.json").exists()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if not self.is_new:
+            self._load()
+
+    # ------------------------------------------------------------------
+    # Files
+    # ------------------------------------------------------------------
+
+    def _vectors_path(self, generation: int) -> Path:
+        return self.directory / f"vectors.{generation}.f16"
+
+    def _records_path(self, generation: int) -> Path:
+        return self.directory / f"records.{generation}.jsonl"
+
+    def _write_header(self):
+        tmp_path = self.directory / "store.json.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'dim': self.dim, 'generation': self.generation}, f)
+        os.replace(tmp_path, self.directory / "store.json")
+
+    def _map_vectors(self, capacity: int):
+        """(Re)map the vector file with room for capacity rows."""
+        path = self._vectors_path(self.generation)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(path, 'ab') as f:
+            if f.tell() < capacity * self.dim * 2:
+                f.truncate(capacity * self.dim * 2)
+        self._vectors = np.memmap(path, dtype=np.float16, mode='r+', shape=(capacity, self.dim))
+        live = np.zeros(capacity, dtype=bool)
+        kept = min(len(self._live), capacity)
+        live[:kept] = self._live[:kept]
+        self._live = live
+
+    def _load(self):
+        """Replay the record log of the current generation."""
+        with open(self.directory / "store.json") as f:
+            header = json.load(f)
+        self.dim = header['dim']
+        self.generation = header['generation']
+
+        for record in replay_record_log(self._records_path(self.generation)):
+            if record['op'] == 'add':
+                self._append_record(record['row'], record['id'], record['document'], record['metadata'])
+            elif record['op'] == 'delete':
+                self._drop_row(self._row_of.get(record['id']))
+
+        if self.dim is not None:
+            size = self._vectors_path(self.generation).stat().st_size // (self.dim * 2) \
+                if self._vectors_path(self.generation).exists() else 0
+            self._map_vectors(max(size, self._rows, self.INITIAL_CAPACITY))
+            self._live[:self._rows] = [doc_id is not None for doc_id in self._ids]
+
+    def _open_log(self):
+        if self._log is None:
+            self._log = open(self._records_path(self.generation), 'a')
+        return self._log
+
+    # ------------------------------------------------------------------
+    # Row bookkeeping
+    # ------------------------------------------------------------------
+
+    def _append_record(self, row: int, doc_id: str, document: str, metadata: Optional[Dict[str, Any]]):
+        while len(self._ids) <= row:
+            self._ids.append(None)
+            self._documents.append(None)
+            self._metadatas.append(None)
+        if doc_id in self._row_of:
+            self._drop_row(self._row_of[doc_id])
+        self._ids[row] = doc_id
+        self._documents[row] = document
+        self._metadatas[row] = metadata or {}
+        self._row_of[doc_id] = row
+        self._rows = max(self._rows, row + 1)
+
+    def _drop_row(self, row: Optional[int]):
+        if row is None or self._ids[row] is None:
+            return
+        del self._row_of[self._ids[row]]
+        self._ids[row] = None
+        self._documents[row] = None
+        self._metadatas[row] = None
+        if row < len(self._live):
+            self._live[row] = False
+
+    # ------------------------------------------------------------------
+    # VectorStore API
+    # ------------------------------------------------------------------
+
+    def add(self, ids, embeddings, documents, metadatas=None):
+        """Add documents; an existing id is replaced (upsert)."""
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids) or len(documents) != len(ids):
+            raise ValueError("ids, embeddings and documents must have the same length")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.maximum(norms, 1e-12)
+        metadatas = metadatas or [{} for _ in ids]
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._write_header()
+                self._map_vectors(self.INITIAL_CAPACITY)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+
+            start = self._rows
+            capacity = len(self._vectors)
+            if start + len(ids) > capacity:
+                while start + len(ids) > capacity:
+                    capacity *= 2
+                self._map_vectors(capacity)
+
+            # Vectors are flushed before the log references them, so a crash
+            # never leaves a logged row without its embedding.
+            self._vectors[start:start + len(ids)] = vectors.astype(np.float16)
+            self._vectors.flush()
+
+            log = self._open_log()
+            for offset, (doc_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+                row = start + offset
+                log.write(json.dumps({'op': 'add', 'row': row, 'id': doc_id,
+                                      'document': document, 'metadata': metadata or {}}) + "\n")
+                self._append_record(row, doc_id, document, metadata)
+                self._live[row] = True
+            log.flush()
+
+    def query(self, query_embeddings, n_results=3):
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        results = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        with self._lock:
+            live_count = len(self._row_of)
+            k = min(n_results, live_count)
+            if self.dim is None or k == 0:
+                for key in results:
+                    results[key] = [[] for _ in queries]
+                return results
+
+            # Cosine similarity of every row against every query, chunked to
+            # bound the float32 copy of the matrix
+            scores = np.empty((self._rows, len(queries)), dtype=np.float32)
+            for start in range(0, self._rows, self.QUERY_CHUNK_ROWS):
+                end = min(start + self.QUERY_CHUNK_ROWS, self._rows)
+                scores[start:end] = self._vectors[start:end].astype(np.float32) @ queries.T
+            scores[~self._live[:self._rows]] = -np.inf
+
+            for column in scores.T:
+                top = np.argpartition(-column, k - 1)[:k] if k < len(column) else np.arange(len(column))
+                top = top[np.argsort(-column[top])][:k]
+                results['ids'].append([self._ids[row] for row in top])
+                results['documents'].append([self._documents[row] for row in top])
+                results['metadatas'].append([self._metadatas[row] for row in top])
+                results['distances'].append([float(1.0 - column[row]) for row in top])
+
+        return results
+
+    def get(self, ids=None, include_embeddings=False):
+        with self._lock:
+            rows = [self._row_of[doc_id] for doc_id in ids if doc_id in self._row_of] if ids is not None \
+                else [row for row, doc_id in enumerate(self._ids) if doc_id is not None]
+            result = {
+                'ids': [self._ids[row] for row in rows],
+                'documents': [self._documents[row] for row in rows],
+                'metadatas': [self._metadatas[row] for row in rows],
+            }
+            if include_embeddings:
+                result['embeddings'] = self._vectors[rows].astype(np.float32) if rows \
+                    else np.zeros((0, self.dim or 0), dtype=np.float32)
+            return result
+
+    def delete(self, ids):
+        with self._lock:
+            log = self._open_log()
+            for doc_id in ids:
+                if doc_id in self._row_of:
+                    self._drop_row(self._row_of[doc_id])
+                    log.write(json.dumps({'op': 'delete', 'id': doc_id}) + "\n")
+            log.flush()
+
+            dead = self._rows - len(self._row_of)
+            if dead >= self.compact_min_rows and dead > self.compact_ratio * self._rows:
+                self.compact()
+
+    def count(self):
+        with self._lock:
+            return len(self._row_of)
+
+    def compact(self):
+        """Rewrite the store without deleted rows as a new generation."""
+        with self._lock:
+            if self.dim is None:
+                return
+            rows = np.flatnonzero(self._live[:self._rows])
+            if len(rows) == self._rows:
+                return
+            old_generation = self.generation
+            new_generation = old_generation + 1
+
+            capacity = max(self.INITIAL_CAPACITY, len(rows))
+            new_vectors = np.memmap(self._vectors_path(new_generation), dtype=np.float16,
+                                    mode='w+', shape=(capacity, self.dim))
+            new_vectors[:len(rows)] = self._vectors[rows]
+            new_vectors.flush()
+            del new_vectors
+
+            with open(self._records_path(new_generation), 'w') as f:
+                for new_row, row in enumerate(rows):
+                    f.write(json.dumps({'op': 'add', 'row': new_row, 'id': self._ids[row],
+                                        'document': self._documents[row],
+                                        'metadata': self._metadatas[row]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Switch generations: store.json is the commit point
+            self.generation = new_generation
+            self._write_header()
+
+            if self._log:
+                self._log.close()
+                self._log = None
+            self._vectors = None
+            ids = [self._ids[row] for row in rows]
+            documents = [self._documents[row] for row in rows]
+            metadatas = [self._metadatas[row] for row in rows]
+            self._ids, self._documents, self._metadatas = ids, documents, metadatas
+            self._row_of = {doc_id: row for row, doc_id in enumerate(ids)}
+            self._rows = len(ids)
+            self._live = np.ones(len(ids), dtype=bool)
+            self._map_vectors(capacity)
+
+            self._vectors_path(old_generation).unlink(missing_ok=True)
+            self._records_path(old_generation).unlink(missing_ok=True)
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            if self._log:
+                self._log.close()
+                self._log = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get row counts and on-disk size."""
+        with self._lock:
+            return {
+                'documents': len(self._row_of),
+                'rows': self._rows,
+                'deleted_rows': self._rows - len(self._row_of),
+                'dimension': self.dim,
+                'size_mb': sum(p.stat().st_size for p in self.directory.iterdir() if p.is_file()) / (1024 * 1024),
+            }
+
+
+def open_vector_store(backend: str, path: str, collection_name: str,
+                      chroma_path: Optional[str] = None) -> VectorStore:
+    """
+    Open a vector store collection with the configured backend.
+
+    Args:
+        backend: 'numpy', 'bm25' or 'chroma'
+        path: Storage directory of the backend
+        collection_name: Collection name
+        chroma_path: Earlier ChromaDB directory; a new numpy collection is
+            filled from it, so memories survive the switch of backend
+
+    Returns:
+        The opened store
+    """
+    if backend == 'numpy':
+        store = NumpyVectorStore(path, collection_name)
+        if store.is_new and chroma_path and os.path.isdir(chroma_path):
+            try:
+                copied = migrate_from_chroma(chroma_path, store, collection_name)
+            except Exception as e:
+                # No such collection in ChromaDB, or chromadb not installed
+                print(f"⚠️  Not migrating '{collection_name}' from {chroma_path}: {e}")
+            else:
+                if copied:
+                    store.is_new = False
+                    print(f"✅ Migrated {copied} documents of '{collection_name}' from ChromaDB ({chroma_path})")
+        return store
+    if backend == 'bm25':
+        from utils.bm25_store import BM25Store
+        return BM25Store(path, collection_name)
+    if backend == 'chroma':
+        return ChromaVectorStore(path, collection_name)
+    raise ValueError(f"Unknown vector store backend: {backend}")
+
+
+def migrate_from_chroma(chroma_path: str, store: VectorStore, collection_name: str,
+                        batch_size: int = 256) -> int:
+    """
+    Copy a ChromaDB collection (embeddings, documents, metadata) into a store.
+
+    Args:
+        chroma_path: Existing ChromaDB directory
+        store: Destination store
+        collection_name: Collection to copy
+        batch_size: Documents copied per batch
+
+    Returns:
+        Number of documents copied
+    """
+    import chromadb
+
+    client = chromadb.PersistentClient(path=chroma_path)
+    collection = client.get_collection(name=collection_name)
+
+    copied = 0
+    total = collection.count()
+    while copied < total:
+        batch = collection.get(limit=batch_size, offset=copied,
+                               include=["embeddings", "documents", "metadatas"])
+        if not batch['ids']:
+            break
+        store.add(
+            ids=batch['ids'],
+            embeddings=batch['embeddings'],
+            documents=batch['documents'],
+            metadatas=[metadata or {} for metadata in batch['metadatas']]
+        )
+        copied += len(batch['ids'])
+    return copied
+
+
+def main():
+    """Command-line entry point: migrate ChromaDB collections to the numpy store."""
+    from config import RAG_CONFIG
+
+    parser = argparse.ArgumentParser(description="Migrate RAG memory from ChromaDB to the numpy vector store")
+    parser.add_argument("--chroma-path", default=RAG_CONFIG['chroma_db_path'], help="Existing ChromaDB directory")
+    parser.add_argument("--output", default=RAG_CONFIG['vector_store_path'], help="Numpy vector store directory")
+    parser.add_argument("collections", nargs="*", default=[RAG_CONFIG['collection_name'], 'ai_assistant_chat_history'],
+                        help="Collections to migrate")
+    args = parser.parse_args()
+
+    for collection_name in args.collections:
+        store = NumpyVectorStore(args.output, collection_name)
+        try:
+            copied = migrate_from_chroma(args.chroma_path, store, collection_name)
+            print(f"✅ Migrated {copied} documents from '{collection_name}'")
+        except Exception as e:
+            print(f"❌ Could not migrate '{collection_name}': {e}")
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,8 @@ Chat Mode Implementation
 Handles text-based conversation using local LLM via llama.cpp.
 """
 
-import os
 from typing import Optional
-from llama_cpp import Llama
-from config import get_model_path
+from utils.llm_utils import LLMManager, get_shared_llm
 
 
 class ChatMode:
@@ -14,7 +12,7 @@ class ChatMode:
     
     def __init__(self):
         """Initialize chat mode with LLM."""
-        self.llm: Optional[Llama] = None
+        self.llm: Optional[LLMManager] = None
         self.system_prompt = """You are a helpful AI assistant running locally on a Raspberry Pi 5. 
 You are designed to be helpful, harmless, and honest. You can assist with various tasks 
 including answering questions, providing explanations, and helping with general inquiries. 
@@ -23,28 +21,9 @@ Keep your responses concise but informative."""
         self._initialize_llm()
     
     def _initialize_llm(self):
-        """Initialize the local LLM using llama.cpp."""
+        """Attach to the process-wide LLM shared with the other modes."""
         try:
-            model_path = get_model_path('llama')
-
-            if not model_path or not os.path.exists(model_path):
-                raise FileNotFoundError(
-                    "LLM model file not found. Please download a GGUF model file and place it in the models directory."
-                )
-            
-            print(f"Loading LLM model from: {model_path}")
-            
-            # Initialize LLM with optimized settings for Raspberry Pi 5
-            self.llm = Llama(
-                model_path=model_path,
-                n_ctx=2048,  # Context window
-                n_threads=4,  # Number of threads
-                n_gpu_layers=0,  # CPU only for Pi 5
-                verbose=False
-            )
-            
-            print("✅ LLM initialized successfully!")
-            
+            self.llm = get_shared_llm()
         except Exception as e:
             print(f"❌ Error initializing LLM: {e}")
             raise
@@ -59,7 +38,7 @@ Keep your responses concise but informative."""
             prompt = f"System: {self.system_prompt}\n\nHuman: {user_message}\n\nAssistant:"
             
             # Generate response
-            response = self.llm(
+            response = self.llm.complete(
                 prompt,
                 max_tokens=256,
                 temperature=0.7,
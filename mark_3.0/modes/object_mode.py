@@ -7,10 +7,10 @@ import cv2
 import numpy as np
 from typing import List, Optional, Tuple
 from ultralytics import YOLO
-from llama_cpp import Llama
 
 from utils.camera_utils import CameraManager
-from config import CAMERA_CONFIG, get_model_path
+from utils.llm_utils import LLMManager, get_shared_llm
+from config import CAMERA_CONFIG
 
 
 class ObjectMode:
@@ -19,7 +19,7 @@ class ObjectMode:
     def __init__(self):
         """Initialize object detection mode with YOLOv8 and LLM."""
         self.yolo_model: Optional[YOLO] = None
-        self.llm: Optional[Llama] = None
+        self.llm: Optional[LLMManager] = None
         self.camera_manager: Optional[CameraManager] = None
         
         self._initialize_models()
@@ -33,22 +33,9 @@ class ObjectMode:
             self.yolo_model = YOLO('yolov8n.pt')  # nano version for Pi 5
             print("✅ YOLOv8 model loaded successfully!")
             
-            # Initialize LLM for scene summarization
+            # Scene summarization shares the chat mode's LLM instance
             print("Loading LLM for scene summarization...")
-            model_path = get_model_path('llama')
-
-            if not model_path or not os.path.exists(model_path):
-                raise FileNotFoundError(
-                    "LLM model file not found for scene summarization."
-                )
-            
-            self.llm = Llama(
-                model_path=model_path,
-                n_ctx=1024,  # Smaller context for summarization
-                n_threads=4,
-                n_gpu_layers=0,
-                verbose=False
-            )
+            self.llm = get_shared_llm()
             
             print("✅ LLM for scene summarization loaded successfully!")
             
@@ -120,7 +107,7 @@ Provide a brief, natural description of what this scene likely represents. Keep
 Scene description:"""
         
         try:
-            response = self.llm(
+            response = self.llm.complete(
                 prompt,
                 max_tokens=128,
                 temperature=0.7,
@@ -4,13 +4,19 @@ Handles LLM operations using llama.cpp for local inference.
 """
 
 import os
+import threading
 import psutil
 from typing import Optional, Dict, Any
 from llama_cpp import Llama
 
 
 class LLMManager:
-    """Manages LLM operations and configurations."""
+    """Manages LLM operations and configurations.
+    
+    A single instance can be shared by several modes (see get_shared_llm).
+    Calls into the model are serialized with a lock, and each call may pass
+    its own generation parameters on top of the manager's defaults.
+    """
     
     def __init__(self, model_path: str, config: Optional[Dict[str, Any]] = None):
         """
@@ -23,6 +29,7 @@ class LLMManager:
         self.model_path = model_path
         self.config = config or self._get_default_config()
         self.llm: Optional[Llama] = None
+        self._lock = threading.RLock()
         
         self._initialize_llm()
     
@@ -61,6 +68,30 @@ class LLMManager:
             print(f"❌ Error initializing LLM: {e}")
             raise
     
+    def complete(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """
+        Run a raw completion with exclusive access to the model.
+        
+        Args:
+            prompt: Input prompt
+            **kwargs: Generation parameters for this call (max_tokens, stop, ...)
+            
+        Returns:
+            The llama.cpp completion response dictionary
+        """
+        if not self.llm:
+            raise RuntimeError("LLM not initialized")
+        
+        generation_params = {
+            'max_tokens': self.config.get('max_tokens', 256),
+            'temperature': self.config.get('temperature', 0.7),
+            'top_p': self.config.get('top_p', 0.9),
+            **kwargs
+        }
+        
+        with self._lock:
+            return self.llm(prompt, **generation_params)
+    
     def generate_text(self, prompt: str, **kwargs) -> str:
         """
         Generate text using the LLM.
@@ -76,15 +107,7 @@ class LLMManager:
             return "❌ LLM not initialized"
         
         try:
-            # Merge default config with kwargs
-            generation_params = {
-                'max_tokens': self.config['max_tokens'],
-                'temperature': self.config['temperature'],
-                'top_p': self.config['top_p'],
-                **kwargs
-            }
-            
-            response = self.llm(prompt, **generation_params)
+            response = self.complete(prompt, **kwargs)
             
             if response and 'choices' in response and len(response['choices']) > 0:
                 return response['choices'][0]['text'].strip()
@@ -139,6 +162,36 @@ class LLMManager:
         }
 
 
+_shared_llm: Optional[LLMManager] = None
+_shared_llm_lock = threading.Lock()
+
+
+def get_shared_llm(model_path: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> LLMManager:
+    """
+    Get the process-wide LLM manager, loading the model on first use.
+    
+    Every mode should go through this so the GGUF weights are only loaded
+    once per process. Later calls ignore model_path/config.
+    
+    Args:
+        model_path: Path to the GGUF model file (defaults to config.get_model_path('llama'))
+        config: Optional configuration dictionary (defaults to config.LLM_CONFIG)
+        
+    Returns:
+        The shared LLMManager instance
+    """
+    global _shared_llm
+    
+    with _shared_llm_lock:
+        if _shared_llm is None:
+            if model_path is None or config is None:
+                from config import LLM_CONFIG, get_model_path
+                model_path = model_path or get_model_path('llama')
+                config = config or LLM_CONFIG.copy()
+            _shared_llm = LLMManager(model_path, config)
+        return _shared_llm
+
+
 def find_model_file(model_name: str = "llama-7b-q4_0.gguf") -> Optional[str]:
     """
     Find a model file in common locations.
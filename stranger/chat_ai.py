@@ -5,12 +5,17 @@ Handles Speech-to-Text, RAG (ChromaDB), LLM (llama.cpp), and Text-to-Speech
 
 import logging
 import os
+import queue
 import threading
+import uuid
 import wave
 import tempfile
+import time
 from pathlib import Path
 from typing import Optional, List, Tuple
 
+from memory_compaction import CompactionConfig, compact_collection
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,6 +40,8 @@ class ChatAI:
         
         # Initialize components
         self.vector_db = None
+        self.collection = None
+        self.embedder = None
         self.llm = None
         self.stt_engine = None
         self.tts_engine = None
@@ -44,6 +51,17 @@ class ChatAI:
         self.audio_frames = []
         self.recording_thread: Optional[threading.Thread] = None
         
+        # Conversations are written to ChromaDB in the background so storing
+        # them (embedding + insert) never delays the next reply
+        self._store_queue: "queue.Queue[Optional[Tuple[str, str, float]]]" = queue.Queue()
+        self._store_thread: Optional[threading.Thread] = None
+        
+        # Memory compaction runs once the assistant has been idle for a while
+        self.compaction_config = CompactionConfig()
+        self.compaction_idle_s = 120.0
+        self._compaction_timer: Optional[threading.Timer] = None
+        self._llm_lock = threading.Lock()
+        
         try:
             self._setup_rag()
             self._setup_llm()
@@ -69,10 +87,16 @@ class ChatAI:
                 settings=Settings(anonymized_telemetry=False)
             )
             
+            # Embeddings come from the shared service; embedding_function=None
+            # keeps ChromaDB from loading a second copy of the model
+            from embedding_service import get_embedding_service
+            self.embedder = get_embedding_service()
+            
             # Get or create collection
             self.collection = self.vector_db.get_or_create_collection(
                 name="chat_history",
-                metadata={"hnsw:space": "cosine"}
+                metadata={"hnsw:space": "cosine"},
+                embedding_function=None
             )
             
             logger.info("ChromaDB RAG initialized")
@@ -344,7 +368,7 @@ class ChatAI:
         try:
             # Query ChromaDB for similar past conversations
             results = self.collection.query(
-                query_texts=[query],
+                query_embeddings=self.embedder.embed([query]),
                 n_results=top_k
             )
             
@@ -359,7 +383,7 @@ class ChatAI:
     
     def _store_conversation(self, query: str, response: str):
         """
-        Store conversation in RAG memory
+        Queue conversation for storage in RAG memory
         
         Args:
             query: User query
@@ -368,20 +392,91 @@ class ChatAI:
         if not self.collection:
             return
         
-        try:
-            # Combine query and response for storage
-            conversation_text = f"User: {query}\nAssistant: {response}"
+        # Combine query and response for storage
+        conversation_text = f"User: {query}\nAssistant: {response}"
+        self._store_queue.put((f"conv_{uuid.uuid4().hex}", conversation_text, time.time()))
+        
+        if self._store_thread is None or not self._store_thread.is_alive():
+            self._store_thread = threading.Thread(target=self._store_worker, daemon=True)
+            self._store_thread.start()
+    
+    def _store_worker(self, batch_size: int = 16):
+        """Write queued conversations to the collection in batches"""
+        running = True
+        while running:
+            item = self._store_queue.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    break
+                try:
+                    item = self._store_queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                running = False
             
-            # Add to collection
-            self.collection.add(
-                documents=[conversation_text],
-                ids=[f"conv_{len(self.collection.get()['ids'])}"]
+            if not batch:
+                continue
+            try:
+                documents = [text for _, text, _ in batch]
+                self.collection.add(
+                    documents=documents,
+                    embeddings=self.embedder.embed(documents),
+                    metadatas=[{"type": "conversation", "timestamp": ts} for _, _, ts in batch],
+                    ids=[doc_id for doc_id, _, _ in batch]
+                )
+                logger.info(f"Stored {len(batch)} conversation(s) in RAG")
+            except Exception as e:
+                logger.error(f"Error storing conversation: {e}")
+    
+    def flush_memory(self, timeout: float = 10.0):
+        """
+        Wait for queued conversations to be written
+        
+        Args:
+            timeout: Maximum seconds to wait
+        """
+        if self._store_thread and self._store_thread.is_alive():
+            self._store_queue.put(None)
+            self._store_thread.join(timeout)
+        self._store_thread = None
+    
+    def _schedule_compaction(self):
+        """Restart the idle countdown before memory compaction"""
+        if not self.collection:
+            return
+        if self._compaction_timer:
+            self._compaction_timer.cancel()
+        self._compaction_timer = threading.Timer(self.compaction_idle_s, self.compact_memory)
+        self._compaction_timer.daemon = True
+        self._compaction_timer.start()
+    
+    def compact_memory(self):
+        """Deduplicate, summarize and expire stored conversations"""
+        if not self.collection:
+            return
+        
+        try:
+            self.flush_memory()
+            compact_collection(
+                self.collection,
+                self.embedder.embed,
+                self.compaction_config,
+                summarize=self._summarize_memories if self.llm else None,
+                logger=logger
             )
-            
-            logger.info("Conversation stored in RAG")
-            
         except Exception as e:
-            logger.error(f"Error storing conversation: {e}")
+            logger.error(f"Error compacting memory: {e}")
+    
+    def _summarize_memories(self, snippets: List[str]) -> Optional[str]:
+        """Merge a cluster of similar conversations into one memory"""
+        prompt = ("Merge the related conversation snippets below into one short memory (at most two sentences). "
+                  "Keep names, facts and user preferences.\n\n" + "\n---\n".join(snippets) + "\n\nMemory:")
+        with self._llm_lock:
+            response = self.llm(prompt, max_tokens=96, temperature=0.2, stop=["\n\n", "---"])
+        return response['choices'][0]['text'].strip() or None
     
     def generate_response(self, user_query: str) -> str:
         """
@@ -410,12 +505,13 @@ Assistant:"""
             
             # Generate response
             if self.llm:
-                response = self.llm(
-                    prompt,
-                    max_tokens=256,
-                    temperature=0.7,
-                    stop=["User:", "\n\n"]
-                )
+                with self._llm_lock:
+                    response = self.llm(
+                        prompt,
+                        max_tokens=256,
+                        temperature=0.7,
+                        stop=["User:", "\n\n"]
+                    )
                 text_response = response['choices'][0]['text'].strip()
             else:
                 # Placeholder response
@@ -423,6 +519,7 @@ Assistant:"""
             
             # Store conversation
             self._store_conversation(user_query, text_response)
+            self._schedule_compaction()
             
             logger.info(f"Generated response: {text_response[:50]}...")
             return text_response
@@ -499,6 +596,9 @@ Assistant:"""
         try:
             if self.is_recording:
                 self.stop_recording()
+            if self._compaction_timer:
+                self._compaction_timer.cancel()
+            self.flush_memory()
             logger.info("ChatAI cleaned up")
         except Exception as e:
             logger.error(f"Error cleaning up ChatAI: {e}")
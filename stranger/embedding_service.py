@@ -0,0 +1,121 @@
+"""
+Embedding Service
+Process-wide embedding model shared by every memory/RAG component
+"""
+
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+EmbedFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+def _load_default_model() -> EmbedFn:
+    """Load the MiniLM ONNX model Chroma uses by default, so stored vectors stay compatible."""
+    from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+    return DefaultEmbeddingFunction()
+
+
+class EmbeddingService:
+    """Batches concurrent embedding requests and caches recent texts (LRU)."""
+
+    def __init__(
+        self,
+        embed_fn: Optional[EmbedFn] = None,
+        cache_size: int = 512,
+        max_batch_size: int = 32,
+        batch_wait: float = 0.005,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self._logger = logger or logging.getLogger(__name__)
+        self._embed_fn = embed_fn or _load_default_model()
+        self._cache_size = max(0, cache_size)
+        self._max_batch_size = max(1, max_batch_size)
+        self._batch_wait = batch_wait
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Each request is a list of (cache key, original text) pairs
+        self._requests: "queue.Queue[tuple[List[Tuple[str, str]], Future]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._worker_loop, name="embedding-service", daemon=True)
+        self._worker.start()
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Return one L2-normalized embedding per text."""
+        keys = [self.normalize_text(text) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+        with self._cache_lock:
+            for key in keys:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    vectors[key] = cached
+
+        # The model sees the caller's text; the normalized key only indexes the cache
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            future: Future = Future()
+            self._requests.put((list(missing.items()), future))
+            vectors.update(zip(missing, future.result()))
+        return [vectors[key].tolist() for key in keys]
+
+    def _worker_loop(self) -> None:
+        while True:
+            requests = [self._requests.get()]
+            size = len(requests[0][0])
+            while size < self._max_batch_size:
+                try:
+                    request = self._requests.get(timeout=self._batch_wait)
+                except queue.Empty:
+                    break
+                requests.append(request)
+                size += len(request[0])
+
+            texts = list(dict.fromkeys(text for items, _ in requests for _, text in items))
+            try:
+                embeddings = np.asarray(self._embed_fn(texts), dtype=np.float32)
+                embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+            except Exception as exc:  # pragma: no cover - model failure
+                self._logger.error("Embedding batch of %d text(s) failed: %s", len(texts), exc)
+                for _, future in requests:
+                    future.set_exception(exc)
+                continue
+
+            by_text = dict(zip(texts, embeddings))
+            with self._cache_lock:
+                if self._cache_size:
+                    for items, _ in requests:
+                        for key, text in items:
+                            self._cache[key] = by_text[text]
+                            self._cache.move_to_end(key)
+                    while len(self._cache) > self._cache_size:
+                        self._cache.popitem(last=False)
+
+            for items, future in requests:
+                future.set_result([by_text[text] for _, text in items])
+
+
+_shared_service: Optional[EmbeddingService] = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_service(cache_size: int = 512) -> EmbeddingService:
+    """Return the process-wide embedding service, loading the model on first use."""
+    global _shared_service
+    with _shared_lock:
+        if _shared_service is None:
+            _shared_service = EmbeddingService(cache_size=cache_size)
+        return _shared_service
@@ -0,0 +1,110 @@
+"""
+Image Writer
+Background JPEG saving, so captures never delay detection or speech
+"""
+
+import logging
+import os
+import queue
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+def _load_turbojpeg():
+    """libjpeg-turbo encoder via PyTurboJPEG, if installed."""
+    try:
+        from turbojpeg import TurboJPEG
+
+        return TurboJPEG()
+    except Exception:
+        return None
+
+
+class ImageWriter:
+    """Bounded queue of RGB frames encoded and written by a worker thread."""
+
+    def __init__(
+        self,
+        max_queue: int = 4,
+        quality: int = 95,
+        thumbnail_size: Optional[Tuple[int, int]] = (320, 180),
+        use_turbojpeg: bool = True,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self._logger = logger or logging.getLogger(__name__)
+        self._quality = quality
+        self._thumbnail_size = thumbnail_size
+        self._turbojpeg = _load_turbojpeg() if use_turbojpeg else None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._stats = {"written": 0, "dropped": 0, "failed": 0}
+        self._worker = threading.Thread(target=self._run, name="image-writer", daemon=True)
+        self._worker.start()
+        self._logger.info(f"Image writer using {'libjpeg-turbo' if self._turbojpeg else 'PIL'}")
+
+    def submit(self, image: np.ndarray, path: str) -> bool:
+        """Queue an RGB frame for saving; drops it (returns False) if the queue is full."""
+        try:
+            self._queue.put_nowait((image, path))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+            self._logger.warning(f"Image writer busy, dropping {path}")
+            return False
+
+    def _encode(self, image: np.ndarray, path: str):
+        tmp_path = f"{path}.tmp"
+        if self._turbojpeg:
+            from turbojpeg import TJPF_RGB
+
+            data = self._turbojpeg.encode(np.ascontiguousarray(image), quality=self._quality, pixel_format=TJPF_RGB)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        else:
+            Image.fromarray(image).save(tmp_path, "JPEG", quality=self._quality)
+        os.replace(tmp_path, path)
+
+    def _write(self, image: np.ndarray, path: str):
+        self._encode(image, path)
+        if self._thumbnail_size:
+            thumbnail = Image.fromarray(image)
+            thumbnail.thumbnail(self._thumbnail_size)
+            stem, ext = os.path.splitext(path)
+            self._encode(np.asarray(thumbnail), f"{stem}_thumb{ext}")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                image, path = item
+                try:
+                    self._write(image, path)
+                    with self._lock:
+                        self._stats["written"] += 1
+                    self._logger.info(f"Image saved to {path}")
+                except Exception as e:
+                    with self._lock:
+                        self._stats["failed"] += 1
+                    self._logger.error(f"Error saving image {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued frame is written."""
+        self._queue.join()
+
+    def close(self):
+        """Write the remaining frames and stop the worker."""
+        if self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, pending=self._queue.qsize())
@@ -197,10 +197,10 @@ class Assistant:
                 # Show capturing
                 self.display.show_capturing()
                 
-                # Capture image
-                image_path = self.camera.capture_image()
+                # Capture image (saved in the background; detection uses the array)
+                image, image_path = self.camera.capture_image()
                 
-                if not image_path:
+                if image is None:
                     logger.error("Failed to capture image")
                     self.object_processing = False
                     self.display.show_object_mode()
@@ -210,7 +210,7 @@ class Assistant:
                 self.display.show_detecting()
                 
                 # Run object detection
-                detected_objects = self.camera.detect_objects(image_path)
+                detected_objects = self.camera.detect_objects(image)
                 
                 if not detected_objects:
                     logger.warning("No objects detected")
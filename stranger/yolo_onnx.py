@@ -0,0 +1,297 @@
+"""
+YOLO ONNX Detection
+YOLOv8 inference with onnxruntime: letterboxing, vectorized decoding and class-wise NMS
+
+Optional tools:
+    python yolo_onnx.py --quantize object_models/yolo_model.onnx --calibration /home/pi/Object_Captures
+    python yolo_onnx.py --benchmark /home/pi/Object_Captures --ultralytics yolov8n.pt
+"""
+
+import ast
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+COCO_CLASSES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck',
+    'boat', 'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench',
+    'bird', 'cat', 'dog', 'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra',
+    'giraffe', 'backpack', 'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee',
+    'skis', 'snowboard', 'sports ball', 'kite', 'baseball bat', 'baseball glove',
+    'skateboard', 'surfboard', 'tennis racket', 'bottle', 'wine glass', 'cup',
+    'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple', 'sandwich', 'orange',
+    'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch',
+    'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse',
+    'remote', 'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink',
+    'refrigerator', 'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier',
+    'toothbrush'
+]
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+
+
+@dataclass
+class DetectorConfig:
+    """Thresholds applied to raw YOLO predictions."""
+
+    conf_threshold: float = 0.5
+    iou_threshold: float = 0.45
+    max_detections: int = 100
+    max_candidates: int = 300  # highest-scoring boxes entering NMS
+    num_threads: int = 0       # onnxruntime intra-op threads (0 = all cores)
+
+
+def letterbox(image: np.ndarray, canvas: np.ndarray, clear: bool = True) -> Tuple[float, int, int]:
+    """Resize `image` into `canvas` keeping its aspect ratio, centered; returns (scale, pad_left, pad_top)."""
+    height, width = image.shape[:2]
+    input_height, input_width = canvas.shape[:2]
+    scale = min(input_width / width, input_height / height)
+    new_width, new_height = round(width * scale), round(height * scale)
+    left, top = (input_width - new_width) // 2, (input_height - new_height) // 2
+    if clear:
+        canvas.fill(114)
+    canvas[top:top + new_height, left:left + new_width] = cv2.resize(
+        image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    return scale, left, top
+
+
+def decode_yolov8(output: np.ndarray, conf_threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Boxes (xyxy), scores and class ids above `conf_threshold` from a (1, 4+nc, N) YOLOv8 output."""
+    predictions = output[0]
+    if predictions.shape[0] > predictions.shape[1]:
+        predictions = predictions.T  # exported with (N, 4+nc) layout
+    class_scores = predictions[4:]
+    class_ids = class_scores.argmax(axis=0)
+    scores = class_scores[class_ids, np.arange(class_scores.shape[1])]
+    keep = scores >= conf_threshold
+
+    cx, cy, w, h = predictions[:4, keep]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return boxes, scores[keep], class_ids[keep]
+
+
+def fast_nms(boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Class-wise NMS as one matrix operation; returns kept indices by descending score.
+
+    Boxes of different classes are offset so they never overlap. A box is dropped if any
+    higher-scoring box overlaps it above the threshold (Fast NMS: unlike greedy NMS, an
+    already-suppressed box still suppresses, which only matters in dense clusters).
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(-scores)
+    offset = class_ids[order, None] * (boxes.max() + 1.0)
+    b = boxes[order] + offset
+
+    areas = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    lt = np.maximum(b[:, None, :2], b[None, :, :2])
+    rb = np.minimum(b[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+    iou = inter / (areas[:, None] + areas[None, :] - inter + 1e-9)
+
+    # Only higher-scoring (earlier) boxes may suppress a box
+    suppressed = np.triu(iou, k=1).max(axis=0) > iou_threshold
+    return order[~suppressed]
+
+
+class YoloOnnxDetector:
+    """YOLOv8 ONNX model with a reusable letterboxed input buffer."""
+
+    def __init__(self, model_path: str, config: Optional[DetectorConfig] = None,
+                 class_names: Optional[Sequence[str]] = None, logger: Optional[logging.Logger] = None):
+        import onnxruntime as ort
+
+        self._logger = logger or logging.getLogger(__name__)
+        self.config = config or DetectorConfig()
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.config.num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self._input_name = model_input.name
+        height, width = model_input.shape[2:]
+        # Dynamic axes are exported as names; use the default YOLO size
+        self.input_size = (width if isinstance(width, int) else 640, height if isinstance(height, int) else 640)
+        dtype = np.float16 if model_input.type == 'tensor(float16)' else np.float32
+
+        self.class_names = list(class_names or self._names_from_metadata() or COCO_CLASSES)
+
+        # Preallocated buffers, refilled in place on every call
+        self._canvas = np.full((self.input_size[1], self.input_size[0], 3), 114, dtype=np.uint8)
+        self._input = np.empty((1, 3, self.input_size[1], self.input_size[0]), dtype=dtype)
+        self._geometry: Optional[Tuple[int, int]] = None
+        self._logger.info(f"YOLO ONNX model loaded from {model_path} (input {self.input_size[0]}x{self.input_size[1]})")
+
+    def _names_from_metadata(self) -> Optional[List[str]]:
+        """Class names stored by the ultralytics exporter, e.g. "{0: 'person', ...}"."""
+        names = self.session.get_modelmeta().custom_metadata_map.get('names')
+        if not names:
+            return None
+        try:
+            parsed = ast.literal_eval(names)
+            return [parsed[i] for i in sorted(parsed)]
+        except Exception:
+            return None
+
+    def preprocess(self, image: np.ndarray) -> Tuple[float, int, int]:
+        """Letterbox an RGB image into the input buffer; returns (scale, pad_left, pad_top)."""
+        # Borders only need repainting when the frame size changes
+        geometry = image.shape[:2]
+        scale, left, top = letterbox(image, self._canvas, clear=self._geometry != geometry)
+        self._geometry = geometry
+
+        np.multiply(self._canvas.transpose(2, 0, 1), 1 / 255.0, out=self._input[0], casting='unsafe')
+        return scale, left, top
+
+    def detect(self, image: np.ndarray) -> Dict[str, np.ndarray]:
+        """Detections in an RGB image: 'boxes' (xyxy, image pixels), 'scores', 'class_ids'."""
+        scale, left, top = self.preprocess(image)
+        output = self.session.run(None, {self._input_name: self._input})[0]
+
+        boxes, scores, class_ids = decode_yolov8(output.astype(np.float32, copy=False), self.config.conf_threshold)
+        if len(scores) > self.config.max_candidates:
+            top_k = np.argpartition(-scores, self.config.max_candidates)[:self.config.max_candidates]
+            boxes, scores, class_ids = boxes[top_k], scores[top_k], class_ids[top_k]
+        keep = fast_nms(boxes, scores, class_ids, self.config.iou_threshold)[:self.config.max_detections]
+
+        # Undo the letterbox
+        boxes = (boxes[keep] - [left, top, left, top]) / scale
+        boxes = np.clip(boxes, 0, [image.shape[1], image.shape[0], image.shape[1], image.shape[0]])
+        return {'boxes': boxes.astype(np.float32), 'scores': scores[keep], 'class_ids': class_ids[keep]}
+
+    def detect_labels(self, image: np.ndarray) -> List[str]:
+        """Class names of the detections, highest score first (repeated per instance)."""
+        return [self.class_names[i] for i in self.detect(image)['class_ids']]
+
+
+def _calibration_reader(input_name: str, input_size: Tuple[int, int], image_paths: List[Path]):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(image_paths)
+
+        def get_next(self):
+            for path in self._paths:
+                image = cv2.imread(str(path))
+                if image is None:
+                    continue
+                canvas = np.empty((input_size[1], input_size[0], 3), dtype=np.uint8)
+                letterbox(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), canvas)
+                return {input_name: (canvas.transpose(2, 0, 1)[None] / 255.0).astype(np.float32)}
+            return None
+
+    return _Reader()
+
+
+def quantize_model(model_path: str, output_path: Optional[str] = None, calibration_dir: Optional[str] = None,
+                   max_images: int = 100) -> str:
+    """
+    Write an int8 copy of a YOLO ONNX model; returns its path (default: '<name>.int8.onnx').
+
+    With calibration images (e.g. earlier captures) activations are quantized statically
+    (QDQ, per-channel weights), which is what speeds up convolutions on ARM; without
+    them only the weights are quantized.
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    output_path = output_path or str(Path(model_path).with_suffix('.int8.onnx'))
+    prepared_path = str(Path(output_path).with_suffix('.prep.onnx'))
+    quant_pre_process(model_path, prepared_path)
+
+    images = sorted(p for p in Path(calibration_dir).glob('*') if p.suffix.lower() in IMAGE_SUFFIXES
+                    and not p.stem.endswith('_thumb'))[:max_images] if calibration_dir else []
+    try:
+        if images:
+            model_input = ort.InferenceSession(model_path, providers=['CPUExecutionProvider']).get_inputs()[0]
+            height, width = (d if isinstance(d, int) else 640 for d in model_input.shape[2:])
+            quantize_static(prepared_path, output_path,
+                            _calibration_reader(model_input.name, (width, height), images),
+                            quant_format=QuantFormat.QDQ, per_channel=True,
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+        else:
+            quantize_dynamic(prepared_path, output_path, weight_type=QuantType.QUInt8)
+    finally:
+        os.remove(prepared_path)
+    return output_path
+
+
+def benchmark(model_paths: List[str], image_dir: str, ultralytics_model: Optional[str] = None,
+              runs: int = 3, max_images: int = 20) -> Dict[str, Dict[str, float]]:
+    """Median latency per image (ms) of each ONNX model, and of ultralytics if given, plus label agreement."""
+    paths = sorted(p for p in Path(image_dir).glob('*') if p.suffix.lower() in IMAGE_SUFFIXES
+                   and not p.stem.endswith('_thumb'))[:max_images]
+    images = [cv2.cvtColor(cv2.imread(str(p)), cv2.COLOR_BGR2RGB) for p in paths]
+    if not images:
+        raise ValueError(f"No images in {image_dir}")
+
+    def measure(detect) -> Tuple[float, List[List[str]]]:
+        labels = [sorted(detect(image)) for image in images]  # warm-up pass
+        timings = []
+        for _ in range(runs):
+            for image in images:
+                start = time.perf_counter()
+                detect(image)
+                timings.append(time.perf_counter() - start)
+        return 1000 * float(np.median(timings)), labels
+
+    results, reference = {}, None
+    if ultralytics_model:
+        from ultralytics import YOLO
+
+        model = YOLO(ultralytics_model)
+        config = DetectorConfig()
+
+        def detect_ultralytics(image):
+            # ultralytics expects BGR arrays
+            result = model(image[:, :, ::-1], conf=config.conf_threshold, iou=config.iou_threshold, verbose=False)[0]
+            return [result.names[int(c)] for c in result.boxes.cls]
+
+        latency, reference = measure(detect_ultralytics)
+        results['ultralytics'] = {'ms': latency, 'agreement': 1.0}
+
+    for model_path in model_paths:
+        detector = YoloOnnxDetector(model_path)
+        latency, labels = measure(detector.detect_labels)
+        agreement = float(np.mean([a == b for a, b in zip(labels, reference)])) if reference else float('nan')
+        results[Path(model_path).name] = {'ms': latency, 'agreement': agreement}
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="YOLO ONNX quantization and benchmark")
+    parser.add_argument('--model', default='object_models/yolo_model.onnx')
+    parser.add_argument('--quantize', metavar='MODEL', help="write an int8 copy of MODEL")
+    parser.add_argument('--calibration', metavar='DIR', help="images for static int8 calibration")
+    parser.add_argument('--benchmark', metavar='DIR', help="time detection on the images in DIR")
+    parser.add_argument('--ultralytics', metavar='WEIGHTS', help="also time ultralytics with these weights")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.quantize:
+        print(f"Quantized model written to {quantize_model(args.quantize, calibration_dir=args.calibration)}")
+    if args.benchmark:
+        models = [args.model]
+        int8_path = str(Path(args.model).with_suffix('.int8.onnx'))
+        if os.path.exists(int8_path):
+            models.append(int8_path)
+        print(f"{'model':<32} {'ms/image':>10} {'same labels':>12}")
+        for name, result in benchmark(models, args.benchmark, args.ultralytics).items():
+            print(f"{name:<32} {result['ms']:>10.1f} {result['agreement']:>12.0%}")
+
+
+if __name__ == "__main__":
+    main()